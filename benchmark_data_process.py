@@ -0,0 +1,134 @@
+"""
+Benchmark data_process.py on synthetic raw data of increasing size.
+
+Generates all raw input files for each size, then reports:
+- the time to filter Amazon review chunks by ID with Series.isin against a list
+  (the former approach) and with a prebuilt hashed index (id_index),
+- the end-to-end runtime of the pipeline for each number of worker processes.
+
+Usage:
+    python benchmark_data_process.py --sizes 10000 50000 200000 --workers 1 4
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import data_process
+
+AMAZON_CATEGORIES = ['Industrial_and_Scientific', 'Musical_Instruments', 'Video_Games']
+GOODREADS_GENRES = ['children', 'comics_graphic', 'poetry']
+CITIES = ['Philadelphia', 'Tampa', 'Tucson', 'Reno', 'Boise']
+
+
+def _write_jsonl(path, records):
+    with open(path, 'w') as file:
+        for record in records:
+            file.write(json.dumps(record) + '\n')
+
+
+def generate_raw_data(output_dir, n, seed=0):
+    """Write every raw input file with n reviews per review file."""
+    rng = random.Random(seed)
+    num_items = max(10, n // 10)
+    num_users = max(10, n // 5)
+    _write_jsonl(os.path.join(output_dir, 'yelp_academic_dataset_business.json'), (
+        {'business_id': f'b{i}', 'name': f'business {i}', 'city': rng.choice(CITIES), 'stars': 4.0}
+        for i in range(num_items)))
+    _write_jsonl(os.path.join(output_dir, 'yelp_academic_dataset_user.json'), (
+        {'user_id': f'yu{i}', 'name': 'user', 'review_count': i} for i in range(num_users)))
+    _write_jsonl(os.path.join(output_dir, 'yelp_academic_dataset_review.json'), (
+        {'review_id': f'yr{i}', 'user_id': f'yu{rng.randrange(num_users)}', 'business_id': f'b{rng.randrange(num_items)}',
+         'stars': rng.randint(1, 5), 'text': 'review text ' * 20, 'date': '2018-07-07 22:09:11'}
+        for i in range(n)))
+    for category in AMAZON_CATEGORIES:
+        prefix = category[:2]
+        with open(os.path.join(output_dir, f'{category}.csv'), 'w') as file:
+            file.write('user_id,parent_asin,rating,timestamp\n')
+            for i in range(n // 2):
+                file.write(f'au{rng.randrange(num_users)},{prefix}{rng.randrange(num_items)},{rng.randint(1, 5)},{1600000000000 + i}\n')
+        _write_jsonl(os.path.join(output_dir, f'{category}.jsonl'), (
+            {'rating': float(rng.randint(1, 5)), 'title': 'title', 'text': 'review text ' * 20, 'asin': f'x{i}',
+             'parent_asin': f'{prefix}{rng.randrange(num_items * 2)}', 'user_id': f'au{rng.randrange(num_users * 2)}',
+             'timestamp': 1600000000000 + i, 'helpful_vote': 0, 'verified_purchase': True}
+            for i in range(n)))
+        _write_jsonl(os.path.join(output_dir, f'meta_{category}.jsonl'), (
+            {'main_category': category, 'title': f'product {i}', 'parent_asin': f'{prefix}{i}', 'details': {'k': 1}}
+            for i in range(num_items * 2)))
+    for genre in GOODREADS_GENRES:
+        _write_jsonl(os.path.join(output_dir, f'goodreads_books_{genre}.json'), (
+            {'book_id': f'{genre}{i}', 'title': 'book', 'average_rating': '3.9'} for i in range(num_items)))
+        _write_jsonl(os.path.join(output_dir, f'goodreads_reviews_{genre}.json'), (
+            {'user_id': f'g{rng.randrange(num_users)}', 'book_id': f'{genre}{rng.randrange(num_items)}',
+             'review_id': f'gr{genre}{i}', 'rating': rng.randint(0, 5), 'review_text': 'review text ' * 20}
+            for i in range(n)))
+
+
+def benchmark_filtering(input_dir, chunksize):
+    """Seconds spent filtering the Amazon reviews by user and item, per approach."""
+    ids = [data_process._rating_only_ids(os.path.join(input_dir, f'{category}.csv'), chunksize)
+           for category in AMAZON_CATEGORIES]
+    users = np.concatenate([array for file_users, _ in ids for array in file_users])
+    items = np.concatenate([array for _, file_items in ids for array in file_items])
+    chunks = [chunk for category in AMAZON_CATEGORIES
+              for chunk in data_process.load_data_chunks(os.path.join(input_dir, f'{category}.jsonl'), chunksize)]
+
+    frames = [pd.DataFrame(chunk) for chunk in chunks]
+    start = time.perf_counter()
+    user_list, item_list = pd.unique(users).tolist(), pd.unique(items).tolist()
+    expected = [frame[frame['user_id'].isin(user_list) & frame['parent_asin'].isin(item_list)] for frame in frames]
+    isin_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    filters = {'user_id': data_process.id_index(users), 'parent_asin': data_process.id_index(items)}
+    actual = [data_process.filter_chunk(chunk, filters) for chunk in chunks]
+    index_time = time.perf_counter() - start
+
+    assert all(a == b.to_dict('records') for a, b in zip(actual, expected))
+    return isin_time, index_time
+
+
+def benchmark_pipeline(input_dir, output_dir, chunksize, workers):
+    """Seconds for the full load, filter and write pipeline, without reusing cached stages."""
+    start = time.perf_counter()
+    data_process.build_dataset(input_dir, output_dir, chunksize, workers, rebuild=True)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark data_process.py on synthetic data.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 50000, 200000], help="Reviews per review file.")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, os.cpu_count() or 1], help="Worker process counts to compare.")
+    parser.add_argument('--chunksize', type=int, default=data_process.DEFAULT_CHUNKSIZE, help="Records processed at a time.")
+    args = parser.parse_args()
+
+    rows = []
+    for n in args.sizes:
+        work_dir = tempfile.mkdtemp(prefix='benchmark_data_process_')
+        try:
+            input_dir = os.path.join(work_dir, 'raw')
+            output_dir = os.path.join(work_dir, 'processed')
+            os.makedirs(input_dir)
+            os.makedirs(output_dir)
+            generate_raw_data(input_dir, n)
+            isin_time, index_time = benchmark_filtering(input_dir, args.chunksize)
+            pipeline_times = {workers: benchmark_pipeline(input_dir, output_dir, args.chunksize, workers)
+                              for workers in dict.fromkeys(args.workers)}
+            rows.append((n, isin_time, index_time, pipeline_times))
+        finally:
+            shutil.rmtree(work_dir)
+
+    print()
+    print(f"{'reviews/file':>12} {'isin(list)':>11} {'id_index':>9} " +
+          ' '.join(f"{f'pipeline w={workers}':>14}" for workers in rows[0][3]))
+    for n, isin_time, index_time, pipeline_times in rows:
+        print(f"{n:>12} {isin_time:>10.2f}s {index_time:>8.2f}s " +
+              ' '.join(f"{seconds:>13.2f}s" for seconds in pipeline_times.values()))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,41 @@
+import hashlib
 import json
 import logging
-import uuid
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+import numpy as np
 import pandas as pd
 from tqdm import tqdm
 import os
+import shutil
 import argparse
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Records per chunk; peak memory is a few chunks plus the sets of IDs used for filtering
+DEFAULT_CHUNKSIZE = 100000
+
+# Parquet output: small row groups so that a lookup only decodes a few thousand records
+PARQUET_ROW_GROUP_SIZE = 10000
+# Fields shared by the records of a table, stored as typed Parquet columns, with the Python type
+# a value needs to be stored there. The other fields of each record are kept as JSON.
+PARQUET_COLUMNS = {
+    'item': {'item_id': str, 'source': str, 'type': str},
+    'user': {'user_id': str, 'source': str},
+    'review': {'review_id': str, 'item_id': str, 'user_id': str, 'stars': float, 'text': str, 'date': str,
+               'source': str, 'type': str},
+}
+PARQUET_KEY_COLUMNS = {
+    'item': ['item_id'],
+    'user': ['user_id'],
+    'review': ['review_id', 'item_id', 'user_id'],
+}
+PARQUET_DICTIONARY_COLUMNS = ['item_id', 'user_id', 'source', 'type']
+# Column holding the JSON of the fields without a typed column
+PARQUET_FIELDS_COLUMN = 'other_fields'
+
 REQUIRED_FILES_YELP = [
     'yelp_academic_dataset_business.json', 
     'yelp_academic_dataset_user.json', 
@@ -35,30 +63,214 @@ REQUIRED_FILES_GOODREADS = [
     'goodreads_reviews_poetry.json'
 ]
 
-def load_data(file_path):
-    """Load JSON data into a Pandas DataFrame with progress bar."""
-    data = []
-    with open(file_path, 'r') as file:
-        for line in tqdm(file, desc=f"Loading {file_path}", unit=" lines"):
-            data.append(json.loads(line))
-    return pd.DataFrame(data)
-
-def save_json(dataframe, output_file):
-    """Save a Pandas DataFrame to a JSON file."""
-    logging.info(f"Saving {output_file}...")
-    dataframe.to_json(output_file, orient='records', lines=True)
-    logging.info(f"{output_file} saved.")
-
-def filter_data(top_cities, business_df, user_df, review_df):
-    """Filter and save data within the top three cities with progress bars."""
-    logging.info("Filtering data for top cities...")
-    
-    filtered_businesses = business_df[business_df['city'].isin(top_cities)]
-    filtered_reviews = review_df[review_df['business_id'].isin(filtered_businesses['business_id'])]
-    filtered_users = user_df[user_df['user_id'].isin(filtered_reviews['user_id'])]
+YELP_BUSINESS_FILE = 'yelp_academic_dataset_business.json'
+YELP_USER_FILE = 'yelp_academic_dataset_user.json'
+YELP_REVIEW_FILE = 'yelp_academic_dataset_review.json'
+YELP_TOP_CITIES = ['Philadelphia', 'Tampa', 'Tucson']
+AMAZON_RATING_ONLY_FILES = ['Industrial_and_Scientific.csv', 'Musical_Instruments.csv', 'Video_Games.csv']
+AMAZON_REVIEW_FILES = ['Industrial_and_Scientific.jsonl', 'Musical_Instruments.jsonl', 'Video_Games.jsonl']
+AMAZON_META_FILES = ['meta_Industrial_and_Scientific.jsonl', 'meta_Musical_Instruments.jsonl', 'meta_Video_Games.jsonl']
+GOODREADS_BOOK_FILES = ['goodreads_books_children.json', 'goodreads_books_comics_graphic.json', 'goodreads_books_poetry.json']
+GOODREADS_REVIEW_FILES = ['goodreads_reviews_children.json', 'goodreads_reviews_comics_graphic.json', 'goodreads_reviews_poetry.json']
+
+# Sources in output order, with the column renames and record type of each
+SOURCES = ['yelp', 'amazon', 'goodreads']
+SOURCE_TYPES = {'yelp': 'business', 'amazon': 'product', 'goodreads': 'book'}
+ITEM_RENAMES = {
+    'yelp': {'business_id': 'item_id'},
+    'amazon': {'parent_asin': 'item_id'},
+    'goodreads': {'book_id': 'item_id'},
+}
+REVIEW_RENAMES = {
+    'yelp': {'business_id': 'item_id'},
+    'amazon': {'asin': 'sub_item_id', 'parent_asin': 'item_id', 'rating': 'stars'},
+    'goodreads': {'book_id': 'item_id', 'rating': 'stars', 'review_text': 'text'},
+}
+
+# Bump when the records written by a stage change, so that cached stage outputs are rebuilt
+CACHE_VERSION = 6
+
+def parse_records(block):
+    """
+    Parse a block of JSON lines into a list of records.
+
+    Records are dicts as json.loads gives them, so each keeps its own keys, their order and
+    value types, whatever other records share its chunk.
+    """
+    return [json.loads(line) for line in block.splitlines() if line.strip()]
+
+def record_lines(records):
+    """JSON text of each record."""
+    return [json.dumps(record, separators=(',', ':')) for record in records]
+
+def load_data_chunks(file_path, chunksize=DEFAULT_CHUNKSIZE):
+    """Stream a JSON lines file as lists of at most chunksize records."""
+    logging.info(f"Streaming {file_path}...")
+    for block in read_line_blocks(file_path, chunksize):
+        yield parse_records(block)
+
+def id_index(ids):
+    """
+    Hashed index of unique IDs. The hash table is built once, on the first lookup,
+    and reused by every chunk filtered against it.
+    """
+    if isinstance(ids, pd.Index):
+        return ids
+    if isinstance(ids, (set, frozenset, dict)):
+        ids = list(ids)
+    return pd.Index(pd.unique(np.asarray(ids, dtype=object)))
+
+def filter_chunk(chunk, filters=None):
+    """Keep the records of a chunk whose value of each filtered field is in that field's ID index."""
+    if not filters:
+        return chunk
+    mask = np.ones(len(chunk), dtype=bool)
+    for column, index in filters.items():
+        mask &= index.get_indexer([record.get(column) for record in chunk]) >= 0
+    return [record for record, keep in zip(chunk, mask) if keep]
+
+# ID indexes of the current stream, installed once in each worker process
+_worker_filters = None
+
+def _init_filter_worker(filters):
+    global _worker_filters
+    _worker_filters = filters
+
+def _parse_block(block):
+    """Parse and filter a block of JSON lines in a worker process."""
+    return filter_chunk(parse_records(block), _worker_filters)
+
+def read_line_blocks(file_path, chunksize=DEFAULT_CHUNKSIZE):
+    """Read a JSON lines file as raw blocks of at most chunksize lines."""
+    with open(file_path, 'rb') as file:
+        while True:
+            lines = list(islice(file, chunksize))
+            if not lines:
+                return
+            yield b''.join(lines)
+
+def stream_files(file_paths, chunksize=DEFAULT_CHUNKSIZE, filters=None, workers=1):
+    """
+    Stream JSON lines files, in order, as lists of the records that pass the filters.
+
+    Args:
+        file_paths: Files to read, in output order
+        chunksize: Number of lines parsed at a time
+        filters: Optional dict of field -> index of accepted IDs (see id_index)
+        workers: Number of processes parsing and filtering chunks. With more than one,
+            later chunks are parsed while the caller consumes earlier ones; at most
+            2 * workers chunks are in flight.
+    """
+    filters = {column: id_index(ids) for column, ids in (filters or {}).items()}
+    if workers <= 1:
+        for file_path in file_paths:
+            for chunk in load_data_chunks(file_path, chunksize):
+                yield filter_chunk(chunk, filters)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_filter_worker, initargs=(filters,)) as executor:
+        pending = deque()
+        for file_path in file_paths:
+            logging.info(f"Streaming {file_path} with {workers} processes...")
+            for block in read_line_blocks(file_path, chunksize):
+                pending.append(executor.submit(_parse_block, block))
+                if len(pending) >= 2 * workers:
+                    yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def as_chunks(data):
+    """Accept either a DataFrame or an iterable of record chunks."""
+    if isinstance(data, pd.DataFrame):
+        return [data.to_dict('records')]
+    return data
+
+class ParquetSink:
+    """
+    Write records of one table as a Parquet dataset partitioned by source:
+    <parquet_dir>/<table>/source=<source>/part-0.parquet.
+
+    The fields in PARQUET_COLUMNS are stored as typed columns, so readers can project the IDs and
+    texts without decoding JSON; the other fields of each record are stored as one JSON object.
+    A field moved to its typed column is kept in that object as null, which preserves its position
+    in the record. Values not of the column's type, and nulls, stay in the JSON object with the
+    column null; the ID columns also hold the text of such IDs, for lookups.
+    """
+
+    def __init__(self, parquet_dir, table):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Parquet output requires pyarrow: pip install pyarrow") from e
+        self.pa = pa
+        self.pq = pq
+        self.table = table
+        self.table_dir = os.path.join(parquet_dir, table)
+        # Start from an empty dataset so no stale partitions are left behind
+        if os.path.exists(self.table_dir):
+            shutil.rmtree(self.table_dir)
+        self.arrow_types = {column: pa.float64() if value_type is float else pa.string()
+                            for column, value_type in PARQUET_COLUMNS[table].items()}
+        fields = [pa.field(column, arrow_type) for column, arrow_type in self.arrow_types.items()]
+        fields.append(pa.field(PARQUET_FIELDS_COLUMN, pa.string()))
+        self.schema = pa.schema(fields)
+        self.writers = {}
+
+    def _writer(self, source):
+        writer = self.writers.get(source)
+        if writer is None:
+            partition_dir = os.path.join(self.table_dir, f'source={source}')
+            os.makedirs(partition_dir, exist_ok=True)
+            writer = self.pq.ParquetWriter(
+                os.path.join(partition_dir, 'part-0.parquet'),
+                self.schema,
+                compression='zstd',
+                use_dictionary=[column for column in PARQUET_DICTIONARY_COLUMNS if column in self.schema.names]
+            )
+            self.writers[source] = writer
+        return writer
+
+    def write(self, source, chunk):
+        pa = self.pa
+        typed_columns = PARQUET_COLUMNS[self.table]
+        key_columns = PARQUET_KEY_COLUMNS[self.table]
+        values = {column: [] for column in typed_columns}
+        other_fields = []
+        for record in chunk:
+            fields = dict(record)
+            for column, value_type in typed_columns.items():
+                value = record.get(column)
+                typed = type(value) is value_type
+                if column in key_columns:
+                    values[column].append(None if value is None else _key_value_text(value))
+                else:
+                    values[column].append(value if typed else None)
+                if typed:
+                    fields[column] = None
+            other_fields.append(fields)
+        columns = [pa.array(values[column], type=self.arrow_types[column]) for column in typed_columns]
+        columns.append(pa.array(record_lines(other_fields), type=pa.string()))
+        self._writer(source).write_table(pa.Table.from_arrays(columns, schema=self.schema), row_group_size=PARQUET_ROW_GROUP_SIZE)
 
-    # Save filtered data in JSON format
-    return filtered_businesses, filtered_reviews, filtered_users
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+        self.writers = {}
+
+def write_chunks(chunks, file, progress, sink=None, source=None):
+    """Append record chunks to an open JSON lines file and/or a Parquet sink."""
+    count = 0
+    for chunk in chunks:
+        if not chunk:
+            continue
+        lines = record_lines(chunk)
+        if file is not None:
+            file.write('\n'.join(lines) + '\n')
+        if sink is not None:
+            sink.write(source, chunk)
+        count += len(chunk)
+        progress.update(len(chunk))
+    return count
 
 def check_required_files(input_dir):
     """Check if all required files exist in the input directory."""
@@ -76,206 +288,409 @@ def check_required_files(input_dir):
         return False
     return True
 
-def load_and_process_yelp_data(input_dir):
-    logging.info("Loading and processing Yelp data...")
-    # File paths
-    business_file = os.path.join(input_dir, 'yelp_academic_dataset_business.json')
-    user_file = os.path.join(input_dir, 'yelp_academic_dataset_user.json')
-    review_file = os.path.join(input_dir, 'yelp_academic_dataset_review.json')
-
-    # Load the datasets with progress bars
-    business_df = load_data(business_file)
-    user_df = load_data(user_file)
-    review_df = load_data(review_file)
-
-    # Find top cities and related data
-    logging.info("Finding top cities by reviews for Yelp...")
-    top_cities = ['Philadelphia', 'Tampa', 'Tucson']
-
-    logging.info("Filtering data for top cities for Yelp...")
-    filtered_businesses, filtered_reviews, filtered_users = filter_data(top_cities, business_df, user_df, review_df)
-    return filtered_businesses, filtered_reviews, filtered_users
-
-def load_and_process_amazon_data(input_dir):
-    """Load and process Amazon dataset."""
-    logging.info("Loading and processing Amazon data...")
-    rating_only_files = ['Industrial_and_Scientific.csv', 'Musical_Instruments.csv', 'Video_Games.csv']
-    review_files = ['Industrial_and_Scientific.jsonl', 'Musical_Instruments.jsonl', 'Video_Games.jsonl']
-    meta_files = ['meta_Industrial_and_Scientific.jsonl', 'meta_Musical_Instruments.jsonl', 'meta_Video_Games.jsonl']
-
-    # Load rating-only data
-    all_rating_only = pd.concat([pd.read_csv(os.path.join(input_dir, f)) for f in rating_only_files])
-    users = all_rating_only['user_id'].unique().tolist()
-    items = all_rating_only['parent_asin'].unique().tolist()
-
-    # Load review data
-    all_reviews = pd.DataFrame()
-    for f in review_files:
-        data = load_data(os.path.join(input_dir, f))
-        # Filter data based on users and items from rating-only data
-        data = data[data['user_id'].isin(users) & data['parent_asin'].isin(items)] 
-        all_reviews = pd.concat([all_reviews, data])
-    
-    # Load meta data
-    all_meta = pd.DataFrame()
-    for f in meta_files:
-        data = load_data(os.path.join(input_dir, f))
-        data = data[data['parent_asin'].isin(items)]
-        all_meta = pd.concat([all_meta, data])
-
-    return all_reviews, all_meta
-
-def load_and_process_goodreads_data(input_dir):
-    """Load and process Goodreads dataset."""
-    logging.info("Loading and processing Goodreads data...")
-    book_files = ['goodreads_books_children.json', 'goodreads_books_comics_graphic.json', 'goodreads_books_poetry.json']
-    review_files = ['goodreads_reviews_children.json', 'goodreads_reviews_comics_graphic.json', 'goodreads_reviews_poetry.json']
-    
-    all_books = pd.concat([load_data(os.path.join(input_dir, f)) for f in book_files])
-    all_reviews = pd.concat([load_data(os.path.join(input_dir, f)) for f in review_files])
-    
-    return all_books, all_reviews
+def yelp_business_chunks(input_dir, chunksize=DEFAULT_CHUNKSIZE, workers=1):
+    """Stream the Yelp businesses within the top cities."""
+    for chunk in stream_files([os.path.join(input_dir, YELP_BUSINESS_FILE)], chunksize, workers=workers):
+        yield [record for record in chunk if record.get('city') in YELP_TOP_CITIES]
 
-def merge_business_data(yelp_business, amazon_meta, goodreads_books, output_file=None):
-    """Merge business data from all sources while preserving source-specific columns."""
-    logging.info("Merging business data for business...")
-    
-    # 将Yelp数据转换为json格式
-    yelp_business = yelp_business.rename(columns={
-        'business_id': 'item_id',
-    })
-    yelp_business['source'] = 'yelp'
-    yelp_business['type'] = 'business'
-    yelp_json = json.loads(yelp_business.to_json(orient='records'))
-    
-    # 将Amazon数据转换为json格式
-    amazon_business = amazon_meta.rename(columns={
-        'parent_asin': 'item_id'
-    })
-    amazon_business['source'] = 'amazon'
-    amazon_business['type'] = 'product'
-    amazon_json = json.loads(amazon_business.to_json(orient='records'))
-    
-    # 将Goodreads数据转换为json格式
-    goodreads_business = goodreads_books.rename(columns={
-        'book_id': 'item_id', 
-    })
-    goodreads_business['source'] = 'goodreads'
-    goodreads_business['type'] = 'book'
-    goodreads_json = json.loads(goodreads_business.to_json(orient='records'))
-    
-    # 合并所有json数据
-    merged_json = yelp_json + amazon_json + goodreads_json
-    
-    # 如果指定了输出文件，则保存
-    if output_file:
-        logging.info(f"Saving merged business data to {output_file}...")
-        with open(output_file, 'w') as f:
-            for item in merged_json:
-                f.write(json.dumps(item) + '\n')
-
-def merge_review_data(yelp_reviews, amazon_reviews, goodreads_reviews, output_file=None):
-    """Merge review data from all sources while preserving source-specific columns."""
-    logging.info("Merging review data for reviews...")
-    
-    # 将Yelp评论转换为json格式
-    yelp_reviews = yelp_reviews.rename(columns={
-        'business_id': 'item_id',
-    })
-    yelp_reviews['source'] = 'yelp'
-    yelp_reviews['type'] = 'business'
-    yelp_json = json.loads(yelp_reviews.to_json(orient='records'))
-    
-    # 将Amazon评论转换为json格式
-    amazon_reviews = amazon_reviews.rename(columns={
-        'asin': 'sub_item_id',
-        'parent_asin': 'item_id',
-        'rating': 'stars',
-    })
-    amazon_reviews['review_id'] = [str(uuid.uuid4()) for _ in range(len(amazon_reviews))]
-    amazon_reviews['source'] = 'amazon'
-    amazon_reviews['type'] = 'product'
-    amazon_json = json.loads(amazon_reviews.to_json(orient='records'))
-    
-    # 将Goodreads评论转换为json格式
-    goodreads_reviews = goodreads_reviews.rename(columns={
-        'book_id': 'item_id',
-        'rating': 'stars',
-        'review_text': 'text',
-    })
-    goodreads_reviews['source'] = 'goodreads'
-    goodreads_reviews['type'] = 'book'
-    goodreads_json = json.loads(goodreads_reviews.to_json(orient='records'))
-    
-    # 合并所有json数据
-    merged_json = yelp_json + amazon_json + goodreads_json
-    
-    # 如果指定了输出文件，则保存
-    if output_file:
-        logging.info(f"Saving merged review data to {output_file}...")
-        with open(output_file, 'w') as f:
-            for item in merged_json:
-                f.write(json.dumps(item) + '\n')
-
-def create_unified_users(yelp_users, amazon_reviews, goodreads_reviews, output_file=None):
-    """Create unified user data while preserving Yelp-specific user information."""
-    logging.info("Merging users...")
-    
-    # 将Yelp用户数据转换为json格式
-    yelp_users['source'] = 'yelp'
-    yelp_json = json.loads(yelp_users.to_json(orient='records'))
-    
-    # 创建Amazon用户数据并转换为json格式
-    amazon_users = pd.DataFrame({
-        'user_id': amazon_reviews['user_id'].unique(),
-        'source': 'amazon'
-    })
-    amazon_json = json.loads(amazon_users.to_json(orient='records'))
-    
-    # 创建Goodreads用户数据并转换为json格式
-    goodreads_users = pd.DataFrame({
-        'user_id': goodreads_reviews['user_id'].unique(),
-        'source': 'goodreads'
-    })
-    goodreads_json = json.loads(goodreads_users.to_json(orient='records'))
-    
-    # 合并所有json数据
-    merged_json = yelp_json + amazon_json + goodreads_json
-    
-    # 如果指定了输出文件，则保存
-    if output_file:
-        logging.info(f"Saving merged user data to {output_file}...")
-        with open(output_file, 'w') as f:
-            for item in merged_json:
-                f.write(json.dumps(item) + '\n')
+def yelp_review_chunks(input_dir, business_ids, chunksize=DEFAULT_CHUNKSIZE, workers=1):
+    """Stream the Yelp reviews of the given businesses."""
+    yield from stream_files([os.path.join(input_dir, YELP_REVIEW_FILE)], chunksize, {'business_id': business_ids}, workers)
+
+def yelp_user_chunks(input_dir, user_ids, chunksize=DEFAULT_CHUNKSIZE, workers=1):
+    """Stream the given Yelp users."""
+    yield from stream_files([os.path.join(input_dir, YELP_USER_FILE)], chunksize, {'user_id': user_ids}, workers)
+
+def _rating_only_ids(file_path, chunksize):
+    """Unique user and item IDs of one rating-only csv file."""
+    users = []
+    items = []
+    # Only the ID columns of the rating-only data are needed
+    for chunk in pd.read_csv(file_path, usecols=['user_id', 'parent_asin'], dtype=str, chunksize=chunksize):
+        users.append(chunk['user_id'].unique())
+        items.append(chunk['parent_asin'].unique())
+    return users, items
+
+def amazon_rating_only_ids(input_dir, chunksize=DEFAULT_CHUNKSIZE, workers=1):
+    """ID indexes of the users and items in the Amazon rating-only data."""
+    # Read the rating-only files concurrently, then build each ID index from a single concatenation
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(AMAZON_RATING_ONLY_FILES)))) as executor:
+        results = list(executor.map(
+            lambda f: _rating_only_ids(os.path.join(input_dir, f), chunksize), AMAZON_RATING_ONLY_FILES))
+    users = id_index(np.concatenate([ids for file_users, _ in results for ids in file_users]))
+    items = id_index(np.concatenate([ids for _, file_items in results for ids in file_items]))
+    logging.info(f"Amazon rating-only data: {len(users)} users, {len(items)} items")
+    return users, items
+
+def amazon_review_chunks(input_dir, users, items, chunksize=DEFAULT_CHUNKSIZE, workers=1):
+    """Stream the Amazon reviews written by the given users about the given items."""
+    yield from stream_files([os.path.join(input_dir, f) for f in AMAZON_REVIEW_FILES], chunksize,
+                            {'user_id': users, 'parent_asin': items}, workers)
+
+def amazon_meta_chunks(input_dir, items, chunksize=DEFAULT_CHUNKSIZE, workers=1):
+    """Stream the metadata of the given Amazon items."""
+    yield from stream_files([os.path.join(input_dir, f) for f in AMAZON_META_FILES], chunksize,
+                            {'parent_asin': items}, workers)
+
+def goodreads_book_chunks(input_dir, chunksize=DEFAULT_CHUNKSIZE, workers=1):
+    """Stream all Goodreads books."""
+    yield from stream_files([os.path.join(input_dir, f) for f in GOODREADS_BOOK_FILES], chunksize, workers=workers)
+
+def goodreads_review_chunks(input_dir, chunksize=DEFAULT_CHUNKSIZE, workers=1):
+    """Stream all Goodreads reviews."""
+    yield from stream_files([os.path.join(input_dir, f) for f in GOODREADS_REVIEW_FILES], chunksize, workers=workers)
+
+def collect_ids(chunks, column, ids):
+    """Pass chunks through, adding the values of a field to the dict ids in order of first appearance."""
+    for chunk in chunks:
+        ids.update(dict.fromkeys(record.get(column) for record in chunk))
+        yield chunk
+
+def renamed(record, renames):
+    """Copy of a record with its fields renamed in place."""
+    return {renames.get(key, key): value for key, value in record.items()}
+
+def rename_items(chunks, source):
+    """Rename the fields of a source's items to the unified schema."""
+    for chunk in as_chunks(chunks):
+        yield [{**renamed(record, ITEM_RENAMES[source]), 'source': source, 'type': SOURCE_TYPES[source]} for record in chunk]
+
+# Two hex digits per byte value, to format 64-bit hashes without a Python loop
+_HEX_BYTES = np.array([f'{i:02x}' for i in range(256)])
+# Text of a missing key value; cannot occur in JSON text
+_NULL_KEY = '\x00'
+
+def _key_value_text(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def key_text(values):
+    """
+    Text form of a key column that does not depend on the dtype pandas inferred for the chunk:
+    a single null or float turns an integer column into float64, so integral floats are written
+    as integers and nulls as _NULL_KEY.
+    """
+    missing = values.isna().to_numpy()
+    if pd.api.types.is_float_dtype(values):
+        integral = ~missing & (values.to_numpy() % 1 == 0)
+        text = values.astype(str).to_numpy(dtype=object)
+        text[integral] = values[integral].astype('int64').astype(str).to_numpy(dtype=object)
+    elif pd.api.types.is_object_dtype(values):
+        text = values.map(_key_value_text).to_numpy(dtype=object)
+    else:
+        text = values.astype(str).to_numpy(dtype=object)
+    text[missing] = _NULL_KEY
+    return text
+
+class ReviewIds:
+    """
+    Deterministic review IDs for a stream of review chunks: the 16 hex digits of a 64-bit hash of
+    the key columns. The n-th repeat of a key in the stream (n >= 1) gets the suffix '-n', so the
+    same input always yields the same IDs.
+    """
+
+    def __init__(self, key_columns):
+        self.key_columns = key_columns
+        # Sorted hashes seen in earlier chunks, and the number of repeats of those seen more than once
+        self.seen = np.empty(0, dtype=np.uint64)
+        self.repeats = {}
+
+    def assign(self, chunk):
+        keys = pd.DataFrame({
+            column: key_text(pd.Series([record.get(column) for record in chunk], dtype=object))
+            for column in self.key_columns
+        })
+        hashes = pd.util.hash_pandas_object(keys, index=False).to_numpy()
+        octets = hashes.astype('>u8').view(np.uint8).reshape(-1, 8)
+        ids = _HEX_BYTES[octets].view('<U16').ravel().astype(object)
+        if not len(hashes):
+            return ids
+
+        # Occurrences of each hash in earlier chunks
+        uniques, inverse, counts = np.unique(hashes, return_inverse=True, return_counts=True)
+        positions = np.searchsorted(self.seen, uniques)
+        found = positions < len(self.seen)
+        found[found] = self.seen[positions[found]] == uniques[found]
+        before = found.astype(np.int64)
+        for k in np.flatnonzero(found):
+            before[k] += self.repeats.get(int(uniques[k]), 0)
+        occurrences = before[inverse]
+        # plus earlier occurrences in this chunk
+        if counts.max() > 1:
+            order = np.argsort(inverse, kind='stable')
+            ranks = np.empty(len(hashes), dtype=np.int64)
+            ranks[order] = np.arange(len(hashes)) - np.repeat(np.cumsum(counts) - counts, counts)
+            occurrences += ranks
+        for i in np.flatnonzero(occurrences):
+            ids[i] = f'{ids[i]}-{occurrences[i]}'
+
+        totals = before + counts
+        for k in np.flatnonzero(totals > 1):
+            self.repeats[int(uniques[k])] = int(totals[k] - 1)
+        self.seen = np.insert(self.seen, positions[~found], uniques[~found])
+        return ids
+
+def rename_reviews(chunks, source):
+    """Rename the fields of a source's reviews to the unified schema."""
+    # Amazon reviews have no ID; derive a stable one from who reviewed what, and when
+    review_ids = ReviewIds(['user_id', 'item_id', 'timestamp']) if source == 'amazon' else None
+    for chunk in as_chunks(chunks):
+        chunk = [renamed(record, REVIEW_RENAMES[source]) for record in chunk]
+        if review_ids is not None:
+            for record, review_id in zip(chunk, review_ids.assign(chunk)):
+                record['review_id'] = review_id
+        for record in chunk:
+            record['source'] = source
+            record['type'] = SOURCE_TYPES[source]
+        yield chunk
+
+def rename_users(chunks, source):
+    """Tag a source's user records with the source."""
+    for chunk in as_chunks(chunks):
+        yield [{**record, 'source': source} for record in chunk]
+
+def id_only_users(ids, source, chunksize=DEFAULT_CHUNKSIZE):
+    """User records of a source that only provides user IDs."""
+    ids = list(ids)
+    for start in range(0, len(ids), chunksize):
+        yield [{'user_id': user_id, 'source': source} for user_id in ids[start:start + chunksize]]
+
+def _write_json_atomic(path, data):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump(data, file, indent=2)
+    os.replace(tmp_path, path)
+
+def _read_json(path):
+    try:
+        with open(path, 'r') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+class StageCache:
+    """
+    Outputs of the pipeline stages under cache_dir.
+
+    A stage writes <name>.jsonl with its records and, if later stages need them, <name>.ids with
+    the IDs of one column. Both are written to temporary files and renamed; the manifest
+    <name>.manifest.json is written last and marks the stage as complete. The manifest holds the
+    stage key: a hash of the stage parameters, the content hashes of its input files and the keys
+    of the stages it reads. A stage runs only if its key changed, so reruns redo only stale stages
+    and an interrupted run resumes after the last completed stage.
+    """
+
+    def __init__(self, cache_dir, rebuild=False):
+        self.cache_dir = cache_dir
+        self.rebuild = rebuild
+        os.makedirs(cache_dir, exist_ok=True)
+        self.file_hashes_path = os.path.join(cache_dir, 'file_hashes.json')
+        self.file_hashes = _read_json(self.file_hashes_path) or {}
+        self.keys = {}
+
+    def path(self, name, suffix):
+        return os.path.join(self.cache_dir, name + suffix)
+
+    def file_digest(self, file_path):
+        """Content hash of an input file, recomputed only when its size or mtime changes."""
+        stat = os.stat(file_path)
+        abs_path = os.path.abspath(file_path)
+        entry = self.file_hashes.get(abs_path)
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return entry['sha256']
+        logging.info(f"Hashing {file_path}...")
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 24), b''):
+                digest.update(block)
+        self.file_hashes[abs_path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest.hexdigest()}
+        _write_json_atomic(self.file_hashes_path, self.file_hashes)
+        return digest.hexdigest()
+
+    def stage_key(self, name, params=None, input_files=(), upstream=()):
+        """Hash of everything that determines the output of a stage."""
+        payload = {
+            'version': CACHE_VERSION,
+            'stage': name,
+            'params': params or {},
+            'inputs': {os.path.basename(f): self.file_digest(f) for f in input_files},
+            'upstream': {stage: self.keys[stage] for stage in upstream},
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def is_fresh(self, name, key, outputs):
+        if self.rebuild:
+            return False
+        manifest = _read_json(self.path(name, '.manifest.json'))
+        return manifest is not None and manifest.get('key') == key and all(os.path.exists(p) for p in outputs)
+
+    def complete(self, name, key, outputs, **stats):
+        _write_json_atomic(self.path(name, '.manifest.json'), {'key': key, 'outputs': outputs, **stats})
+
+    def run(self, name, make_chunks, params=None, input_files=(), upstream=(), id_column=None):
+        """
+        Run a stage unless its cached output is fresh.
+
+        Args:
+            name: Stage name, '<table>-<source>'
+            make_chunks: Function returning the stage's record chunks; only called if the stage is stale
+            params: Parameters that change the stage output
+            input_files: Raw files read by the stage
+            upstream: Names of the stages whose outputs the stage reads
+            id_column: Column whose values, in order of first appearance, are saved for later stages
+
+        Returns:
+            bool: Whether the stage ran
+        """
+        key = self.stage_key(name, params, input_files, upstream)
+        self.keys[name] = key
+        records_path = self.path(name, '.jsonl')
+        ids_path = self.path(name, '.ids')
+        outputs = [records_path] + ([ids_path] if id_column else [])
+        if self.is_fresh(name, key, outputs):
+            logging.info(f"Stage {name} is up to date.")
+            return False
+
+        logging.info(f"Running stage {name}...")
+        start = time.perf_counter()
+        ids = {}
+        chunks = make_chunks()
+        if id_column:
+            chunks = collect_ids(chunks, id_column, ids)
+        with open(f'{records_path}.tmp', 'w') as file, tqdm(desc=f"Stage {name}", unit=" records") as progress:
+            count = write_chunks(chunks, file, progress)
+        if id_column:
+            with open(f'{ids_path}.tmp', 'w') as file:
+                for value in ids:
+                    file.write(json.dumps(value) + '\n')
+            os.replace(f'{ids_path}.tmp', ids_path)
+        os.replace(f'{records_path}.tmp', records_path)
+        elapsed = time.perf_counter() - start
+        self.complete(name, key, outputs, records=count, seconds=round(elapsed, 3))
+        logging.info(f"Stage {name}: {count} records in {elapsed:.1f}s.")
+        return True
+
+    def read_ids(self, name):
+        """IDs saved by a completed stage."""
+        with open(self.path(name, '.ids'), 'r') as file:
+            return [json.loads(line) for line in file]
+
+    def assemble(self, table, output_file=None, parquet_dir=None, chunksize=DEFAULT_CHUNKSIZE):
+        """
+        Write stage: concatenate the records of the table's source stages into the output files.
+
+        Returns:
+            bool: Whether the outputs were written
+        """
+        name = f'output-{table}'
+        stages = [f'{table}-{source}' for source in SOURCES]
+        outputs = ([output_file] if output_file else []) + ([os.path.join(parquet_dir, table)] if parquet_dir else [])
+        params = {'outputs': [os.path.abspath(p) for p in outputs]}
+        key = self.stage_key(name, params, upstream=stages)
+        self.keys[name] = key
+        if self.is_fresh(name, key, outputs):
+            logging.info(f"{', '.join(outputs)} up to date.")
+            return False
+
+        logging.info(f"Saving {', '.join(outputs)}...")
+        start = time.perf_counter()
+        if output_file:
+            with open(f'{output_file}.tmp', 'wb') as file:
+                for stage in stages:
+                    with open(self.path(stage, '.jsonl'), 'rb') as part:
+                        shutil.copyfileobj(part, file, 1 << 24)
+            os.replace(f'{output_file}.tmp', output_file)
+        if parquet_dir:
+            sink = ParquetSink(parquet_dir, table)
+            try:
+                for source, stage in zip(SOURCES, stages):
+                    for block in read_line_blocks(self.path(stage, '.jsonl'), chunksize):
+                        sink.write(source, parse_records(block))
+            finally:
+                sink.close()
+        elapsed = time.perf_counter() - start
+        self.complete(name, key, outputs, seconds=round(elapsed, 3))
+        logging.info(f"{', '.join(outputs)} saved in {elapsed:.1f}s.")
+        return True
+
+def build_dataset(input_dir, output_dir, chunksize=DEFAULT_CHUNKSIZE, workers=1, output_format='jsonl', cache_dir=None, rebuild=False):
+    """
+    Build item.json, review.json and user.json from the raw files with cached stages.
+
+    Each table and source is one stage that loads, filters and renames the raw records and saves
+    them in cache_dir; a final stage per table writes the output files. Only stale stages run.
+
+    Args:
+        input_dir: Directory containing the raw dataset files
+        output_dir: Directory for the processed dataset
+        chunksize: Number of records processed at a time; does not change the output
+        workers: Number of processes parsing the raw files; does not change the output
+        output_format: 'jsonl', 'parquet' or 'both'
+        cache_dir: Directory for stage outputs, defaulting to <output_dir>/.cache
+        rebuild: Run every stage even if its cached output is fresh
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    cache = StageCache(cache_dir or os.path.join(output_dir, '.cache'), rebuild)
+    paths = lambda files: [os.path.join(input_dir, f) for f in files]
+
+    # The rating-only data is only read if an Amazon stage has to run
+    rating_only = {}
+    def rating_only_ids():
+        if not rating_only:
+            rating_only['users'], rating_only['items'] = amazon_rating_only_ids(input_dir, chunksize, workers)
+        return rating_only['users'], rating_only['items']
+
+    # Yelp: reviews of businesses in the top cities, and their users
+    cache.run('item-yelp', lambda: rename_items(yelp_business_chunks(input_dir, chunksize, workers), 'yelp'),
+              params={'top_cities': YELP_TOP_CITIES}, input_files=paths([YELP_BUSINESS_FILE]), id_column='item_id')
+    cache.run('review-yelp', lambda: rename_reviews(yelp_review_chunks(input_dir, cache.read_ids('item-yelp'), chunksize, workers), 'yelp'),
+              input_files=paths([YELP_REVIEW_FILE]), upstream=['item-yelp'], id_column='user_id')
+    cache.run('user-yelp', lambda: rename_users(yelp_user_chunks(input_dir, cache.read_ids('review-yelp'), chunksize, workers), 'yelp'),
+              input_files=paths([YELP_USER_FILE]), upstream=['review-yelp'])
+
+    # Amazon: reviews and metadata of the users and items in the rating-only data
+    cache.run('item-amazon', lambda: rename_items(amazon_meta_chunks(input_dir, rating_only_ids()[1], chunksize, workers), 'amazon'),
+              input_files=paths(AMAZON_RATING_ONLY_FILES + AMAZON_META_FILES))
+    cache.run('review-amazon', lambda: rename_reviews(amazon_review_chunks(input_dir, *rating_only_ids(), chunksize, workers), 'amazon'),
+              input_files=paths(AMAZON_RATING_ONLY_FILES + AMAZON_REVIEW_FILES), id_column='user_id')
+    cache.run('user-amazon', lambda: id_only_users(cache.read_ids('review-amazon'), 'amazon', chunksize),
+              upstream=['review-amazon'])
+
+    # Goodreads: all books and reviews
+    cache.run('item-goodreads', lambda: rename_items(goodreads_book_chunks(input_dir, chunksize, workers), 'goodreads'),
+              input_files=paths(GOODREADS_BOOK_FILES))
+    cache.run('review-goodreads', lambda: rename_reviews(goodreads_review_chunks(input_dir, chunksize, workers), 'goodreads'),
+              input_files=paths(GOODREADS_REVIEW_FILES), id_column='user_id')
+    cache.run('user-goodreads', lambda: id_only_users(cache.read_ids('review-goodreads'), 'goodreads', chunksize),
+              upstream=['review-goodreads'])
+
+    parquet_dir = os.path.join(output_dir, 'parquet') if output_format in ('parquet', 'both') else None
+    for table in ['item', 'review', 'user']:
+        output_file = os.path.join(output_dir, f'{table}.json') if output_format in ('jsonl', 'both') else None
+        cache.assemble(table, output_file, parquet_dir, chunksize)
 
 def main():
     """Main function with updated processing logic."""
     parser = argparse.ArgumentParser(description="Process multiple datasets for analysis.")
     parser.add_argument('--input_dir', required=True, help="Path to the input directory containing all dataset files.")
     parser.add_argument('--output_dir', required=True, help="Path to the output directory for saving processed data.")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help="Number of records processed at a time.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Number of processes parsing the raw files (default: all cores).")
+    parser.add_argument('--format', choices=['jsonl', 'parquet', 'both'], default='jsonl',
+                        help="Write JSON lines files, a Parquet dataset under <output_dir>/parquet (requires pyarrow), or both.")
+    parser.add_argument('--cache_dir', default=None, help="Directory for cached stage outputs (default: <output_dir>/.cache).")
+    parser.add_argument('--rebuild', action='store_true', help="Rerun every stage, ignoring cached outputs.")
     args = parser.parse_args()
 
     # Check required files
     if not check_required_files(args.input_dir):
         return
 
-    # Process Yelp data
-    filtered_businesses, filtered_reviews, filtered_users = load_and_process_yelp_data(args.input_dir)
-    
-    # Process Amazon data
-    amazon_reviews, amazon_meta = load_and_process_amazon_data(args.input_dir)
-    
-    # Process Goodreads data
-    goodreads_books, goodreads_reviews = load_and_process_goodreads_data(args.input_dir)
-    
-    # Merge all data
-    os.makedirs(args.output_dir, exist_ok=True)
-    merge_business_data(filtered_businesses, amazon_meta, goodreads_books, os.path.join(args.output_dir, 'item.json'))
-    merge_review_data(filtered_reviews, amazon_reviews, goodreads_reviews, os.path.join(args.output_dir, 'review.json'))
-    create_unified_users(filtered_users, amazon_reviews, goodreads_reviews, os.path.join(args.output_dir, 'user.json'))
+    # Stages whose inputs and parameters are unchanged since the last run are skipped
+    build_dataset(args.input_dir, args.output_dir, args.chunksize, args.workers, args.format, args.cache_dir, args.rebuild)
 
     logging.info("Data processing completed successfully.")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
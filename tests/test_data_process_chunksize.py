@@ -0,0 +1,42 @@
+import json
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import benchmark_data_process  # noqa: E402
+import data_process  # noqa: E402
+
+# Records whose keys differ from their neighbours'
+IRREGULAR_BOOKS = [
+    {'book_id': 'irregular1', 'title': 'no rating'},
+    {'book_id': 'irregular2', 'extra': 1, 'title': 'extra', 'average_rating': '4.1'},
+]
+
+
+def _read_lines(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_build_dataset_output_does_not_depend_on_chunksize(tmp_path):
+    raw_dir = str(tmp_path / 'raw')
+    os.makedirs(raw_dir)
+    benchmark_data_process.generate_raw_data(raw_dir, 30)
+    with open(os.path.join(raw_dir, 'goodreads_books_poetry.json'), 'a') as f:
+        for book in IRREGULAR_BOOKS:
+            f.write(json.dumps(book) + '\n')
+
+    outputs = {}
+    for chunksize in (1, 1000):
+        output_dir = str(tmp_path / f'out{chunksize}')
+        data_process.build_dataset(raw_dir, output_dir, chunksize=chunksize)
+        outputs[chunksize] = {table: _read_lines(os.path.join(output_dir, f'{table}.json')) for table in ['item', 'review', 'user']}
+
+    assert outputs[1] == outputs[1000]
+    items = {item['item_id']: item for item in map(json.loads, outputs[1]['item'].splitlines())}
+    # Each record keeps its own keys, their order and value types
+    assert items['irregular1'] == {'item_id': 'irregular1', 'title': 'no rating', 'source': 'goodreads', 'type': 'book'}
+    assert list(items['irregular2']) == ['item_id', 'extra', 'title', 'average_rating', 'source', 'type']
+    assert isinstance(items['irregular2']['extra'], int)
@@ -0,0 +1,53 @@
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import benchmark_data_process  # noqa: E402
+import data_process  # noqa: E402
+
+
+def test_filter_chunk_keeps_records_in_every_index():
+    chunk = [
+        {'user_id': 'u1', 'parent_asin': 'p1'},
+        {'user_id': 'u1', 'parent_asin': 'p2'},
+        {'user_id': 'u2', 'parent_asin': 'p1'},
+        {'parent_asin': 'p1'},
+        {'user_id': 'u3', 'parent_asin': 'p3'},
+    ]
+    filters = {'user_id': data_process.id_index({'u1', 'u3'}), 'parent_asin': data_process.id_index(['p1', 'p3', 'p1'])}
+    assert data_process.filter_chunk(chunk, filters) == [chunk[0], chunk[4]]
+    assert data_process.filter_chunk(chunk, {}) == chunk
+
+
+def test_rating_only_ids_are_unique_across_files(tmp_path):
+    benchmark_data_process.generate_raw_data(str(tmp_path), 200)
+    users, items = data_process.amazon_rating_only_ids(str(tmp_path), chunksize=50, workers=3)
+    assert users.is_unique and items.is_unique
+    expected_users, expected_items = set(), set()
+    for filename in data_process.AMAZON_RATING_ONLY_FILES:
+        with open(tmp_path / filename) as f:
+            next(f)
+            for line in f:
+                user_id, parent_asin = line.split(',')[:2]
+                expected_users.add(user_id)
+                expected_items.add(parent_asin)
+    assert set(users) == expected_users
+    assert set(items) == expected_items
+
+
+def test_parallel_streaming_matches_serial(tmp_path):
+    benchmark_data_process.generate_raw_data(str(tmp_path), 200)
+    users, items = data_process.amazon_rating_only_ids(str(tmp_path))
+    file_paths = [str(tmp_path / filename) for filename in data_process.AMAZON_REVIEW_FILES]
+    filters = {'user_id': users, 'parent_asin': items}
+
+    def stream(workers):
+        chunks = data_process.stream_files(file_paths, chunksize=37, filters=filters, workers=workers)
+        return [record for chunk in chunks for record in chunk]
+
+    serial = stream(1)
+    assert serial
+    assert all(record['user_id'] in set(users) and record['parent_asin'] in set(items) for record in serial)
+    assert stream(2) == serial
@@ -0,0 +1,54 @@
+import json
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# `import websocietysimulator` plus InteractionTool must stay sub-second
+IMPORT_BUDGET_SECONDS = 1.0
+
+# Dependencies that must only be imported when the feature using them is
+HEAVY_MODULES = [
+    'torch',
+    'transformers',
+    'sentence_transformers',
+    'scipy',
+    'pandas',
+    'pyarrow',
+    'langchain',
+    'langchain_core',
+    'langchain_chroma',
+    'chromadb',
+    'openai',
+    'nltk',
+]
+
+IMPORT_SCRIPT = f"""
+import json, sys, time
+start = time.perf_counter()
+import websocietysimulator
+from websocietysimulator.tools import InteractionTool
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'loaded': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def _import_in_fresh_interpreter():
+    env = dict(os.environ)
+    env['PYTHONPATH'] = REPO_ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    result = subprocess.run(
+        [sys.executable, '-c', IMPORT_SCRIPT],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_import_does_not_load_heavy_dependencies():
+    assert _import_in_fresh_interpreter()['loaded'] == []
+
+
+def test_import_time_budget():
+    # The first run may compile bytecode; take the best of a few runs
+    seconds = min(_import_in_fresh_interpreter()['seconds'] for _ in range(3))
+    assert seconds < IMPORT_BUDGET_SECONDS, f"import took {seconds:.2f}s, budget is {IMPORT_BUDGET_SECONDS}s"
@@ -0,0 +1,130 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from websocietysimulator.llm import CoalescingLLM, LLMBase  # noqa: E402
+
+MESSAGES = [{'role': 'user', 'content': 'hi'}]
+CALLERS = 8
+
+
+class BlockingLLM(LLMBase):
+    """Returns once released, so that concurrent callers overlap"""
+
+    def __init__(self, error=None):
+        super().__init__('fake')
+        self.error = error
+        self.calls = 0
+        self.release = threading.Event()
+
+    def __call__(self, messages, model=None, temperature=0.0, max_tokens=500, stop_strs=None, n=1):
+        self.calls += 1
+        assert self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return f"response {self.calls}"
+
+    async def acall(self, messages, model=None, temperature=0.0, max_tokens=500, stop_strs=None, n=1):
+        self.calls += 1
+        while not self.release.is_set():
+            await asyncio.sleep(0.001)
+        if self.error is not None:
+            raise self.error
+        return f"response {self.calls}"
+
+
+def _wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def _call_concurrently(coalescing, llm, temperature=0.0):
+    results = [None] * CALLERS
+
+    def call(i):
+        try:
+            results[i] = coalescing(MESSAGES, temperature=temperature)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(CALLERS)]
+    for thread in threads:
+        thread.start()
+    _wait_until(lambda: sum(coalescing.stats().values()) == CALLERS)
+    llm.release.set()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_identical_calls_make_one_upstream_call():
+    llm = BlockingLLM()
+    coalescing = CoalescingLLM(llm)
+    results = _call_concurrently(coalescing, llm)
+    assert llm.calls == 1
+    assert results == ['response 1'] * CALLERS
+    assert coalescing.stats() == {'calls': 1, 'calls_saved': CALLERS - 1}
+    # Once the call has finished, the next one goes upstream again
+    assert coalescing(MESSAGES) == 'response 2'
+
+
+def test_concurrent_callers_share_the_exception():
+    llm = BlockingLLM(error=RuntimeError("upstream failed"))
+    coalescing = CoalescingLLM(llm)
+    results = _call_concurrently(coalescing, llm)
+    assert llm.calls == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_nondeterministic_calls_are_not_coalesced():
+    llm = BlockingLLM()
+    llm.release.set()
+    coalescing = CoalescingLLM(llm)
+    for _ in range(3):
+        coalescing(MESSAGES, temperature=0.7)
+    assert llm.calls == 3
+    assert coalescing.stats() == {'calls': 0, 'calls_saved': 0}
+
+
+def test_concurrent_identical_async_calls_make_one_upstream_call():
+    llm = BlockingLLM()
+    coalescing = CoalescingLLM(llm)
+
+    async def run():
+        tasks = [asyncio.ensure_future(coalescing.acall(MESSAGES)) for _ in range(CALLERS)]
+        while sum(coalescing.stats().values()) < CALLERS:
+            await asyncio.sleep(0.001)
+        llm.release.set()
+        return await asyncio.gather(*tasks)
+
+    assert asyncio.run(run()) == ['response 1'] * CALLERS
+    assert llm.calls == 1
+    assert coalescing.stats() == {'calls': 1, 'calls_saved': CALLERS - 1}
+
+
+def test_cancelled_async_waiter_does_not_cancel_the_shared_call():
+    llm = BlockingLLM()
+    coalescing = CoalescingLLM(llm)
+
+    async def run():
+        leader = asyncio.ensure_future(coalescing.acall(MESSAGES))
+        waiter = asyncio.ensure_future(coalescing.acall(MESSAGES))
+        while sum(coalescing.stats().values()) < 2:
+            await asyncio.sleep(0.001)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        llm.release.set()
+        return await leader
+
+    assert asyncio.run(run()) == 'response 1'
+    assert llm.calls == 1
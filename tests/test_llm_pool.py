@@ -0,0 +1,100 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from websocietysimulator.llm import LLMBase, LLMPool  # noqa: E402
+from websocietysimulator.llm.llm_pool import is_failover_error  # noqa: E402
+
+
+class APIStatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"Error code: {status_code}")
+        self.status_code = status_code
+
+
+class APIConnectionError(Exception):
+    pass
+
+
+class FakeLLM(LLMBase):
+    def __init__(self, error=None, response='ok'):
+        super().__init__('fake')
+        self.error = error
+        self.response = response
+        self.calls = 0
+
+    def __call__(self, messages, model=None, temperature=0.0, max_tokens=500, stop_strs=None, n=1):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return self.response
+
+    async def acall(self, messages, model=None, temperature=0.0, max_tokens=500, stop_strs=None, n=1):
+        return self(messages)
+
+
+MESSAGES = [{'role': 'user', 'content': 'hi'}]
+
+
+def test_failover_errors_are_classified_by_status_and_transport():
+    for status_code in (408, 429, 500, 502, 503):
+        assert is_failover_error(APIStatusError(status_code))
+    for status_code in (400, 401, 404, 422):
+        assert not is_failover_error(APIStatusError(status_code))
+    assert is_failover_error(APIConnectionError())
+    assert is_failover_error(ConnectionResetError())
+    assert is_failover_error(TimeoutError())
+    assert not is_failover_error(ValueError("invalid request"))
+
+
+@pytest.mark.parametrize('status_code', [429, 500, 503])
+def test_pool_fails_over_on_429_and_5xx(status_code):
+    failing, healthy = FakeLLM(APIStatusError(status_code)), FakeLLM(response='from healthy')
+    pool = LLMPool([failing, healthy])
+    assert pool(MESSAGES) == 'from healthy'
+    assert failing.calls == 1
+    assert healthy.calls == 1
+    assert [stats['errors'] for stats in pool.stats()] == [1, 0]
+
+
+def test_pool_fails_over_on_transport_errors_async():
+    failing, healthy = FakeLLM(APIConnectionError()), FakeLLM(response='from healthy')
+    pool = LLMPool([failing, healthy])
+    assert asyncio.run(pool.acall(MESSAGES)) == 'from healthy'
+    assert (failing.calls, healthy.calls) == (1, 1)
+
+
+@pytest.mark.parametrize('status_code', [400, 404])
+def test_pool_raises_4xx_without_failover(status_code):
+    failing, healthy = FakeLLM(APIStatusError(status_code)), FakeLLM()
+    pool = LLMPool([failing, healthy], max_consecutive_errors=1)
+    with pytest.raises(APIStatusError):
+        pool(MESSAGES)
+    assert healthy.calls == 0
+    # The request was at fault, so the member stays healthy
+    assert pool.stats()[0]['healthy']
+
+
+def test_pool_raises_when_every_member_fails():
+    members = [FakeLLM(APIStatusError(503)) for _ in range(3)]
+    pool = LLMPool(members)
+    with pytest.raises(APIStatusError):
+        pool(MESSAGES)
+    assert [member.calls for member in members] == [1, 1, 1]
+
+
+def test_member_is_skipped_after_consecutive_failures():
+    failing, healthy = FakeLLM(APIStatusError(502)), FakeLLM()
+    pool = LLMPool([failing, healthy], max_consecutive_errors=2, cooldown_seconds=60)
+    for _ in range(4):
+        assert pool(MESSAGES) == 'ok'
+    assert not pool.stats()[0]['healthy']
+    calls = failing.calls
+    for _ in range(4):
+        assert pool(MESSAGES) == 'ok'
+    assert failing.calls == calls
@@ -0,0 +1,55 @@
+import json
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import benchmark_data_process  # noqa: E402
+import data_process  # noqa: E402
+from websocietysimulator.tools import InteractionTool, ParquetInteractionTool  # noqa: E402
+
+pytest.importorskip('pyarrow')
+
+# Records with nulls, fields out of the usual order, and values not of their typed column's type
+IRREGULAR_BOOKS = [
+    {'book_id': 'irregular1', 'title': None, 'extra': 1},
+    {'book_id': 7, 'title': 'integer id'},
+]
+IRREGULAR_REVIEWS = [
+    {'user_id': 'g1', 'text': None, 'book_id': 'irregular1', 'review_id': 'irregular-review', 'rating': 4.5},
+]
+
+
+def test_parquet_records_equal_json_records(tmp_path):
+    raw_dir = str(tmp_path / 'raw')
+    os.makedirs(raw_dir)
+    benchmark_data_process.generate_raw_data(raw_dir, 30)
+    with open(os.path.join(raw_dir, 'goodreads_books_poetry.json'), 'a') as f:
+        for book in IRREGULAR_BOOKS:
+            f.write(json.dumps(book) + '\n')
+    with open(os.path.join(raw_dir, 'goodreads_reviews_poetry.json'), 'a') as f:
+        for review in IRREGULAR_REVIEWS:
+            f.write(json.dumps(review) + '\n')
+    output_dir = str(tmp_path / 'out')
+    data_process.build_dataset(raw_dir, output_dir, output_format='both')
+
+    expected = InteractionTool(output_dir)
+    actual = ParquetInteractionTool(output_dir)
+    # Compared as JSON text, so key order and value types must match as well
+    dump = json.dumps
+    item_ids = [item_id for item_id in expected.item_data if isinstance(item_id, str)]
+    for item_id in item_ids + ['missing']:
+        assert dump(actual.get_item(item_id)) == dump(expected.get_item(item_id))
+    for user_id in list(expected.user_data) + ['missing']:
+        assert dump(actual.get_user(user_id)) == dump(expected.get_user(user_id))
+        assert dump(actual.get_reviews(user_id=user_id)) == dump(expected.get_reviews(user_id=user_id))
+    for review_id in list(expected.review_data) + ['missing']:
+        assert dump(actual.get_reviews(review_id=review_id)) == dump(expected.get_reviews(review_id=review_id))
+    for item_id in item_ids:
+        assert dump(actual.get_reviews(item_id=item_id)) == dump(expected.get_reviews(item_id=item_id))
+    # IDs are looked up by their text, and returned with their original type
+    assert dump(actual.get_item('7')) == dump(expected.get_item(7))
+    assert actual.get_reviews(review_id='irregular-review')[0]['text'] is None
@@ -0,0 +1,117 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from websocietysimulator.llm.rate_limiter import RateLimiter, TokenBucket  # noqa: E402
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+def _wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def test_token_bucket_refills_at_its_rate():
+    # 60 per minute: one per second, ten seconds of burst
+    bucket = TokenBucket(60, burst_seconds=10)
+    now = bucket.updated
+    assert bucket.wait_time(10, now) == 0.0
+    bucket.take(10)
+    assert bucket.wait_time(1, now) == 1.0
+    assert bucket.wait_time(1, now + 0.5) == 0.5
+    assert bucket.wait_time(3, now + 3) == 0.0
+    # Refills stop at the capacity
+    assert bucket.wait_time(10, now + 60) == 0.0
+    bucket.take(10)
+    assert bucket.wait_time(1, now + 60) == 1.0
+
+
+def test_token_bucket_oversized_request_waits_for_a_full_bucket_and_is_paid_back():
+    bucket = TokenBucket(60, burst_seconds=10)
+    now = bucket.updated
+    assert bucket.wait_time(25, now) == 0.0
+    bucket.take(25)
+    # 15 tokens of debt plus one token
+    assert bucket.wait_time(1, now) == 16.0
+
+
+def test_request_quota_delays_requests_beyond_the_burst():
+    # 600 per minute: ten per second, a burst of 100
+    limiter = RateLimiter(requests_per_minute=600)
+    start = time.monotonic()
+    for _ in range(102):
+        with limiter.limit():
+            pass
+    assert time.monotonic() - start >= 0.15
+
+
+def test_concurrency_limit_halves_on_429_and_grows_on_success():
+    limiter = RateLimiter(pause_seconds=0.05)
+    assert limiter.stats()['concurrency_limit'] is None
+    for _ in range(8):
+        limiter.acquire()
+    limiter.release(success=False, rate_limited=True)
+    # Unbounded until the first 429, then half of the requests that were in flight
+    assert limiter.stats() == {'concurrency_limit': 4, 'in_flight': 7, 'waiting': 0, 'rate_limited': 1}
+    # Further 429s from requests already in flight count as the same signal
+    limiter.release(success=False, rate_limited=True)
+    assert limiter.stats()['concurrency_limit'] == 4
+    for _ in range(6):
+        limiter.release()
+    # Additive increase: 1/limit per success
+    assert limiter.stats()['concurrency_limit'] == 5
+    assert limiter.stats()['in_flight'] == 0
+
+    time.sleep(0.1)
+    limiter.acquire()
+    limiter.release(success=False, rate_limited=True)
+    assert limiter.stats()['concurrency_limit'] == 1
+    assert limiter.stats()['rate_limited'] == 3
+
+
+def test_limit_releases_with_rate_limited_on_429():
+    limiter = RateLimiter(max_concurrency=4, pause_seconds=0.05)
+    with pytest.raises(RateLimitError):
+        with limiter.limit():
+            raise RateLimitError("429 Too Many Requests")
+    # Half of the one request in flight, but never below min_concurrency
+    assert limiter.stats() == {'concurrency_limit': 1, 'in_flight': 0, 'waiting': 0, 'rate_limited': 1}
+    # New requests are held back until the pause ends
+    start = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - start >= 0.03
+    limiter.release()
+
+
+def test_waiters_are_served_in_arrival_order():
+    limiter = RateLimiter(max_concurrency=1)
+    limiter.acquire()
+    order = []
+
+    def work(i):
+        with limiter.limit():
+            order.append(i)
+
+    threads = []
+    for i in range(10):
+        thread = threading.Thread(target=work, args=(i,))
+        thread.start()
+        threads.append(thread)
+        # Queue each thread before starting the next
+        _wait_until(lambda: limiter.stats()['waiting'] == i + 1)
+    limiter.release()
+    for thread in threads:
+        thread.join()
+    assert order == list(range(10))
+    assert limiter.stats()['in_flight'] == 0
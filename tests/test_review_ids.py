@@ -0,0 +1,35 @@
+import json
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import data_process  # noqa: E402
+
+AMAZON_REVIEWS = [
+    {'user_id': 'u1', 'parent_asin': 'p1', 'asin': 'a1', 'rating': 5.0, 'timestamp': 1600000000000},
+    {'user_id': 'u2', 'parent_asin': 'p2', 'asin': 'a2', 'rating': 4.0, 'timestamp': None},
+    {'user_id': 'u3', 'parent_asin': 'p3', 'asin': 'a3', 'rating': 3.0, 'timestamp': 1600000000001},
+    {'user_id': 'u1', 'parent_asin': 'p1', 'asin': 'a1', 'rating': 5.0, 'timestamp': 1600000000000},
+    {'user_id': 'u4', 'parent_asin': 'p4', 'asin': 'a4', 'rating': 2.0, 'timestamp': 1600000000002},
+]
+
+
+def _review_ids(path, chunksize):
+    chunks = data_process.rename_reviews(data_process.load_data_chunks(path, chunksize), 'amazon')
+    return [review['review_id'] for chunk in chunks for review in chunk]
+
+
+def test_amazon_review_ids_do_not_depend_on_chunksize(tmp_path):
+    # Integer timestamps must hash the same whether or not the chunk also holds a missing one
+    path = str(tmp_path / 'reviews.jsonl')
+    with open(path, 'w') as f:
+        for review in AMAZON_REVIEWS:
+            f.write(json.dumps(review) + '\n')
+
+    expected = _review_ids(path, chunksize=len(AMAZON_REVIEWS))
+    for chunksize in [1, 2, 3]:
+        assert _review_ids(path, chunksize) == expected
+    assert len(set(expected)) == len(expected)
+    assert expected[3] == f'{expected[0]}-1'
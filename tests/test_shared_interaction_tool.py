@@ -0,0 +1,81 @@
+import gc
+import os
+import pickle
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from websocietysimulator.tools import InteractionTool, SharedInteractionTool  # noqa: E402
+from test_snapshot_interaction_tool import write_dataset  # noqa: E402
+
+
+def _dataset(tmp_path):
+    data_dir = str(tmp_path / 'data')
+    write_dataset(data_dir)
+    shm_dir = str(tmp_path / 'shm')
+    os.makedirs(shm_dir)
+    return data_dir, shm_dir
+
+
+def test_shared_results_equal_interaction_tool(tmp_path):
+    data_dir, shm_dir = _dataset(tmp_path)
+    expected = InteractionTool(data_dir)
+    with SharedInteractionTool(data_dir, shm_dir=shm_dir) as tool:
+        attached = pickle.loads(pickle.dumps(tool))
+        for user_id in ['u1', 'u2', 'missing']:
+            assert tool.get_user(user_id) == expected.get_user(user_id)
+            assert attached.get_reviews(user_id=user_id) == expected.get_reviews(user_id=user_id)
+        for item_id in ['i1', 'i2', 'missing']:
+            assert tool.get_item(item_id) == expected.get_item(item_id)
+            assert attached.get_reviews(item_id=item_id) == expected.get_reviews(item_id=item_id)
+        attached.close()
+
+
+def test_instances_on_the_same_data_do_not_remove_each_others_snapshot(tmp_path):
+    data_dir, shm_dir = _dataset(tmp_path)
+    first = SharedInteractionTool(data_dir, shm_dir=shm_dir)
+    second = SharedInteractionTool(data_dir, shm_dir=shm_dir)
+    assert first.snapshot_dir != second.snapshot_dir
+
+    first.close()
+    assert not os.path.exists(first.snapshot_dir)
+    assert os.path.exists(second.snapshot_dir)
+    # Workers can still attach to the remaining instance's snapshot
+    attached = pickle.loads(pickle.dumps(second))
+    assert attached.get_item('i2')['title'] == 'Book'
+    attached.close()
+
+    # A private snapshot is removed when its instance is garbage collected
+    snapshot_dir = second.snapshot_dir
+    del second
+    gc.collect()
+    assert not os.path.exists(snapshot_dir)
+    assert os.listdir(shm_dir) == []
+
+
+def test_persisted_snapshot_is_reused_and_kept(tmp_path):
+    data_dir, shm_dir = _dataset(tmp_path)
+    persisted = SharedInteractionTool(data_dir, shm_dir=shm_dir, persist=True)
+    persisted.close()
+    assert os.path.exists(persisted.snapshot_dir)
+
+    tool = SharedInteractionTool(data_dir, shm_dir=shm_dir)
+    assert tool.snapshot_dir == persisted.snapshot_dir
+    tool.close()
+    del tool
+    gc.collect()
+    assert os.path.exists(persisted.snapshot_dir)
+    assert SharedInteractionTool(data_dir, shm_dir=shm_dir).get_user('u1')['name'] == 'Ann'
+
+
+def test_attached_instance_does_not_remove_the_snapshot(tmp_path):
+    data_dir, shm_dir = _dataset(tmp_path)
+    with SharedInteractionTool(data_dir, shm_dir=shm_dir) as tool:
+        attached = SharedInteractionTool.attach(tool.snapshot_dir)
+        attached.close()
+        del attached
+        gc.collect()
+        assert os.path.exists(tool.snapshot_dir)
+        assert tool.get_reviews(review_id='r1')[0]['stars'] == 5.0
+    assert not os.path.exists(tool.snapshot_dir)
@@ -0,0 +1,83 @@
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from websocietysimulator.tools import InteractionTool, SnapshotInteractionTool, compile_snapshot  # noqa: E402
+
+ITEMS = [
+    {'item_id': 'i1', 'name': 'Café', 'stars': 4.5, 'source': 'yelp', 'type': 'business'},
+    {'item_id': 'i2', 'title': 'Book', 'source': 'goodreads', 'type': 'book'},
+    # A repeated ID: the last record wins, as in a dict built from the file
+    {'item_id': 'i1', 'name': 'Café (moved)', 'stars': 4.0, 'source': 'yelp', 'type': 'business'},
+]
+USERS = [
+    {'user_id': 'u1', 'name': 'Ann', 'source': 'yelp'},
+    {'user_id': 'u2', 'source': 'goodreads'},
+]
+REVIEWS = [
+    {'review_id': 'r1', 'user_id': 'u1', 'item_id': 'i1', 'stars': 5.0, 'text': 'Great\nplace ☕'},
+    {'review_id': 'r2', 'user_id': 'u2', 'item_id': 'i2', 'stars': 3, 'text': None},
+    {'review_id': 'r3', 'user_id': 'u1', 'item_id': 'i2', 'stars': 4, 'text': 'ok', 'extra': [1, 2]},
+    {'review_id': 'r4', 'user_id': 'u2', 'item_id': 'i1', 'stars': 2, 'text': 'meh'},
+]
+
+
+def write_dataset(data_dir):
+    os.makedirs(data_dir, exist_ok=True)
+    for filename, records in [('item.json', ITEMS), ('user.json', USERS), ('review.json', REVIEWS)]:
+        with open(os.path.join(data_dir, filename), 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+def _lookups(tool):
+    """Every lookup the tools support, as JSON text so key order and value types count"""
+    results = []
+    for item_id in ['i1', 'i2', 'missing', None, '']:
+        results.append(tool.get_item(item_id))
+        if item_id:
+            results.append(tool.get_reviews(item_id=item_id))
+    for user_id in ['u1', 'u2', 'missing']:
+        results.append(tool.get_user(user_id))
+        results.append(tool.get_reviews(user_id=user_id))
+    for review_id in ['r1', 'r2', 'r3', 'r4', 'missing']:
+        results.append(tool.get_reviews(review_id=review_id))
+    results.append(tool.get_reviews())
+    return json.dumps(results)
+
+
+def test_snapshot_results_equal_interaction_tool(tmp_path):
+    data_dir = str(tmp_path / 'data')
+    write_dataset(data_dir)
+    expected = _lookups(InteractionTool(data_dir))
+    tool = SnapshotInteractionTool(compile_snapshot(data_dir))
+    assert _lookups(tool) == expected
+    # Cached lookups give the same results
+    assert _lookups(tool) == expected
+    tool.close()
+
+
+def test_snapshot_lookups_from_many_threads(tmp_path):
+    data_dir = str(tmp_path / 'data')
+    write_dataset(data_dir)
+    expected = _lookups(InteractionTool(data_dir))
+    # A cache smaller than the working set, so threads evict each other's entries
+    tool = SnapshotInteractionTool(compile_snapshot(data_dir), cache_size=2)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: _lookups(tool), range(200)))
+    assert all(result == expected for result in results)
+
+
+def test_snapshot_is_rebuilt_when_the_dataset_changes(tmp_path):
+    data_dir = str(tmp_path / 'data')
+    write_dataset(data_dir)
+    snapshot_dir = compile_snapshot(data_dir)
+    with open(os.path.join(data_dir, 'user.json'), 'a', encoding='utf-8') as f:
+        f.write(json.dumps({'user_id': 'u3', 'source': 'amazon'}) + '\n')
+    tool = SnapshotInteractionTool(compile_snapshot(data_dir))
+    assert tool.snapshot_dir == snapshot_dir
+    assert tool.get_user('u3') == {'user_id': 'u3', 'source': 'amazon'}
@@ -1,6 +1,6 @@
 from abc import ABC, abstractmethod
 from typing import Any, Union
-from ..tools import InteractionTool, CacheInteractionTool
+from ..tools import InteractionTool, CacheInteractionTool, SnapshotInteractionTool, SharedInteractionTool, ParquetInteractionTool
 from ..llm import LLMBase
 
 class Agent(ABC):
@@ -11,7 +11,7 @@ class Agent(ABC):
         self.interaction_tool = None
         self.llm = llm
 
-    def set_interaction_tool(self, interaction_tool: Union[InteractionTool, CacheInteractionTool]):
+    def set_interaction_tool(self, interaction_tool: Union[InteractionTool, CacheInteractionTool, SnapshotInteractionTool, SharedInteractionTool, ParquetInteractionTool]):
         """
         Set the interaction tool for the agent.
         Args:
@@ -26,5 +26,9 @@ class Agent(ABC):
 
     @abstractmethod
     def workflow(self) -> Any:
-        """Abstract forward method for evaluation."""
+        """
+        Abstract forward method for evaluation.
+        It may also be defined as `async def workflow`, using `await self.llm.acall(...)`;
+        the simulator then awaits it instead of calling it.
+        """
         pass
\ No newline at end of file
@@ -1,28 +1,65 @@
 import os
 import re
-from langchain_chroma import Chroma
 from langchain.docstore.document import Document
+import hashlib
 import shutil
+import threading
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from cachetools import LRUCache
+from ...llm.embedding_cache import CachedEmbeddings
+from .vector_store import InMemoryVectorStore
+from .shared_memory import get_shared_memory
 
 class MemoryBase:
-    def __init__(self, memory_type: str, llm) -> None:
+    def __init__(self, memory_type: str, llm, backend: str = 'memory', persist_directory: Optional[str] = None) -> None:
         """
         Initialize the memory base class
         
         Args:
             memory_type: Type of memory
             llm: LLM instance used to generate memory-related text
+            backend: 'memory' (default) for an in-process vector index, or 'chroma' for a Chroma database.
+                With 'memory', a store registered by Simulator.set_shared_memory is used if there is one.
+            persist_directory: Optional directory to persist memories in. With the 'memory' backend they are
+                saved by persist() to <persist_directory>/<memory_type>.npz and reloaded on construction.
+                With 'chroma' it is the database directory, defaulting to a new ./db/<memory_type>/<uuid4>.
         """
         self.llm = llm
-        self.embedding = self.llm.get_embedding_model()
-        db_path = os.path.join('./db', memory_type, f'{str(uuid.uuid4())}')
-        if os.path.exists(db_path):
-            shutil.rmtree(db_path)
-        self.scenario_memory = Chroma(
-            embedding_function=self.embedding,
-            persist_directory=db_path
-        )
+        embedding = self.llm.get_embedding_model()
+        # Share vectors of repeated review and query texts across agents; an LLM may return its own
+        # CachedEmbeddings, e.g. with an on-disk path, which is used as is
+        self.embedding = embedding if isinstance(embedding, CachedEmbeddings) else CachedEmbeddings(embedding)
+        self.backend = backend
+        shared = get_shared_memory(memory_type) if backend == 'memory' and persist_directory is None else None
+        if shared is not None:
+            self.scenario_memory = shared
+        elif backend == 'memory':
+            persist_path = os.path.join(persist_directory, f'{memory_type}.npz') if persist_directory else None
+            self.scenario_memory = InMemoryVectorStore(self.embedding, persist_path=persist_path)
+        elif backend == 'chroma':
+            from langchain_chroma import Chroma
+            db_path = persist_directory or os.path.join('./db', memory_type, f'{str(uuid.uuid4())}')
+            if persist_directory is None and os.path.exists(db_path):
+                shutil.rmtree(db_path)
+            self.scenario_memory = Chroma(
+                embedding_function=self.embedding,
+                persist_directory=db_path
+            )
+        else:
+            raise ValueError("backend must be 'memory' or 'chroma'")
+
+    def memory_count(self) -> int:
+        """Number of memories in the store"""
+        if self.backend == 'chroma':
+            return self.scenario_memory._collection.count()
+        return self.scenario_memory.count()
+
+    def persist(self):
+        """Save the in-memory index to persist_directory; Chroma persists on its own"""
+        if self.backend == 'memory' and self.scenario_memory.persist_path:
+            self.scenario_memory.persist()
 
     def __call__(self, current_situation: str = ''):
         if 'review:' in current_situation:
@@ -37,15 +74,15 @@ class MemoryBase:
         raise NotImplementedError("This method should be implemented by subclasses.")
 
 class MemoryDILU(MemoryBase):
-    def __init__(self, llm):
-        super().__init__(memory_type='dilu', llm=llm)
+    def __init__(self, llm, **kwargs):
+        super().__init__(memory_type='dilu', llm=llm, **kwargs)
 
     def retriveMemory(self, query_scenario: str):
         # Extract task name from query scenario
         task_name = query_scenario
         
         # Return empty string if memory is empty
-        if self.scenario_memory._collection.count() == 0:
+        if self.memory_count() == 0:
             return ''
             
         # Find most similar memory
@@ -76,47 +113,96 @@ class MemoryDILU(MemoryBase):
         # Add to memory store
         self.scenario_memory.add_documents([memory_doc])
 
+# Importance scores keyed by (model, trajectory hash, query hash), shared by the agents of a run
+_importance_cache = LRUCache(maxsize=10000)
+_importance_cache_lock = threading.Lock()
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
 class MemoryGenerative(MemoryBase):
-    def __init__(self, llm):
-        super().__init__(memory_type='generative', llm=llm)
+    def __init__(self, llm, **kwargs):
+        super().__init__(memory_type='generative', llm=llm, **kwargs)
+
+    def _score_prompt(self, trajectory: str, query_scenario: str) -> str:
+        return f'''You will be given a successful case where you successfully complete the task. Then you will be given an ongoing task. Do not summarize these two cases, but rather evaluate how relevant and helpful the successful case is for the ongoing task, on a scale of 1-10.
+Success Case:
+{trajectory}
+Ongoing task:
+{query_scenario}
+Your output format should be:
+Score: '''
+
+    def _batch_score_prompt(self, trajectories: List[str], query_scenario: str) -> str:
+        cases = '\n'.join(f'Success Case {i}:\n{trajectory}' for i, trajectory in enumerate(trajectories, 1))
+        lines = '\n'.join(f'Case {i} Score: ' for i in range(1, len(trajectories) + 1))
+        return f'''You will be given {len(trajectories)} successful cases where you successfully complete the task. Then you will be given an ongoing task. Do not summarize these cases, but rather evaluate how relevant and helpful each successful case is for the ongoing task, on a scale of 1-10.
+{cases}
+Ongoing task:
+{query_scenario}
+Your output format should be one line per case:
+{lines}'''
+
+    @staticmethod
+    def _parse_score(response: str) -> int:
+        match = re.search(r'\d+', response)
+        return int(match.group()) if match else 0
+
+    @staticmethod
+    def _parse_batch_scores(response: str, count: int) -> Optional[List[int]]:
+        """Read 'Case i Score: n' lines; None unless every case got a score"""
+        scores = {}
+        for case, score in re.findall(r'Case\s*(\d+)\D{0,20}?(\d+)', response, flags=re.IGNORECASE):
+            scores.setdefault(int(case), int(score))
+        if all(i in scores for i in range(1, count + 1)):
+            return [scores[i] for i in range(1, count + 1)]
+        return None
+
+    def _score_one(self, trajectory: str, query_scenario: str) -> int:
+        prompt = self._score_prompt(trajectory, query_scenario)
+        response = self.llm(messages=[{"role": "user", "content": prompt}], temperature=0.1, stop_strs=['\n'])
+        return self._parse_score(response)
+
+    def _score(self, trajectories: List[str], query_scenario: str) -> List[int]:
+        """Score all candidates in one call, falling back to concurrent per-candidate calls"""
+        prompt = self._batch_score_prompt(trajectories, query_scenario)
+        response = self.llm(messages=[{"role": "user", "content": prompt}], temperature=0.1)
+        scores = self._parse_batch_scores(response, len(trajectories))
+        if scores is not None:
+            return scores
+        with ThreadPoolExecutor(max_workers=len(trajectories)) as pool:
+            return list(pool.map(lambda trajectory: self._score_one(trajectory, query_scenario), trajectories))
 
     def retriveMemory(self, query_scenario: str):
         # Extract task name from query
         task_name = query_scenario
         
         # Return empty if no memories exist
-        if self.scenario_memory._collection.count() == 0:
+        if self.memory_count() == 0:
             return ''
             
         # Get top 3 similar memories
         similarity_results = self.scenario_memory.similarity_search_with_score(
             task_name, k=3)
-            
-        fewshot_results = []
-        importance_scores = []
-
-        # Score each memory's relevance
-        for result in similarity_results:
-            trajectory = result[0].metadata['task_trajectory']
-            fewshot_results.append(trajectory)
-            
-            # Generate prompt to evaluate importance
-            prompt = f'''You will be given a successful case where you successfully complete the task. Then you will be given an ongoing task. Do not summarize these two cases, but rather evaluate how relevant and helpful the successful case is for the ongoing task, on a scale of 1-10.
-Success Case:
-{trajectory}
-Ongoing task:
-{query_scenario}
-Your output format should be:
-Score: '''
+        trajectories = [result[0].metadata['task_trajectory'] for result in similarity_results]
 
-            # Get importance score
-            response = self.llm(messages=[{"role": "user", "content": prompt}], temperature=0.1, stop_strs=['\n'])
-            score = int(re.search(r'\d+', response).group()) if re.search(r'\d+', response) else 0
-            importance_scores.append(score)
+        # Score each memory's relevance, reusing scores of (memory, query) pairs seen before
+        query_hash = _text_hash(query_scenario)
+        keys = [(self.llm.model, _text_hash(trajectory), query_hash) for trajectory in trajectories]
+        with _importance_cache_lock:
+            cached: Dict[int, int] = {i: _importance_cache[key] for i, key in enumerate(keys) if key in _importance_cache}
+        missing = [i for i in range(len(trajectories)) if i not in cached]
+        if missing:
+            scores = self._score([trajectories[i] for i in missing], query_scenario)
+            with _importance_cache_lock:
+                for i, score in zip(missing, scores):
+                    _importance_cache[keys[i]] = score
+                    cached[i] = score
+        importance_scores = [cached[i] for i in range(len(trajectories))]
 
         # Return trajectory with highest importance score
         max_score_idx = importance_scores.index(max(importance_scores))
-        return similarity_results[max_score_idx][0].metadata['task_trajectory']
+        return trajectories[max_score_idx]
     
     def addMemory(self, current_situation: str):
         # Extract task description
@@ -135,15 +221,15 @@ Score: '''
         self.scenario_memory.add_documents([memory_doc])
 
 class MemoryTP(MemoryBase):
-    def __init__(self, llm):
-        super().__init__(memory_type='tp', llm=llm)
+    def __init__(self, llm, **kwargs):
+        super().__init__(memory_type='tp', llm=llm, **kwargs)
 
     def retriveMemory(self, query_scenario: str):
         # Extract task name from scenario
         task_name = query_scenario
         
         # Return empty if no memories exist
-        if self.scenario_memory._collection.count() == 0:
+        if self.memory_count() == 0:
             return ''
             
         # Find most similar memory
@@ -183,15 +269,15 @@ Plan:
         self.scenario_memory.add_documents([memory_doc])
 
 class MemoryVoyager(MemoryBase):
-    def __init__(self, llm):
-        super().__init__(memory_type='voyager', llm=llm)
+    def __init__(self, llm, **kwargs):
+        super().__init__(memory_type='voyager', llm=llm, **kwargs)
 
     def retriveMemory(self, query_scenario: str):
         # Extract task name from query
         task_name = query_scenario
         
         # Return empty if no memories exist
-        if self.scenario_memory._collection.count() == 0:
+        if self.memory_count() == 0:
             return ''
             
         # Find most similar memories
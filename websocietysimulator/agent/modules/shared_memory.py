@@ -0,0 +1,138 @@
+import argparse
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+from langchain_core.documents import Document
+from .vector_store import InMemoryVectorStore
+
+logger = logging.getLogger("websocietysimulator")
+
+# Registered under this name, a store is used by memory modules of every type
+ALL_MEMORY_TYPES = '*'
+
+_shared_stores: Dict[str, InMemoryVectorStore] = {}
+_shared_stores_lock = threading.Lock()
+
+
+def register_shared_memory(stores: Dict[str, InMemoryVectorStore]) -> Dict[str, InMemoryVectorStore]:
+    """
+    Replace the shared memory stores of this process
+
+    Args:
+        stores: Stores keyed by memory type ('dilu', 'generative', 'tp', 'voyager') or ALL_MEMORY_TYPES
+
+    Returns:
+        Dict[str, InMemoryVectorStore]: The previously registered stores
+    """
+    global _shared_stores
+    with _shared_stores_lock:
+        previous = _shared_stores
+        _shared_stores = dict(stores)
+        return previous
+
+
+def get_shared_memory(memory_type: str) -> Optional[InMemoryVectorStore]:
+    """Shared store for a memory type, if one is registered"""
+    stores = _shared_stores
+    store = stores.get(memory_type)
+    return store if store is not None else stores.get(ALL_MEMORY_TYPES)
+
+
+@contextmanager
+def shared_memory_scope(stores: Dict[str, InMemoryVectorStore]):
+    """Register stores for the duration of a simulation run"""
+    previous = register_shared_memory(stores)
+    try:
+        yield
+    finally:
+        register_shared_memory(previous)
+
+
+def review_document(review: Dict) -> Document:
+    """Memory document for a review, in the format written by the memory modules' addMemory"""
+    text = review['text']
+    return Document(
+        page_content=text,
+        metadata={
+            "task_name": text,
+            "task_trajectory": text,
+            "review_id": review.get('review_id'),
+            "user_id": review.get('user_id'),
+            "item_id": review.get('item_id'),
+            "stars": review.get('stars'),
+        }
+    )
+
+
+def _iter_reviews(review_path: str, limit: Optional[int]) -> Iterator[Dict]:
+    count = 0
+    with open(review_path, 'r', encoding='utf-8') as file:
+        for line in file:
+            if limit is not None and count >= limit:
+                return
+            if not line.strip():
+                continue
+            review = json.loads(line)
+            if review.get('text'):
+                count += 1
+                yield review
+
+
+def build_review_memory(data_dir: str, embedding_function, output_path: str, batch_size: int = 256, limit: Optional[int] = None) -> InMemoryVectorStore:
+    """
+    Embed the reviews in review.json once and save them as a memory store
+
+    Args:
+        data_dir: Directory containing review.json
+        embedding_function: Embeddings used to embed the review texts; use the same model at run time
+        output_path: .npz file to write
+        batch_size: Number of reviews embedded per call
+        limit: Optional maximum number of reviews
+
+    Returns:
+        InMemoryVectorStore: The preloaded store
+    """
+    store = InMemoryVectorStore(embedding_function, persist_path=output_path)
+    if store.count():
+        logger.warning(f"{output_path} already holds {store.count()} memories; new reviews are appended")
+    batch: List[Document] = []
+    for review in _iter_reviews(os.path.join(data_dir, 'review.json'), limit):
+        batch.append(review_document(review))
+        if len(batch) >= batch_size:
+            store.add_documents(batch)
+            batch = []
+            logger.info(f"Embedded {store.count()} reviews")
+    if batch:
+        store.add_documents(batch)
+    store.persist()
+    logger.info(f"Saved {store.count()} review memories to {output_path}")
+    return store
+
+
+def load_review_memory(path: str, embedding_function) -> InMemoryVectorStore:
+    """Load a store written by build_review_memory"""
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    return InMemoryVectorStore(embedding_function, persist_path=path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embed review.json into a memory store that agents can share.")
+    parser.add_argument('--data_dir', required=True, help="Directory containing review.json.")
+    parser.add_argument('--output', required=True, help="Output .npz file.")
+    parser.add_argument('--api_key', required=True, help="Infinigence API key for the embedding model.")
+    parser.add_argument('--model', default='bge-m3', help="Embedding model name.")
+    parser.add_argument('--batch_size', type=int, default=256, help="Number of reviews embedded per call.")
+    parser.add_argument('--limit', type=int, default=None, help="Maximum number of reviews.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    from ...llm.infinigence_embeddings import InfinigenceEmbeddings
+    embeddings = InfinigenceEmbeddings(api_key=args.api_key, model=args.model)
+    build_review_memory(args.data_dir, embeddings, args.output, batch_size=args.batch_size, limit=args.limit)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+import json
+import os
+import threading
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from langchain_core.documents import Document
+import logging
+logger = logging.getLogger("websocietysimulator")
+
+
+class InMemoryVectorStore:
+    def __init__(self, embedding_function, persist_path: Optional[str] = None, initial_capacity: int = 64):
+        """
+        Flat (exact) vector index kept in process memory
+
+        Scores are squared L2 distances, lower is more similar, matching Chroma's default so the
+        memory modules behave the same with either backend. Appends are serialized by a lock and
+        publish a new immutable view, so searches never take the lock.
+
+        Args:
+            embedding_function: Embeddings used for documents and queries
+            persist_path: Optional .npz file; loaded if it exists and written by persist()
+            initial_capacity: Number of vectors allocated before the first resize
+        """
+        self.embedding_function = embedding_function
+        self.persist_path = persist_path
+        self.initial_capacity = initial_capacity
+        self._lock = threading.Lock()
+        self._buffer = None
+        self._norms = None
+        self._documents: List[Document] = []
+        # (vectors, squared norms, documents, n): searches only look at the first n entries
+        self._view: Tuple[Optional[np.ndarray], Optional[np.ndarray], List[Document], int] = (None, None, self._documents, 0)
+        if persist_path and os.path.exists(persist_path):
+            self._load(persist_path)
+
+    def __getstate__(self):
+        # Locks cannot be pickled; the receiving process rebuilds the index from the published view
+        vectors, _, documents, n = self._view
+        return {
+            'embedding_function': self.embedding_function,
+            'initial_capacity': self.initial_capacity,
+            'persist_path': self.persist_path,
+            'vectors': None if vectors is None else vectors.copy(),
+            'documents': documents[:n],
+        }
+
+    def __setstate__(self, state):
+        self.__init__(state['embedding_function'], initial_capacity=state['initial_capacity'])
+        self.persist_path = state['persist_path']
+        if state['documents']:
+            self.add_vectors(state['vectors'], state['documents'])
+
+    def count(self) -> int:
+        return self._view[3]
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def add_vectors(self, vectors: np.ndarray, documents: List[Document]) -> List[str]:
+        """Append precomputed vectors with their documents"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(documents):
+            raise ValueError("vectors must be a 2-D array with one row per document")
+        ids = []
+        for document in documents:
+            if getattr(document, 'id', None) is None:
+                document.id = str(uuid.uuid4())
+            ids.append(document.id)
+        if not documents:
+            return ids
+        with self._lock:
+            n = len(self._documents)
+            if self._buffer is None:
+                capacity = max(self.initial_capacity, len(vectors))
+                self._buffer = np.empty((capacity, vectors.shape[1]), dtype=np.float32)
+                self._norms = np.empty(capacity, dtype=np.float32)
+            elif vectors.shape[1] != self._buffer.shape[1]:
+                raise ValueError(f"Expected vectors of dimension {self._buffer.shape[1]}, got {vectors.shape[1]}")
+            if n + len(vectors) > len(self._buffer):
+                # Readers keep using the old arrays until the new view is published
+                capacity = max(2 * len(self._buffer), n + len(vectors))
+                buffer = np.empty((capacity, self._buffer.shape[1]), dtype=np.float32)
+                norms = np.empty(capacity, dtype=np.float32)
+                buffer[:n] = self._buffer[:n]
+                norms[:n] = self._norms[:n]
+                self._buffer, self._norms = buffer, norms
+            # Rows past n are not part of any published view, so they can be written in place
+            self._buffer[n:n + len(vectors)] = vectors
+            self._norms[n:n + len(vectors)] = np.einsum('ij,ij->i', vectors, vectors)
+            # Appending past n is invisible to searches holding the previous view
+            self._documents.extend(documents)
+            end = n + len(vectors)
+            self._view = (self._buffer[:end], self._norms[:end], self._documents, end)
+        return ids
+
+    def add_documents(self, documents: List[Document], **kwargs: Any) -> List[str]:
+        """Embed and append documents"""
+        if not documents:
+            return []
+        vectors = self.embedding_function.embed_documents([document.page_content for document in documents])
+        return self.add_vectors(np.asarray(vectors, dtype=np.float32), documents)
+
+    def add_texts(self, texts: List[str], metadatas: Optional[List[Dict]] = None, **kwargs: Any) -> List[str]:
+        metadatas = metadatas or [{} for _ in texts]
+        return self.add_documents([Document(page_content=text, metadata=metadata) for text, metadata in zip(texts, metadatas)])
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4) -> List[Tuple[Document, float]]:
+        vectors, norms, documents, n = self._view
+        if n == 0:
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        distances = norms - 2.0 * (vectors @ query) + float(query @ query)
+        k = min(k, n)
+        if k < n:
+            top = np.argpartition(distances, k - 1)[:k]
+            top = top[np.argsort(distances[top], kind='stable')]
+        else:
+            top = np.argsort(distances, kind='stable')
+        return [(documents[i], float(max(distances[i], 0.0))) for i in top]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        """Return the k documents closest to the query with their squared L2 distances"""
+        if self.count() == 0:
+            return []
+        return self.similarity_search_by_vector_with_score(self.embedding_function.embed_query(query), k=k)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [document for document, _ in self.similarity_search_with_score(query, k=k)]
+
+    def persist(self, path: Optional[str] = None):
+        """Write vectors and documents to an .npz file, atomically"""
+        path = path or self.persist_path
+        if not path:
+            raise ValueError("No persist_path given")
+        vectors, _, documents, n = self._view
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        records = [{'id': document.id, 'page_content': document.page_content, 'metadata': document.metadata}
+                   for document in documents[:n]]
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as file:
+            np.savez(
+                file,
+                vectors=vectors if vectors is not None else np.empty((0, 0), dtype=np.float32),
+                documents=np.array(json.dumps(records, ensure_ascii=False))
+            )
+        os.replace(tmp_path, path)
+
+    def _load(self, path: str):
+        with np.load(path) as data:
+            vectors = data['vectors']
+            records = json.loads(str(data['documents']))
+        documents = [Document(id=record['id'], page_content=record['page_content'], metadata=record['metadata'])
+                     for record in records]
+        self.add_vectors(vectors, documents)
+        logger.info(f"Loaded {len(documents)} memories from {path}")
@@ -25,6 +25,7 @@ class SimulationAgent(Agent):
         Participants must override this method to provide:
             - stars (float): Simulated rating
             - review (str): Simulated review text
+        It may be overridden as `async def workflow` to await `self.llm.acall(...)`.
         """
         result = {
             'stars': 0,
@@ -1,3 +1,7 @@
 from .llm import LLMBase, InfinigenceLLM, OpenAILLM
+from .llm_cache import CachedLLM, CacheStorage, MemoryCacheStorage, SQLiteCacheStorage
+from .llm_coalescing import CoalescingLLM
+from .llm_pool import LLMPool
+from .rate_limiter import RateLimiter, get_rate_limiter, key_limiter_name
 
-__all__ = ['LLMBase', 'InfinigenceLLM', 'OpenAILLM']
\ No newline at end of file
+__all__ = ['LLMBase', 'InfinigenceLLM', 'OpenAILLM', 'CachedLLM', 'CacheStorage', 'MemoryCacheStorage', 'SQLiteCacheStorage', 'CoalescingLLM', 'LLMPool', 'RateLimiter', 'get_rate_limiter', 'key_limiter_name']
\ No newline at end of file
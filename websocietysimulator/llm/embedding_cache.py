@@ -0,0 +1,168 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+import numpy as np
+from cachetools import LRUCache
+from langchain_core.embeddings import Embeddings
+from .sqlite_fork import reopen_after_fork
+import logging
+logger = logging.getLogger("websocietysimulator")
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class EmbeddingStore:
+    def __init__(self, path: Optional[str] = None, memory_size: int = 100000):
+        """
+        Embedding vectors keyed by (model, text hash), kept as float32
+
+        Args:
+            path: Optional sqlite file; if None or not writable, vectors are kept in memory only
+            memory_size: Maximum number of vectors kept in the in-memory LRU in front of sqlite
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._memory = LRUCache(maxsize=memory_size)
+        self._conn = None
+        if path:
+            self._open()
+            # Forked workers open their own connection to the same file
+            reopen_after_fork(self)
+
+    def _open(self):
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT, key TEXT, vector BLOB, PRIMARY KEY (model, key))"
+            )
+            self._conn.commit()
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Embedding cache at {self.path} is unavailable, caching in memory only: {e}")
+            self._conn = None
+
+    def get_many(self, model: str, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            missing = []
+            for key in keys:
+                vector = self._memory.get((model, key))
+                if vector is None:
+                    missing.append(key)
+                else:
+                    found[key] = vector
+            if self._conn is None or not missing:
+                return found
+            # Stay below sqlite's limit on the number of bound parameters
+            for start in range(0, len(missing), 500):
+                batch = missing[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE model = ? AND key IN ({','.join('?' * len(batch))})",
+                    [model, *batch]
+                ).fetchall()
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    self._memory[(model, key)] = vector
+                    found[key] = vector
+        return found
+
+    def put_many(self, model: str, vectors: Dict[str, np.ndarray]):
+        with self._lock:
+            for key, vector in vectors.items():
+                self._memory[(model, key)] = vector
+            if self._conn is None:
+                return
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, key, vector) VALUES (?, ?, ?)",
+                [(model, key, vector.tobytes()) for key, vector in vectors.items()]
+            )
+            self._conn.commit()
+
+
+_stores: Dict[Optional[str], EmbeddingStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_embedding_store(path: Optional[str] = None) -> EmbeddingStore:
+    """Get the process-wide store for a path, so every memory module shares one connection and LRU"""
+    key = os.path.abspath(path) if path else None
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = EmbeddingStore(path)
+            _stores[key] = store
+        return store
+
+
+class CachedEmbeddings(Embeddings):
+    def __init__(self, embeddings: Embeddings, path: Optional[str] = None):
+        """
+        Wrap an embedding model so that each distinct text is embedded once
+
+        Vectors are keyed by (model, SHA-256 of the text) and shared by every wrapper using the
+        same path in the process, so memory modules of different agents reuse each other's vectors.
+        Queries are embedded with the wrapped model's embed_query, which may differ from
+        embed_documents (e.g. an instruction prefix), and cached under '<model>/query'.
+
+        Args:
+            embeddings: The embedding model to wrap
+            path: Optional sqlite file to also keep vectors in across runs; None (default) keeps them in memory only
+        """
+        self.embeddings = embeddings
+        self.path = path
+        self.model = str(getattr(embeddings, 'model', None) or type(embeddings).__name__)
+        self.query_model = f"{self.model}/query"
+        self.store = get_embedding_store(path)
+
+    def __getstate__(self):
+        return {'embeddings': self.embeddings, 'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _lookup(self, texts: List[str], model: str):
+        keys = [text_key(text) for text in texts]
+        found = self.store.get_many(model, list(set(keys)))
+        # Unique texts that still need embedding, in first-seen order
+        missing = {}
+        for text, key in zip(texts, keys):
+            if key not in found and key not in missing:
+                missing[key] = text
+        return keys, found, missing
+
+    def _finish(self, model: str, keys: List[str], found: Dict[str, np.ndarray], missing: Dict[str, str], vectors: List[List[float]]) -> List[List[float]]:
+        new = {key: np.asarray(vector, dtype=np.float32) for key, vector in zip(missing, vectors)}
+        if new:
+            self.store.put_many(model, new)
+            found.update(new)
+        return [found[key].tolist() for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a list of documents, calling the wrapped model only for uncached texts"""
+        keys, found, missing = self._lookup(texts, self.model)
+        vectors = self.embeddings.embed_documents(list(missing.values())) if missing else []
+        return self._finish(self.model, keys, found, missing, vectors)
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query, calling the wrapped model's embed_query only if it is uncached"""
+        keys, found, missing = self._lookup([text], self.query_model)
+        vectors = [self.embeddings.embed_query(text)] if missing else []
+        return self._finish(self.query_model, keys, found, missing, vectors)[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, missing = self._lookup(texts, self.model)
+        vectors = await self.embeddings.aembed_documents(list(missing.values())) if missing else []
+        return self._finish(self.model, keys, found, missing, vectors)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        keys, found, missing = self._lookup([text], self.query_model)
+        vectors = [await self.embeddings.aembed_query(text)] if missing else []
+        return self._finish(self.query_model, keys, found, missing, vectors)[0]
@@ -1,42 +1,195 @@
-from typing import Any, List
-from langchain_core.embeddings import Embeddings
-import requests
-
-class InfinigenceEmbeddings(Embeddings):
-    def __init__(
-        self,
-        api_key: str,
-        model: str = "bge-m3",
-        infinity_api_url: str = "https://cloud.infini-ai.com/maas/v1"
-    ):
-        self.api_key = api_key
-        self.model = model
-        self.infinity_api_url = infinity_api_url
-        
-    def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        """Embed a list of documents into vectors"""
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
-        }
-        
-        payload = {
-            "model": self.model,
-            "input": texts
-        }
-        
-        response = requests.post(
-            f"{self.infinity_api_url}/embeddings",
-            headers=headers,
-            json=payload
-        )
-        
-        if response.status_code == 200:
-            return [data["embedding"] for data in response.json()["data"]]
-        else:
-            raise ValueError(f"API call failed: {response.text}")
-
-    def embed_query(self, text: str) -> List[float]:
-        """Embed a single query text into a vector"""
-        embeddings = self.embed_documents([text])
-        return embeddings[0] 
\ No newline at end of file
+import asyncio
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional
+from langchain_core.embeddings import Embeddings
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Responses worth retrying: rate limiting and transient server errors
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+# Keep-alive connections kept by default; the session is shared by every thread using the instance
+DEFAULT_POOL_MAXSIZE = 32
+
+class InfinigenceEmbeddings(Embeddings):
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "bge-m3",
+        infinity_api_url: str = "https://cloud.infini-ai.com/maas/v1",
+        batch_size: int = 32,
+        max_batch_tokens: int = 8192,
+        max_workers: int = 4,
+        max_retries: int = 3,
+        timeout: float = 60.0,
+        pool_maxsize: Optional[int] = None
+    ):
+        """
+        Embeddings client for the Infinigence API
+
+        Texts are split into batches of at most batch_size texts and about max_batch_tokens tokens,
+        which are sent concurrently over a pooled keep-alive session.
+
+        Args:
+            api_key: Infinigence API key
+            model: Embedding model name
+            infinity_api_url: Base URL of the API
+            batch_size: Maximum number of texts per request
+            max_batch_tokens: Approximate maximum number of tokens per request
+            max_workers: Maximum number of requests in flight for one call
+            max_retries: Retries on connection errors and 429/5xx responses
+            timeout: Request timeout in seconds
+            pool_maxsize: Keep-alive connections kept open, shared by all concurrent callers; size it
+                to the number of threads embedding at once times max_workers. Defaults to
+                max(max_workers, DEFAULT_POOL_MAXSIZE).
+        """
+        self.api_key = api_key
+        self.model = model
+        self.infinity_api_url = infinity_api_url
+        self.batch_size = batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.pool_maxsize = pool_maxsize if pool_maxsize is not None else max(max_workers, DEFAULT_POOL_MAXSIZE)
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    def __getstate__(self):
+        # Sessions and clients hold sockets; they are recreated on first use
+        state = self.__dict__.copy()
+        for name in ('_session', '_session_lock', '_async_clients'):
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    @property
+    def _headers(self):
+        return {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+
+    def _get_session(self) -> requests.Session:
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    retry = Retry(
+                        total=self.max_retries,
+                        backoff_factor=0.5,
+                        status_forcelist=RETRY_STATUS_CODES,
+                        allowed_methods=frozenset(["POST"]),
+                        raise_on_status=False
+                    )
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize, max_retries=retry)
+                    session = requests.Session()
+                    session.headers.update(self._headers)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
+
+    def _batches(self, texts: List[str]) -> List[List[str]]:
+        """Split texts into provider-sized batches, ~4 characters per token"""
+        batches = []
+        batch, batch_tokens = [], 0
+        for text in texts:
+            tokens = len(text) // 4 + 1
+            if batch and (len(batch) >= self.batch_size or batch_tokens + tokens > self.max_batch_tokens):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(text)
+            batch_tokens += tokens
+        if batch:
+            batches.append(batch)
+        return batches
+
+    @staticmethod
+    def _parse(body: Any) -> List[List[float]]:
+        data = body["data"]
+        if all("index" in item for item in data):
+            data = sorted(data, key=lambda item: item["index"])
+        return [item["embedding"] for item in data]
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        response = self._get_session().post(
+            f"{self.infinity_api_url}/embeddings",
+            json={"model": self.model, "input": texts},
+            timeout=self.timeout
+        )
+        if response.status_code == 200:
+            return self._parse(response.json())
+        else:
+            raise ValueError(f"API call failed: {response.text}")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a list of documents into vectors"""
+        batches = self._batches(texts)
+        if len(batches) <= 1 or self.max_workers <= 1:
+            results = [self._embed_batch(batch) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as pool:
+                results = list(pool.map(self._embed_batch, batches))
+        return [embedding for result in results for embedding in result]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a single query text into a vector"""
+        embeddings = self.embed_documents([text])
+        return embeddings[0]
+
+    def _get_async_client(self):
+        # httpx connection pools cannot be shared between event loops, so one client is kept per loop
+        import httpx
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(
+                headers=self._headers,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.pool_maxsize, max_keepalive_connections=self.pool_maxsize)
+            )
+            self._async_clients[loop] = client
+        return client
+
+    async def _aembed_batch(self, texts: List[str]) -> List[List[float]]:
+        import httpx
+        client = self._get_async_client()
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await client.post(
+                    f"{self.infinity_api_url}/embeddings",
+                    json={"model": self.model, "input": texts}
+                )
+            except httpx.TransportError:
+                if attempt == self.max_retries:
+                    raise
+            else:
+                if response.status_code == 200:
+                    return self._parse(response.json())
+                if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                    raise ValueError(f"API call failed: {response.text}")
+            await asyncio.sleep(0.5 * 2 ** attempt)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Async counterpart of embed_documents"""
+        semaphore = asyncio.Semaphore(max(1, self.max_workers))
+
+        async def embed(batch):
+            async with semaphore:
+                return await self._aembed_batch(batch)
+
+        results = await asyncio.gather(*(embed(batch) for batch in self._batches(texts)))
+        return [embedding for result in results for embedding in result]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Async counterpart of embed_query"""
+        embeddings = await self.aembed_documents([text])
+        return embeddings[0]
@@ -1,8 +1,8 @@
+import asyncio
+import weakref
 from typing import Dict, List, Optional, Union
-from openai import OpenAI
-from langchain_openai import OpenAIEmbeddings
-from .infinigence_embeddings import InfinigenceEmbeddings
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from tenacity import retry, stop_after_attempt, wait_random_exponential, retry_if_exception_type
+from .rate_limiter import RateLimiter, get_rate_limiter, key_limiter_name, estimate_tokens
 import logging
 logger = logging.getLogger("websocietysimulator")
 
@@ -32,6 +32,35 @@ class LLMBase:
             Union[str, List[str]]: Response text from LLM, either a single string or list of strings
         """
         raise NotImplementedError("Subclasses need to implement this method")
+
+    async def acall(self, messages: List[Dict[str, str]], model: Optional[str] = None, temperature: float = 0.0, max_tokens: int = 500, stop_strs: Optional[List[str]] = None, n: int = 1) -> Union[str, List[str]]:
+        """
+        Async counterpart of __call__, for use in `async def workflow` agents
+        
+        The default runs __call__ in a worker thread. Subclasses with an async client should override it.
+        
+        Returns:
+            Union[str, List[str]]: Response text from LLM, either a single string or list of strings
+        """
+        return await asyncio.to_thread(
+            self.__call__, messages, model=model, temperature=temperature,
+            max_tokens=max_tokens, stop_strs=stop_strs, n=n
+        )
+
+    def _get_async_client(self, factory):
+        """
+        Get the async client bound to the running event loop
+        
+        httpx connection pools cannot be shared between event loops, so one client is kept per loop.
+        """
+        if not hasattr(self, '_async_clients'):
+            self._async_clients = weakref.WeakKeyDictionary()
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = factory()
+            self._async_clients[loop] = client
+        return client
     
     def get_embedding_model(self):
         """
@@ -43,24 +72,40 @@ class LLMBase:
         raise NotImplementedError("Subclasses need to implement this method")
 
 class InfinigenceLLM(LLMBase):
-    def __init__(self, api_key: str, model: str = "qwen2.5-72b-instruct"):
+    def __init__(self, api_key: str, model: str = "qwen2.5-72b-instruct", rate_limiter: Optional[RateLimiter] = None):
         """
         Initialize Deepseek LLM
         
         Args:
             api_key: Deepseek API key
             model: Model name, defaults to qwen2.5-72b-instruct
+            rate_limiter: Optional limiter, defaults to the process-wide limiter of this API key, shared by
+                every InfinigenceLLM using the key. Set quotas with llm.rate_limiter.configure(requests_per_minute=..., tokens_per_minute=...)
         """
+        # Client libraries are imported here to keep `import websocietysimulator` light
+        from openai import OpenAI
+        from .infinigence_embeddings import InfinigenceEmbeddings
         super().__init__(model)
+        self.api_key = api_key
         self.client = OpenAI(
             api_key=api_key,
             base_url="https://cloud.infini-ai.com/maas/v1"
         )
         self.embedding_model = InfinigenceEmbeddings(api_key=api_key)
+        self.rate_limiter = rate_limiter or get_rate_limiter(key_limiter_name("infinigence", api_key))
+
+    def __getstate__(self):
+        # API clients hold connection pools and locks; rebuild them after unpickling.
+        # The rate limiter is per process, so the receiving process uses its own.
+        return {'api_key': self.api_key, 'model': self.model}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
         
     @retry(
         retry=retry_if_exception_type(Exception),
-        wait=wait_exponential(multiplier=1, min=4, max=60),  # 等待时间从4秒开始，指数增长，最长60秒
+        # Jittered so that threads hitting the limit together do not all retry together
+        wait=wait_random_exponential(multiplier=2, min=1, max=60),
         stop=stop_after_attempt(5)  # 最多重试5次
     )
     def __call__(self, messages: List[Dict[str, str]], model: Optional[str] = None, temperature: float = 0.0, max_tokens: int = 500, stop_strs: Optional[List[str]] = None, n: int = 1) -> Union[str, List[str]]:
@@ -79,14 +124,54 @@ class InfinigenceLLM(LLMBase):
             Union[str, List[str]]: Response text from LLM, either a single string or list of strings
         """
         try:
-            response = self.client.chat.completions.create(
-                model=model or self.model,
-                messages=messages,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                stop=stop_strs,
-                n=n
-            )
+            with self.rate_limiter.limit(estimate_tokens(messages, max_tokens)):
+                response = self.client.chat.completions.create(
+                    model=model or self.model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    stop=stop_strs,
+                    n=n
+                )
+            
+            if n == 1:
+                return response.choices[0].message.content
+            else:
+                return [choice.message.content for choice in response.choices]
+        except Exception as e:
+            if "429" in str(e):
+                logger.warning("Rate limit exceeded")
+            else:
+                logger.error(f"Other LLM Error: {e}")
+            raise e
+
+    @retry(
+        retry=retry_if_exception_type(Exception),
+        wait=wait_random_exponential(multiplier=2, min=1, max=60),
+        stop=stop_after_attempt(5)
+    )
+    async def acall(self, messages: List[Dict[str, str]], model: Optional[str] = None, temperature: float = 0.0, max_tokens: int = 500, stop_strs: Optional[List[str]] = None, n: int = 1) -> Union[str, List[str]]:
+        """
+        Call Infinigence AI API asynchronously with the same rate limit handling as __call__
+        
+        Returns:
+            Union[str, List[str]]: Response text from LLM, either a single string or list of strings
+        """
+        from openai import AsyncOpenAI
+        client = self._get_async_client(lambda: AsyncOpenAI(
+            api_key=self.api_key,
+            base_url="https://cloud.infini-ai.com/maas/v1"
+        ))
+        try:
+            async with self.rate_limiter.alimit(estimate_tokens(messages, max_tokens)):
+                response = await client.chat.completions.create(
+                    model=model or self.model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    stop=stop_strs,
+                    n=n
+                )
             
             if n == 1:
                 return response.choices[0].message.content
@@ -103,17 +188,31 @@ class InfinigenceLLM(LLMBase):
         return self.embedding_model
 
 class OpenAILLM(LLMBase):
-    def __init__(self, api_key: str, model: str = "gpt-3.5-turbo"):
+    def __init__(self, api_key: str, model: str = "gpt-3.5-turbo", rate_limiter: Optional[RateLimiter] = None):
         """
         Initialize OpenAI LLM
         
         Args:
             api_key: OpenAI API key
             model: Model name, defaults to gpt-3.5-turbo
+            rate_limiter: Optional limiter, defaults to the process-wide limiter of this API key
         """
+        # Client libraries are imported here to keep `import websocietysimulator` light
+        from openai import OpenAI
+        from langchain_openai import OpenAIEmbeddings
         super().__init__(model)
+        self.api_key = api_key
         self.client = OpenAI(api_key=api_key)
         self.embedding_model = OpenAIEmbeddings(api_key=api_key)
+        self.rate_limiter = rate_limiter or get_rate_limiter(key_limiter_name("openai", api_key))
+
+    def __getstate__(self):
+        # API clients hold connection pools and locks; rebuild them after unpickling.
+        # The rate limiter is per process, so the receiving process uses its own.
+        return {'api_key': self.api_key, 'model': self.model}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
         
     def __call__(self, messages: List[Dict[str, str]], model: Optional[str] = None, temperature: float = 0.0, max_tokens: int = 500, stop_strs: Optional[List[str]] = None, n: int = 1) -> Union[str, List[str]]:
         """
@@ -130,14 +229,39 @@ class OpenAILLM(LLMBase):
         Returns:
             Union[str, List[str]]: Response text from LLM, either a single string or list of strings
         """
-        response = self.client.chat.completions.create(
-            model=model or self.model,
-            messages=messages,
-            temperature=temperature,
-            max_tokens=max_tokens,
-            stop=stop_strs,
-            n=n
-        )
+        with self.rate_limiter.limit(estimate_tokens(messages, max_tokens)):
+            response = self.client.chat.completions.create(
+                model=model or self.model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stop=stop_strs,
+                n=n
+            )
+        
+        if n == 1:
+            return response.choices[0].message.content
+        else:
+            return [choice.message.content for choice in response.choices]
+
+    async def acall(self, messages: List[Dict[str, str]], model: Optional[str] = None, temperature: float = 0.0, max_tokens: int = 500, stop_strs: Optional[List[str]] = None, n: int = 1) -> Union[str, List[str]]:
+        """
+        Call OpenAI API asynchronously
+        
+        Returns:
+            Union[str, List[str]]: Response text from LLM, either a single string or list of strings
+        """
+        from openai import AsyncOpenAI
+        client = self._get_async_client(lambda: AsyncOpenAI(api_key=self.api_key))
+        async with self.rate_limiter.alimit(estimate_tokens(messages, max_tokens)):
+            response = await client.chat.completions.create(
+                model=model or self.model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stop=stop_strs,
+                n=n
+            )
         
         if n == 1:
             return response.choices[0].message.content
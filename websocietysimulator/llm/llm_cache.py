@@ -0,0 +1,297 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Union
+from .llm import LLMBase
+from .sqlite_fork import reopen_after_fork
+import logging
+logger = logging.getLogger("websocietysimulator")
+
+# Access times of sqlite cache hits are written in batches of this many, or after this many seconds
+ACCESS_FLUSH_SIZE = 256
+ACCESS_FLUSH_SECONDS = 5.0
+
+
+def make_request_key(model: str, messages: List[Dict[str, str]], temperature: float, max_tokens: int, stop_strs: Optional[List[str]], n: int) -> str:
+    """
+    Content-addressed key of an LLM request
+
+    Returns:
+        str: SHA-256 of the canonical JSON encoding of the request parameters
+    """
+    payload = json.dumps(
+        [model, messages, temperature, max_tokens, stop_strs, n],
+        sort_keys=True, ensure_ascii=False, separators=(',', ':')
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class CacheStorage:
+    """Base class for response cache tiers"""
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError("Subclasses need to implement this method")
+
+    def set(self, key: str, value: Any):
+        raise NotImplementedError("Subclasses need to implement this method")
+
+    def clear(self):
+        raise NotImplementedError("Subclasses need to implement this method")
+
+
+class MemoryCacheStorage(CacheStorage):
+    def __init__(self, maxsize: int = 4096, ttl: Optional[float] = None):
+        """
+        In-memory LRU cache tier
+
+        Args:
+            maxsize: Maximum number of entries
+            ttl: Optional time-to-live in seconds
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {'maxsize': self.maxsize, 'ttl': self.ttl}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, created = entry
+            if self.ttl is not None and time.time() - created > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCacheStorage(CacheStorage):
+    def __init__(self, path: str, ttl: Optional[float] = None, max_entries: Optional[int] = None):
+        """
+        On-disk cache tier backed by sqlite
+
+        Args:
+            path: Path of the sqlite database file
+            ttl: Optional time-to-live in seconds
+            max_entries: Optional maximum number of entries; least recently used entries are evicted.
+                Only then are access times recorded, batched rather than written on every hit.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = None
+        # Access times of hits not written yet, flushed before evicting
+        self._pending_access = {}
+        self._last_flush = time.monotonic()
+        self._open()
+        # Forked workers open their own connection to the same file
+        reopen_after_fork(self)
+
+    def _open(self):
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT, created REAL, accessed REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed)")
+        self._conn.commit()
+
+    def __getstate__(self):
+        # Connections cannot be pickled; the receiving process opens the same file
+        return {'path': self.path, 'ttl': self.ttl, 'max_entries': self.max_entries}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, created = row
+            if self.ttl is not None and now - created > self.ttl:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            if self.max_entries is not None:
+                self._pending_access[key] = now
+                if len(self._pending_access) >= ACCESS_FLUSH_SIZE or time.monotonic() - self._last_flush > ACCESS_FLUSH_SECONDS:
+                    self._flush_access()
+                    self._conn.commit()
+        return json.loads(value)
+
+    def _flush_access(self):
+        """Write the pending access times. Called with the lock held; the caller commits."""
+        if self._pending_access:
+            self._conn.executemany(
+                "UPDATE llm_cache SET accessed = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self._pending_access.items()]
+            )
+            self._pending_access = {}
+        self._last_flush = time.monotonic()
+
+    def set(self, key: str, value: Any):
+        now = time.time()
+        with self._lock:
+            if self.max_entries is not None:
+                # Before the insert, so an older hit does not overwrite its access time
+                self._flush_access()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now, now)
+            )
+            if self.ttl is not None:
+                self._conn.execute("DELETE FROM llm_cache WHERE created < ?", (now - self.ttl,))
+            if self.max_entries is not None:
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN ("
+                    "SELECT key FROM llm_cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._pending_access = {}
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+
+class CachedLLM(LLMBase):
+    def __init__(self, llm: LLMBase, cache_path: Optional[str] = None, memory_size: int = 4096, ttl: Optional[float] = None, max_disk_entries: Optional[int] = None, storages: Optional[List[CacheStorage]] = None, cache_nondeterministic: bool = False):
+        """
+        Wrap an LLM with a content-addressed response cache
+
+        Requests are keyed on (model, messages, temperature, max_tokens, stop_strs, n). Tiers are
+        checked in order and a hit in a lower tier is copied into the tiers above it.
+
+        Args:
+            llm: The LLM to wrap
+            cache_path: Optional sqlite file for an on-disk tier below the in-memory tier
+            memory_size: Maximum number of entries in the in-memory tier
+            ttl: Optional time-to-live in seconds for both tiers
+            max_disk_entries: Optional maximum number of entries in the on-disk tier
+            storages: Custom list of tiers, used instead of the in-memory and sqlite tiers
+            cache_nondeterministic: Also cache requests with temperature > 0, defaults to False
+        """
+        super().__init__(llm.model)
+        self.llm = llm
+        self.cache_nondeterministic = cache_nondeterministic
+        if storages is None:
+            storages = [MemoryCacheStorage(maxsize=memory_size, ttl=ttl)]
+            if cache_path:
+                storages.append(SQLiteCacheStorage(cache_path, ttl=ttl, max_entries=max_disk_entries))
+        self.storages = storages
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_stats_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._stats_lock = threading.Lock()
+
+    def _cacheable(self, temperature: float) -> bool:
+        return self.cache_nondeterministic or temperature == 0
+
+    def _lookup(self, key: str) -> Optional[Any]:
+        for level, storage in enumerate(self.storages):
+            value = storage.get(key)
+            if value is not None:
+                for upper in self.storages[:level]:
+                    upper.set(key, value)
+                with self._stats_lock:
+                    self.hits += 1
+                return value
+        with self._stats_lock:
+            self.misses += 1
+        return None
+
+    def _store(self, key: str, value: Any):
+        for storage in self.storages:
+            storage.set(key, value)
+
+    def __call__(self, messages: List[Dict[str, str]], model: Optional[str] = None, temperature: float = 0.0, max_tokens: int = 500, stop_strs: Optional[List[str]] = None, n: int = 1) -> Union[str, List[str]]:
+        """
+        Return a cached response if available, otherwise call the wrapped LLM
+
+        Returns:
+            Union[str, List[str]]: Response text from LLM, either a single string or list of strings
+        """
+        if not self._cacheable(temperature):
+            return self.llm(messages=messages, model=model, temperature=temperature, max_tokens=max_tokens, stop_strs=stop_strs, n=n)
+        key = make_request_key(model or self.llm.model, messages, temperature, max_tokens, stop_strs, n)
+        response = self._lookup(key)
+        if response is None:
+            response = self.llm(messages=messages, model=model, temperature=temperature, max_tokens=max_tokens, stop_strs=stop_strs, n=n)
+            # A None response is a failed call; lookups treat it as a miss, so it is not stored
+            if response is not None:
+                self._store(key, response)
+        return response
+
+    async def acall(self, messages: List[Dict[str, str]], model: Optional[str] = None, temperature: float = 0.0, max_tokens: int = 500, stop_strs: Optional[List[str]] = None, n: int = 1) -> Union[str, List[str]]:
+        """
+        Async counterpart of __call__
+
+        Returns:
+            Union[str, List[str]]: Response text from LLM, either a single string or list of strings
+        """
+        if not self._cacheable(temperature):
+            return await self.llm.acall(messages=messages, model=model, temperature=temperature, max_tokens=max_tokens, stop_strs=stop_strs, n=n)
+        key = make_request_key(model or self.llm.model, messages, temperature, max_tokens, stop_strs, n)
+        response = self._lookup(key)
+        if response is None:
+            response = await self.llm.acall(messages=messages, model=model, temperature=temperature, max_tokens=max_tokens, stop_strs=stop_strs, n=n)
+            if response is not None:
+                self._store(key, response)
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Cache hit/miss counters
+
+        Returns:
+            Dict[str, Any]: hits, misses and hit_rate
+        """
+        with self._stats_lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+    def get_embedding_model(self):
+        return self.llm.get_embedding_model()
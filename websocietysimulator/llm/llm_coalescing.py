@@ -0,0 +1,124 @@
+import asyncio
+import threading
+import weakref
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Union
+from .llm import LLMBase
+from .llm_cache import make_request_key
+import logging
+logger = logging.getLogger("websocietysimulator")
+
+
+class CoalescingLLM(LLMBase):
+    def __init__(self, llm: LLMBase, coalesce_nondeterministic: bool = False):
+        """
+        Wrap an LLM so that identical concurrent requests share one call
+
+        The first caller of a request makes the call; callers with the same request that arrive
+        while it is in flight wait for it and get the same response, or the same exception.
+        Stack it under a CachedLLM, i.e. CachedLLM(CoalescingLLM(llm)), so that misses are coalesced too.
+
+        Args:
+            llm: The LLM to wrap
+            coalesce_nondeterministic: Also coalesce requests with temperature > 0, defaults to False
+        """
+        super().__init__(llm.model)
+        self.llm = llm
+        self.coalesce_nondeterministic = coalesce_nondeterministic
+        self.calls = 0
+        self.calls_saved = 0
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+        # asyncio futures belong to one event loop, so async requests are tracked per loop
+        self._async_in_flight = weakref.WeakKeyDictionary()
+
+    def __getstate__(self):
+        return {'llm': self.llm, 'coalesce_nondeterministic': self.coalesce_nondeterministic}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _coalescable(self, temperature: float) -> bool:
+        return self.coalesce_nondeterministic or temperature == 0
+
+    def _count(self, saved: bool):
+        with self._lock:
+            if saved:
+                self.calls_saved += 1
+            else:
+                self.calls += 1
+
+    def __call__(self, messages: List[Dict[str, str]], model: Optional[str] = None, temperature: float = 0.0, max_tokens: int = 500, stop_strs: Optional[List[str]] = None, n: int = 1) -> Union[str, List[str]]:
+        """
+        Call the wrapped LLM, or wait for an identical request already in flight
+
+        Returns:
+            Union[str, List[str]]: Response text from LLM, either a single string or list of strings
+        """
+        if not self._coalescable(temperature):
+            return self.llm(messages=messages, model=model, temperature=temperature, max_tokens=max_tokens, stop_strs=stop_strs, n=n)
+        key = make_request_key(model or self.llm.model, messages, temperature, max_tokens, stop_strs, n)
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+                self.calls += 1
+            else:
+                self.calls_saved += 1
+        if not leader:
+            return future.result()
+
+        try:
+            response = self.llm(messages=messages, model=model, temperature=temperature, max_tokens=max_tokens, stop_strs=stop_strs, n=n)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(response)
+            return response
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    async def acall(self, messages: List[Dict[str, str]], model: Optional[str] = None, temperature: float = 0.0, max_tokens: int = 500, stop_strs: Optional[List[str]] = None, n: int = 1) -> Union[str, List[str]]:
+        """
+        Async counterpart of __call__
+
+        Returns:
+            Union[str, List[str]]: Response text from LLM, either a single string or list of strings
+        """
+        if not self._coalescable(temperature):
+            return await self.llm.acall(messages=messages, model=model, temperature=temperature, max_tokens=max_tokens, stop_strs=stop_strs, n=n)
+        key = make_request_key(model or self.llm.model, messages, temperature, max_tokens, stop_strs, n)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            in_flight = self._async_in_flight.get(loop)
+            if in_flight is None:
+                in_flight = {}
+                self._async_in_flight[loop] = in_flight
+        future = in_flight.get(key)
+        if future is not None:
+            self._count(saved=True)
+            # shield so that a cancelled waiter does not cancel the shared call
+            return await asyncio.shield(future)
+
+        self._count(saved=False)
+        future = loop.create_task(self.llm.acall(messages=messages, model=model, temperature=temperature, max_tokens=max_tokens, stop_strs=stop_strs, n=n))
+        in_flight[key] = future
+        future.add_done_callback(lambda _: in_flight.pop(key, None))
+        return await asyncio.shield(future)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Coalescing counters
+
+        Returns:
+            Dict[str, Any]: calls made to the wrapped LLM and calls_saved by sharing an in-flight call
+        """
+        with self._lock:
+            return {'calls': self.calls, 'calls_saved': self.calls_saved}
+
+    def get_embedding_model(self):
+        return self.llm.get_embedding_model()
@@ -0,0 +1,193 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional, Union
+from .llm import LLMBase
+from .rate_limiter import is_rate_limit_error
+import logging
+logger = logging.getLogger("websocietysimulator")
+
+# Client exception classes (openai, httpx, requests) for failures of the connection rather than the request
+TRANSPORT_ERROR_NAMES = {
+    'APIConnectionError', 'APITimeoutError', 'TransportError', 'TimeoutException',
+    'ConnectionError', 'Timeout', 'TimeoutError',
+}
+
+
+def is_failover_error(error: Exception) -> bool:
+    """
+    Whether a failed call may succeed on another member: transport errors, timeouts, 429 and 5xx responses.
+    Other 4xx responses are caused by the request and would fail on every member.
+    """
+    # Retried calls (tenacity) raise a RetryError wrapping the last attempt
+    last_attempt = getattr(error, 'last_attempt', None)
+    if last_attempt is not None and last_attempt.exception() is not None:
+        error = last_attempt.exception()
+    status_code = getattr(error, 'status_code', None)
+    if status_code is None:
+        status_code = getattr(getattr(error, 'response', None), 'status_code', None)
+    if isinstance(status_code, int):
+        return status_code in (408, 429) or status_code >= 500
+    if is_rate_limit_error(error) or isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    return any(cls.__name__ in TRANSPORT_ERROR_NAMES for cls in type(error).__mro__)
+
+
+class _MemberStats:
+    """Counters of one pool member; only touched under the pool lock"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.consecutive_errors = 0
+        self.total_latency = 0.0
+        self.unhealthy_until = 0.0
+
+
+class LLMPool(LLMBase):
+    def __init__(self, llms: List[LLMBase], max_consecutive_errors: int = 3, cooldown_seconds: float = 30.0):
+        """
+        Spread calls across several LLMs, e.g. one per API key or endpoint
+
+        Each call goes to the healthy member with the fewest requests in flight. A member that fails
+        max_consecutive_errors times in a row is taken out for cooldown_seconds. A call that fails with a
+        transport error, a timeout, a 429 or a 5xx response is retried on the next member before the error
+        is raised; other errors, e.g. a 400 for an invalid request, are raised right away.
+
+        Args:
+            llms: Pool members
+            max_consecutive_errors: Consecutive failures before a member is marked unhealthy
+            cooldown_seconds: How long an unhealthy member receives no calls
+        """
+        if not llms:
+            raise ValueError("LLMPool needs at least one LLM")
+        super().__init__(llms[0].model)
+        self.llms = list(llms)
+        self.max_consecutive_errors = max_consecutive_errors
+        self.cooldown_seconds = cooldown_seconds
+        self._lock = threading.Lock()
+        self._stats = [_MemberStats() for _ in self.llms]
+        self._started = time.monotonic()
+
+    def __getstate__(self):
+        # Counters are per process; each worker starts with a fresh set
+        return {
+            'llms': self.llms,
+            'max_consecutive_errors': self.max_consecutive_errors,
+            'cooldown_seconds': self.cooldown_seconds,
+        }
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _acquire(self, tried: set) -> int:
+        """Pick a member not tried yet for this call and count the request as in flight"""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [i for i in range(len(self.llms)) if i not in tried]
+            healthy = [i for i in candidates if self._stats[i].unhealthy_until <= now]
+            if healthy:
+                index = min(healthy, key=lambda i: (self._stats[i].in_flight, self._stats[i].requests))
+            else:
+                # Every remaining member is cooling down; use the one that recovers first
+                index = min(candidates, key=lambda i: self._stats[i].unhealthy_until)
+            stats = self._stats[index]
+            stats.in_flight += 1
+            stats.requests += 1
+            return index
+
+    def _release(self, index: int, latency: float, error: Optional[Exception] = None):
+        with self._lock:
+            stats = self._stats[index]
+            stats.in_flight -= 1
+            stats.total_latency += latency
+            if error is None:
+                stats.consecutive_errors = 0
+                return
+            stats.errors += 1
+            if not is_failover_error(error):
+                # The request was at fault, not the member
+                return
+            stats.consecutive_errors += 1
+            if stats.consecutive_errors >= self.max_consecutive_errors:
+                stats.unhealthy_until = time.monotonic() + self.cooldown_seconds
+                stats.consecutive_errors = 0
+                logger.warning(f"LLM pool member {index} ({self.llms[index].model}) failed repeatedly, "
+                               f"skipping it for {self.cooldown_seconds}s: {error}")
+
+    def __call__(self, messages: List[Dict[str, str]], model: Optional[str] = None, temperature: float = 0.0, max_tokens: int = 500, stop_strs: Optional[List[str]] = None, n: int = 1) -> Union[str, List[str]]:
+        """
+        Call the least busy healthy member, failing over to the others on error
+
+        Returns:
+            Union[str, List[str]]: Response text from LLM, either a single string or list of strings
+        """
+        tried = set()
+        while True:
+            index = self._acquire(tried)
+            tried.add(index)
+            start = time.monotonic()
+            try:
+                response = self.llms[index](messages=messages, model=model, temperature=temperature, max_tokens=max_tokens, stop_strs=stop_strs, n=n)
+            except Exception as e:
+                self._release(index, time.monotonic() - start, e)
+                if len(tried) == len(self.llms) or not is_failover_error(e):
+                    raise
+                logger.warning(f"LLM pool member {index} failed, retrying on another member: {e}")
+                continue
+            self._release(index, time.monotonic() - start)
+            return response
+
+    async def acall(self, messages: List[Dict[str, str]], model: Optional[str] = None, temperature: float = 0.0, max_tokens: int = 500, stop_strs: Optional[List[str]] = None, n: int = 1) -> Union[str, List[str]]:
+        """
+        Async counterpart of __call__
+
+        Returns:
+            Union[str, List[str]]: Response text from LLM, either a single string or list of strings
+        """
+        tried = set()
+        while True:
+            index = self._acquire(tried)
+            tried.add(index)
+            start = time.monotonic()
+            try:
+                response = await self.llms[index].acall(messages=messages, model=model, temperature=temperature, max_tokens=max_tokens, stop_strs=stop_strs, n=n)
+            except Exception as e:
+                self._release(index, time.monotonic() - start, e)
+                if len(tried) == len(self.llms) or not is_failover_error(e):
+                    raise
+                logger.warning(f"LLM pool member {index} failed, retrying on another member: {e}")
+                continue
+            self._release(index, time.monotonic() - start)
+            return response
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """
+        Per-member counters
+
+        Returns:
+            List[Dict[str, Any]]: For each member: model, healthy, in_flight, requests, errors,
+                avg_latency (seconds per completed request) and throughput (completed requests per second)
+        """
+        now = time.monotonic()
+        elapsed = max(now - self._started, 1e-9)
+        with self._lock:
+            result = []
+            for llm, stats in zip(self.llms, self._stats):
+                completed = stats.requests - stats.in_flight
+                result.append({
+                    'model': llm.model,
+                    'healthy': stats.unhealthy_until <= now,
+                    'in_flight': stats.in_flight,
+                    'requests': stats.requests,
+                    'errors': stats.errors,
+                    'avg_latency': stats.total_latency / completed if completed else 0.0,
+                    'throughput': (completed - stats.errors) / elapsed,
+                })
+            return result
+
+    def get_embedding_model(self):
+        now = time.monotonic()
+        with self._lock:
+            healthy = [i for i, stats in enumerate(self._stats) if stats.unhealthy_until <= now]
+        return self.llms[healthy[0] if healthy else 0].get_embedding_model()
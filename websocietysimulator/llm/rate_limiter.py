@@ -0,0 +1,305 @@
+import asyncio
+import hashlib
+import math
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import logging
+logger = logging.getLogger("websocietysimulator")
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Whether an exception from an API client is a 429 response"""
+    return getattr(error, 'status_code', None) == 429 or "429" in str(error)
+
+
+def key_limiter_name(provider: str, api_key: str) -> str:
+    """Name of the default limiter of one API key; providers count quotas and 429s per key"""
+    digest = hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16]
+    return f"{provider}:{digest}"
+
+
+def estimate_tokens(messages: List[Dict[str, str]], max_tokens: int) -> int:
+    """Rough token cost of a request: ~4 characters per prompt token plus the completion budget"""
+    prompt_chars = sum(len(str(message.get('content', ''))) for message in messages)
+    return prompt_chars // 4 + max_tokens
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute: float, burst_seconds: float = 10.0):
+        """
+        Token bucket refilled continuously at rate_per_minute
+
+        Args:
+            rate_per_minute: Refill rate
+            burst_seconds: Capacity expressed in seconds of refill
+        """
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until amount can be taken. Requests larger than the capacity wait for a full bucket."""
+        self._refill(now)
+        needed = min(amount, self.capacity)
+        if self.level >= needed:
+            return 0.0
+        return (needed - self.level) / self.rate
+
+    def take(self, amount: float):
+        # The level may go negative, so oversized requests are paid back before the next one
+        self.level -= amount
+
+
+class _Waiter:
+    """A caller queued for a slot; wake() is safe to call from any thread"""
+    __slots__ = ('tokens', 'wake', 'granted', 'retry_at')
+
+    def __init__(self, tokens: int, wake: Callable[[], None]):
+        self.tokens = tokens
+        self.wake = wake
+        self.granted = False
+        # When the head of the queue should re-check a pause or quota; None waits for a release
+        self.retry_at: Optional[float] = None
+
+
+class RateLimiter:
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None, max_concurrency: Optional[int] = None, min_concurrency: int = 1, pause_seconds: float = 2.0):
+        """
+        Client-side limiter shared by all LLM instances using the same API key
+
+        Requests and tokens per minute are enforced with token buckets. The number of requests in
+        flight is unbounded until the first 429; from then on it follows AIMD: it halves on a 429
+        and grows by one per window of successful requests, so throughput settles near the
+        provider quota. Callers are served in arrival order and sleep until a slot is released,
+        a pause ends or a quota refills.
+
+        Args:
+            requests_per_minute: Optional request quota
+            tokens_per_minute: Optional token quota
+            max_concurrency: Optional upper bound on requests in flight; None means no fixed cap
+            min_concurrency: Lower bound on requests in flight
+            pause_seconds: How long new requests are held back after a 429
+        """
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.pause_seconds = pause_seconds
+        self._lock = threading.Lock()
+        self._limit = float(max_concurrency) if max_concurrency is not None else math.inf
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._waiters = deque()
+        self.rate_limited_count = 0
+        self.configure(requests_per_minute, tokens_per_minute)
+
+    def configure(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None):
+        """Set the request and token quotas; None removes a quota"""
+        with self._lock:
+            self.requests_per_minute = requests_per_minute
+            self.tokens_per_minute = tokens_per_minute
+            self._requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+            self._tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+            if self._waiters:
+                # The new quotas may let the head of the queue through earlier
+                self._waiters[0].retry_at = None
+                self._dispatch(time.monotonic())
+
+    def _wait_time(self, tokens: int, now: float) -> float:
+        """Seconds until a pause ends and both quotas allow the request. Called with the lock held."""
+        wait = max(0.0, self._paused_until - now)
+        if self._requests is not None:
+            wait = max(wait, self._requests.wait_time(1, now))
+        if self._tokens is not None:
+            wait = max(wait, self._tokens.wait_time(tokens, now))
+        return wait
+
+    def _dispatch(self, now: float):
+        """Grant slots to queued callers in arrival order. Called with the lock held."""
+        while self._waiters:
+            waiter = self._waiters[0]
+            if self._in_flight >= self._limit:
+                # release() dispatches again
+                waiter.retry_at = None
+                return
+            wait = self._wait_time(waiter.tokens, now)
+            if wait > 0:
+                # Only the head of the queue sleeps on a timer; everyone behind it waits for a wake-up
+                previous, waiter.retry_at = waiter.retry_at, now + wait
+                if previous is None or waiter.retry_at < previous:
+                    waiter.wake()
+                return
+            self._waiters.popleft()
+            if self._requests is not None:
+                self._requests.take(1)
+            if self._tokens is not None:
+                self._tokens.take(waiter.tokens)
+            self._in_flight += 1
+            waiter.granted = True
+            waiter.wake()
+
+    def _enqueue(self, tokens: int, wake: Callable[[], None]) -> _Waiter:
+        with self._lock:
+            waiter = _Waiter(tokens, wake)
+            self._waiters.append(waiter)
+            self._dispatch(time.monotonic())
+            return waiter
+
+    def _check(self, waiter: _Waiter, clear: Callable[[], None]) -> Tuple[bool, Optional[float]]:
+        """
+        Re-check a queued caller after a wake-up or timeout
+
+        Returns:
+            Tuple[bool, Optional[float]]: Whether the slot was granted, and how long to sleep
+                otherwise (None until woken)
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not waiter.granted and waiter.retry_at is not None and now >= waiter.retry_at:
+                self._dispatch(now)
+            if waiter.granted:
+                return True, None
+            # Cleared under the lock, so a wake-up from a later dispatch is never lost
+            clear()
+            return False, None if waiter.retry_at is None else max(0.0, waiter.retry_at - now)
+
+    def _abandon(self, waiter: _Waiter):
+        """Give up a queued caller's place, or its slot if it was granted in the meantime"""
+        with self._lock:
+            if waiter.granted:
+                self._in_flight -= 1
+            else:
+                self._waiters.remove(waiter)
+            self._dispatch(time.monotonic())
+
+    def release(self, success: bool = True, rate_limited: bool = False):
+        """Free a slot, adapt the concurrency limit to the outcome of the request and wake the next caller"""
+        with self._lock:
+            self._in_flight -= 1
+            now = time.monotonic()
+            if rate_limited:
+                self.rate_limited_count += 1
+                self._paused_until = max(self._paused_until, now + self.pause_seconds)
+                # A burst of 429s from requests already in flight counts as one signal
+                if now - self._last_decrease > self.pause_seconds:
+                    # Without a fixed cap, start from the number of requests that were in flight
+                    self._limit = max(float(self.min_concurrency), min(self._limit, self._in_flight + 1) / 2)
+                    self._last_decrease = now
+                    logger.warning(f"Rate limited, reducing LLM concurrency to {int(self._limit)}")
+            elif success and self._limit != math.inf:
+                self._limit += 1.0 / self._limit
+                if self.max_concurrency is not None:
+                    self._limit = min(float(self.max_concurrency), self._limit)
+            self._dispatch(now)
+
+    def acquire(self, tokens: int = 0):
+        """Block until a slot is granted"""
+        event = threading.Event()
+        waiter = self._enqueue(tokens, event.set)
+        try:
+            while True:
+                granted, timeout = self._check(waiter, event.clear)
+                if granted:
+                    return
+                event.wait(timeout)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+
+    async def aacquire(self, tokens: int = 0):
+        """Async counterpart of acquire; the event loop is not blocked while waiting"""
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+
+        def wake():
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # The loop has been closed; the waiter is abandoned with it
+                pass
+
+        waiter = self._enqueue(tokens, wake)
+        try:
+            while True:
+                granted, timeout = self._check(waiter, event.clear)
+                if granted:
+                    return
+                try:
+                    await asyncio.wait_for(event.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            # BaseException so cancelled requests leave the queue
+            self._abandon(waiter)
+            raise
+
+    @contextmanager
+    def limit(self, tokens: int = 0):
+        """Hold a slot for the duration of one request"""
+        self.acquire(tokens)
+        try:
+            yield
+        except BaseException as e:
+            # BaseException so cancelled async requests also give their slot back
+            self.release(success=False, rate_limited=isinstance(e, Exception) and is_rate_limit_error(e))
+            raise
+        self.release()
+
+    @asynccontextmanager
+    async def alimit(self, tokens: int = 0):
+        """Async counterpart of limit"""
+        await self.aacquire(tokens)
+        try:
+            yield
+        except BaseException as e:
+            # BaseException so cancelled async requests also give their slot back
+            self.release(success=False, rate_limited=isinstance(e, Exception) and is_rate_limit_error(e))
+            raise
+        self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'concurrency_limit': None if self._limit == math.inf else int(self._limit),
+                'in_flight': self._in_flight,
+                'waiting': len(self._waiters),
+                'rate_limited': self.rate_limited_count,
+            }
+
+
+_rate_limiters: Dict[str, RateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(name: str, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None, **kwargs) -> RateLimiter:
+    """
+    Get the process-wide rate limiter for a provider, creating it on first use
+
+    Args:
+        name: Limiter name, e.g. key_limiter_name("infinigence", api_key)
+        requests_per_minute: If given, update the request quota
+        tokens_per_minute: If given, update the token quota
+        kwargs: Further RateLimiter arguments, used only when the limiter is created
+
+    Returns:
+        RateLimiter: The limiter shared by every LLM instance using this name
+    """
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(name)
+        if limiter is None:
+            limiter = RateLimiter(requests_per_minute, tokens_per_minute, **kwargs)
+            _rate_limiters[name] = limiter
+            return limiter
+    if requests_per_minute is not None or tokens_per_minute is not None:
+        limiter.configure(
+            requests_per_minute if requests_per_minute is not None else limiter.requests_per_minute,
+            tokens_per_minute if tokens_per_minute is not None else limiter.tokens_per_minute
+        )
+    return limiter
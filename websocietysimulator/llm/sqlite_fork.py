@@ -0,0 +1,34 @@
+import os
+import threading
+import weakref
+import logging
+logger = logging.getLogger("websocietysimulator")
+
+# Objects holding a sqlite connection in `_conn`, guarded by `_lock`, and opening it in `_open()`
+_owners = weakref.WeakSet()
+# Connections inherited by a forked child. They are kept referenced rather than closed, since closing
+# them in the child could release the parent's locks or checkpoint its WAL file.
+_inherited_connections = []
+
+
+def reopen_after_fork(owner):
+    """
+    Give owner a connection of its own in every child forked from this process
+
+    sqlite connections must not be used across fork. After a fork, the child replaces the lock,
+    which may have been held by another thread, and calls owner._open() for a new connection.
+    """
+    _owners.add(owner)
+
+
+def _reopen_in_child():
+    for owner in list(_owners):
+        if owner._conn is not None:
+            _inherited_connections.append(owner._conn)
+            owner._conn = None
+        owner._lock = threading.Lock()
+        owner._open()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reopen_in_child)
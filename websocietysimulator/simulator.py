@@ -1,26 +1,99 @@
+import asyncio
+import contextlib
+import inspect
 import logging
 import os
-import json
-from typing import List, Type, Dict, Any, Union
-from .tools import InteractionTool, CacheInteractionTool
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import List, Type, Dict, Any, Union, Optional
+from .tools import InteractionTool, CacheInteractionTool, SnapshotInteractionTool, SharedInteractionTool, ParquetInteractionTool
 from .tools.evaluation_tool import RecommendationEvaluator, SimulationEvaluator
 from .agent.simulation_agent import SimulationAgent
-from .llm import LLMBase
+from .llm import LLMBase, LLMPool
 from .agent.recommendation_agent import RecommendationAgent
-from .tasks.simulation_task import SimulationTask
-from .tasks.recommendation_task import RecommendationTask
-import numpy as np
+from .tasks.task_bundle import DEFAULT_NUM_WORKERS, load_task_bundle, load_task_directory, task_from_dict
 
 logger = logging.getLogger("websocietysimulator")
 
+# Per-process state set up once by _init_process_worker
+_worker_state: Dict[str, Any] = {}
+
+
+def _create_agent(agent_class: Type, llm: LLMBase, interaction_tool: Any, task: Any):
+    """Create an agent and give it the interaction tool and task."""
+    agent = agent_class(llm=llm)
+    agent.set_interaction_tool(interaction_tool)
+    agent.insert_task(task)
+    return agent
+
+
+def _run_agent_task(agent_class: Type, llm: LLMBase, interaction_tool: Any, task: Any) -> Dict[str, Any]:
+    """Run a single task with a fresh agent and wrap its output for evaluation."""
+    agent = _create_agent(agent_class, llm, interaction_tool, task)
+
+    try:
+        if inspect.iscoroutinefunction(agent.workflow):
+            output = asyncio.run(agent.workflow())
+        else:
+            output = agent.workflow()
+        result = {
+            "task": task.to_dict(),
+            "output": output
+        }
+    except NotImplementedError:
+        result = {
+            "task": task.to_dict(),
+            "error": "Forward method not implemented by participant."
+        }
+    return result
+
+
+async def _arun_agent_task(agent_class: Type, llm: LLMBase, interaction_tool: Any, task: Any,
+                           executor: Optional[Executor] = None) -> Dict[str, Any]:
+    """Async counterpart of _run_agent_task; synchronous workflows run in a thread of `executor`."""
+    agent = _create_agent(agent_class, llm, interaction_tool, task)
+
+    try:
+        if inspect.iscoroutinefunction(agent.workflow):
+            output = await agent.workflow()
+        else:
+            output = await asyncio.get_running_loop().run_in_executor(executor, agent.workflow)
+        result = {
+            "task": task.to_dict(),
+            "output": output
+        }
+    except NotImplementedError:
+        result = {
+            "task": task.to_dict(),
+            "error": "Forward method not implemented by participant."
+        }
+    return result
+
+
+def _init_process_worker(agent_class: Type, llm: LLMBase, interaction_tool: Any, shared_memory: Optional[Dict[str, Any]] = None):
+    """Store the agent class, LLM and interaction tool for the lifetime of a worker process."""
+    _worker_state["agent_class"] = agent_class
+    _worker_state["llm"] = llm
+    _worker_state["interaction_tool"] = interaction_tool
+    if shared_memory:
+        from .agent.modules.shared_memory import register_shared_memory
+        register_shared_memory(shared_memory)
+
+
+def _run_process_task(task_index_tuple) -> Dict[str, Any]:
+    index, task = task_index_tuple
+    return _run_agent_task(_worker_state["agent_class"], _worker_state["llm"], _worker_state["interaction_tool"], task)
+
+
 class Simulator:
-    def __init__(self, data_dir: str = None, device: str = "auto", cache: bool = False):
+    def __init__(self, data_dir: str = None, device: str = "auto", cache: bool = False, cache_review_features: bool = True):
         """
         Initialize the Simulator.
         Args:
             data_dir: Path to the directory containing Yelp dataset files.
             device: Device to use for evaluation. "auto" (default) will use GPU if available, otherwise CPU. Available options: "gpu", "cpu", "auto".
             cache: Whether to use cache for interaction tool.
+            cache_review_features: Whether to cache the evaluation features of ground truth reviews
+                in a `review_features.sqlite` file inside the groundtruth directory.
         """
         logger.info("Start initializing Simulator")
         self.data_dir = data_dir
@@ -36,67 +109,52 @@ class Simulator:
         
         self.tasks = []  # List to store tasks
         self.groundtruth_data = []  # List to store groundtruth data
+        self.groundtruth_dir = None
+        self.cache_review_features = cache_review_features
         self.agent_class = None
         self.llm = None
+        self.shared_memory = {}
+        self.device = device
         self.recommendation_evaluator = RecommendationEvaluator()
-        self.simulation_evaluator = SimulationEvaluator(device)
+        self._simulation_evaluator = None
         self.simulation_outputs = []
         self.evaluation_results = []
         logger.info("Simulator initialized")
 
-    def set_interaction_tool(self, interaction_tool: Union[InteractionTool, CacheInteractionTool]):
+    @property
+    def simulation_evaluator(self) -> SimulationEvaluator:
+        """The simulation evaluator, created on first use so recommendation runs never load its models."""
+        if self._simulation_evaluator is None:
+            self._simulation_evaluator = SimulationEvaluator(self.device)
+        return self._simulation_evaluator
+
+    def set_interaction_tool(self, interaction_tool: Union[InteractionTool, CacheInteractionTool, SnapshotInteractionTool, SharedInteractionTool, ParquetInteractionTool]):
         self.interaction_tool = interaction_tool
 
-    def set_task_and_groundtruth(self, task_dir: str, groundtruth_dir: str):
+    def set_task_and_groundtruth(self, task_dir: str, groundtruth_dir: Optional[str] = None, num_workers: int = DEFAULT_NUM_WORKERS):
         """
-        Load tasks from a directory.
+        Load tasks from a directory or a task bundle.
         Args:
-            task_dir: Directory containing task files.
-            groundtruth_dir: Directory containing groundtruth files.
+            task_dir: Directory containing task files, or a task bundle file written by
+                `python -m websocietysimulator.tasks.task_bundle pack`.
+            groundtruth_dir: Directory containing groundtruth files. Not needed for a bundle.
+            num_workers: Number of threads reading the files of a task directory.
         """
         self.tasks = []  # Clear previous tasks
         self.groundtruth_data = []
 
-        # 获取所有task文件并按index排序
-        task_files = sorted([f for f in os.listdir(task_dir) if f.startswith('task_') and f.endswith('.json')], 
-                          key=lambda x: int(x.split('_')[1].split('.')[0]))
+        if os.path.isfile(task_dir):
+            # A bundle holds tasks and groundtruth and is read in one pass
+            records = load_task_bundle(task_dir)
+            self.groundtruth_dir = groundtruth_dir or os.path.dirname(os.path.abspath(task_dir))
+        else:
+            if groundtruth_dir is None:
+                raise ValueError("groundtruth_dir is required when loading tasks from a directory")
+            records = load_task_directory(task_dir, groundtruth_dir, num_workers)
+            self.groundtruth_dir = groundtruth_dir
 
-        for task_file in task_files:
-            # 获取对应的groundtruth文件
-            task_index = task_file.split('_')[1].split('.')[0]
-            groundtruth_file = f'groundtruth_{task_index}.json'
-            groundtruth_path = os.path.join(groundtruth_dir, groundtruth_file)
-            
-            if not os.path.exists(groundtruth_path):
-                logger.warning(f"Groundtruth file {groundtruth_file} not found for task {task_file}")
-                continue
-
-            # 读取task文件
-            task_path = os.path.join(task_dir, task_file)
-            with open(task_path, 'r') as f:
-                task_data = json.load(f)
-                task_type = task_data.get('type')
-
-                # Determine scenario type and create corresponding object
-                if task_type == 'user_behavior_simulation':
-                    task = SimulationTask(
-                        user_id=task_data['user_id'],
-                        item_id=task_data['item_id']
-                    )
-                elif task_type == 'recommendation':
-                    task = RecommendationTask(
-                        user_id=task_data['user_id'],
-                        candidate_category=task_data['candidate_category'],
-                        candidate_list=task_data['candidate_list'],
-                        loc=task_data['loc']
-                    )
-                else:
-                    raise ValueError(f"Unsupported task type: {task_type}")
-
-            with open(groundtruth_path, 'r') as f:
-                groundtruth_data = json.load(f)
-                
-            self.tasks.append(task)
+        for _, task_data, groundtruth_data in records:
+            self.tasks.append(task_from_dict(task_data))
             self.groundtruth_data.append(groundtruth_data)
 
         logger.info(f"Loaded {len(self.tasks)} task-groundtruth pairs")
@@ -116,19 +174,52 @@ class Simulator:
         """
         Set the LLM to be used for the simulation.
         Args:
-            llm: A class inheriting from the abstract LLM class.
+            llm: A class inheriting from the abstract LLM class. A list of LLMs is wrapped in an
+                LLMPool, which sends each call to the least busy healthy member.
         """
+        if isinstance(llm, list):
+            llm = LLMPool(llm)
         self.llm = llm
         logger.info("LLM set")
 
-    def run_simulation(self, number_of_tasks: int = None, enable_threading: bool = False, max_workers: int = None) -> List[Any]:
+    def set_shared_memory(self, store: Any, memory_types: Optional[List[str]] = None):
         """
-        Run the simulation with optional multi-threading support.
+        Share a memory store between all agents of a run, so memories added while solving one task
+        can be retrieved in later tasks.
+        Args:
+            store: An InMemoryVectorStore, e.g. InMemoryVectorStore(embeddings) or one preloaded with
+                agent.modules.shared_memory.load_review_memory. Pass None to stop sharing.
+            memory_types: Memory types to share it with ('dilu', 'generative', 'tp', 'voyager'). If None, all of them.
+        """
+        from .agent.modules.shared_memory import ALL_MEMORY_TYPES
+        if store is None:
+            self.shared_memory = {}
+        else:
+            self.shared_memory = {memory_type: store for memory_type in (memory_types or [ALL_MEMORY_TYPES])}
+        logger.info("Shared memory set")
+
+    def _shared_memory_scope(self):
+        """Register the shared memory while a run creates agents, so it never leaks into other runs."""
+        if not self.shared_memory:
+            return contextlib.nullcontext()
+        from .agent.modules.shared_memory import shared_memory_scope
+        return shared_memory_scope(self.shared_memory)
+
+    def run_simulation(self, number_of_tasks: int = None, enable_threading: bool = False, max_workers: int = None, executor: Optional[str] = None) -> List[Any]:
+        """
+        Run the simulation with optional multi-threading or multi-processing support.
         
         Args:
             number_of_tasks: Number of tasks to run. If None, run all tasks.
-            enable_threading: Whether to enable multi-threading. Default is False.
-            max_workers: Maximum number of threads to use. If None, will use min(32, number_of_tasks).
+            enable_threading: Whether to enable multi-threading. Default is False. Shorthand for executor="thread".
+            max_workers: Maximum number of threads or processes to use. If None, will use min(32, number_of_tasks) threads
+                or min(cpu_count, number_of_tasks) processes. For "async", the maximum number of tasks in flight.
+                LLM requests are additionally limited by the provider's rate limiter, which adapts to 429 responses
+                and has no fixed concurrency cap unless created with max_concurrency (see RateLimiter).
+            executor: "serial", "thread", "process" or "async". If None, it is chosen from enable_threading.
+                In "process" mode the agent class, LLM, interaction tool and shared memory are sent to each worker once,
+                so they must be picklable unless the platform's default start method is fork. Each worker then appends to its own
+                copy of the shared memory.
         Returns:
             List of outputs from agents for each scenario.
         """
@@ -137,37 +228,34 @@ class Simulator:
             raise RuntimeError("Agent class is not set. Use set_agent() to set it.")
         if not self.interaction_tool:
             raise RuntimeError("Interaction tool is not set. Use set_interaction_tool() to set it.")
+        if executor is None:
+            executor = "thread" if enable_threading else "serial"
+        if executor not in ("serial", "thread", "process", "async"):
+            raise ValueError("executor must be 'serial', 'thread', 'process' or 'async'")
+        if executor == "async":
+            return asyncio.run(self.arun_simulation(number_of_tasks=number_of_tasks, max_concurrency=max_workers))
 
+        # Memory modules look the shared store up when agents are created
+        with self._shared_memory_scope():
+            self._run_tasks(number_of_tasks, executor, max_workers)
+
+        logger.info("Simulation finished")
+        return self.simulation_outputs
+
+    def _run_tasks(self, number_of_tasks: Optional[int], executor: str, max_workers: Optional[int]):
+        """Run the tasks with the "serial", "thread" or "process" executor, filling simulation_outputs."""
         task_to_run = self.tasks[:number_of_tasks] if number_of_tasks is not None else self.tasks
         logger.info(f"Total tasks: {len(task_to_run)}")
 
         # 如果不启用多线程，使用原始的串行处理
-        if not enable_threading:
+        if executor == "serial":
             self.simulation_outputs = []
             for index, task in enumerate(task_to_run):
-                if isinstance(self.llm, list):
-                    agent = self.agent_class(llm=self.llm[index%len(self.llm)])
-                else:
-                    agent = self.agent_class(llm=self.llm)
-                agent.set_interaction_tool(self.interaction_tool)
-                agent.insert_task(task)
-                
-                try:
-                    output = agent.workflow()
-                    result = {
-                        "task": task.to_dict(),
-                        "output": output
-                    }
-                except NotImplementedError:
-                    result = {
-                        "task": task.to_dict(),
-                        "error": "Forward method not implemented by participant."
-                    }
+                result = _run_agent_task(self.agent_class, self.llm, self.interaction_tool, task)
                 self.simulation_outputs.append(result)
                 logger.info(f"Simulation finished for task {index}")
-        else:
+        elif executor == "thread":
             # 多线程处理
-            from concurrent.futures import ThreadPoolExecutor
             from threading import Lock
 
             log_lock = Lock()
@@ -175,21 +263,7 @@ class Simulator:
 
             def process_task(task_index_tuple):
                 index, task = task_index_tuple
-                agent = self.agent_class(llm=self.llm)
-                agent.set_interaction_tool(self.interaction_tool)
-                agent.insert_task(task)
-                
-                try:
-                    output = agent.workflow()
-                    result = {
-                        "task": task.to_dict(),
-                        "output": output
-                    }
-                except NotImplementedError:
-                    result = {
-                        "task": task.to_dict(),
-                        "error": "Forward method not implemented by participant."
-                    }
+                result = _run_agent_task(self.agent_class, self.llm, self.interaction_tool, task)
                 
                 with log_lock:
                     logger.info(f"Simulation finished for task {index}")
@@ -204,8 +278,71 @@ class Simulator:
                 max_workers = min(max_workers, len(task_to_run))
             
             logger.info(f"Running with {max_workers} threads")
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                list(executor.map(process_task, enumerate(task_to_run)))
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                list(pool.map(process_task, enumerate(task_to_run)))
+        else:
+            # 多进程处理
+            from concurrent.futures import ProcessPoolExecutor
+
+            self.simulation_outputs = [None] * len(task_to_run)
+            if max_workers is None:
+                max_workers = min(os.cpu_count() or 1, len(task_to_run))
+            else:
+                max_workers = min(max_workers, len(task_to_run))
+
+            # The platform's default start method; sqlite-backed caches reopen their connections after a fork
+            logger.info(f"Running with {max_workers} processes")
+            with ProcessPoolExecutor(
+                max_workers=max_workers,
+                initializer=_init_process_worker,
+                initargs=(self.agent_class, self.llm, self.interaction_tool, self.shared_memory)
+            ) as pool:
+                # map yields results in task order as soon as each one is ready
+                for index, result in enumerate(pool.map(_run_process_task, enumerate(task_to_run))):
+                    self.simulation_outputs[index] = result
+                    logger.info(f"Simulation finished for task {index}")
+
+    async def arun_simulation(self, number_of_tasks: int = None, max_concurrency: int = None) -> List[Any]:
+        """
+        Run the simulation on an asyncio event loop.
+        Agents may define `async def workflow` and await `self.llm.acall(...)`, so a single
+        process can keep many requests in flight. Synchronous workflows run in a thread pool with
+        max_concurrency threads, so they are not limited by the loop's default executor (min(32, cpu_count + 4)).
+        
+        Args:
+            number_of_tasks: Number of tasks to run. If None, run all tasks.
+            max_concurrency: Maximum number of tasks running at once. If None, will use min(256, number_of_tasks).
+        Returns:
+            List of outputs from agents for each scenario.
+        """
+        logger.info("Running simulation")
+        if not self.agent_class:
+            raise RuntimeError("Agent class is not set. Use set_agent() to set it.")
+        if not self.interaction_tool:
+            raise RuntimeError("Interaction tool is not set. Use set_interaction_tool() to set it.")
+
+        task_to_run = self.tasks[:number_of_tasks] if number_of_tasks is not None else self.tasks
+        logger.info(f"Total tasks: {len(task_to_run)}")
+        if max_concurrency is None:
+            max_concurrency = min(256, len(task_to_run))
+        max_concurrency = max(1, min(max_concurrency, len(task_to_run)))
+        semaphore = asyncio.Semaphore(max_concurrency)
+        executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self.simulation_outputs = [None] * len(task_to_run)
+
+        async def process_task(index, task):
+            async with semaphore:
+                result = await _arun_agent_task(self.agent_class, self.llm, self.interaction_tool, task, executor)
+            logger.info(f"Simulation finished for task {index}")
+            self.simulation_outputs[index] = result
+
+        logger.info(f"Running with up to {max_concurrency} concurrent tasks")
+        try:
+            with self._shared_memory_scope():
+                await asyncio.gather(*(process_task(index, task) for index, task in enumerate(task_to_run)))
+        finally:
+            # Threads are only started on demand, so async-only agents never create them
+            executor.shutdown(wait=False)
 
         logger.info("Simulation finished")
         return self.simulation_outputs
@@ -281,9 +418,13 @@ class Simulator:
         Evaluate simulation results
         """
         simulated_data = [output['output'] for output in self.simulation_outputs]
+        feature_cache_path = None
+        if self.cache_review_features and self.groundtruth_dir:
+            feature_cache_path = os.path.join(self.groundtruth_dir, 'review_features.sqlite')
         metrics = self.simulation_evaluator.calculate_metrics(
             simulated_data=simulated_data,
-            real_data=ground_truth_data
+            real_data=ground_truth_data,
+            feature_cache_path=feature_cache_path
         )
         return {
             'type': 'simulation',
@@ -0,0 +1,162 @@
+import argparse
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
+from .simulation_task import SimulationTask
+from .recommendation_task import RecommendationTask
+
+logger = logging.getLogger("websocietysimulator")
+
+# (task index, task data, groundtruth data)
+TaskRecord = Tuple[int, Dict, Dict]
+
+# Files are opened concurrently; on network filesystems the per-file latency dominates
+DEFAULT_NUM_WORKERS = 32
+
+
+def task_from_dict(task_data: Dict) -> Union[SimulationTask, RecommendationTask]:
+    """
+    Create a task object from the contents of a task file.
+    Args:
+        task_data: Task data with a 'type' of 'user_behavior_simulation' or 'recommendation'.
+    Returns:
+        The corresponding SimulationTask or RecommendationTask.
+    """
+    task_type = task_data.get('type')
+
+    # Determine scenario type and create corresponding object
+    if task_type == 'user_behavior_simulation':
+        return SimulationTask(
+            user_id=task_data['user_id'],
+            item_id=task_data['item_id']
+        )
+    elif task_type == 'recommendation':
+        return RecommendationTask(
+            user_id=task_data['user_id'],
+            candidate_category=task_data['candidate_category'],
+            candidate_list=task_data['candidate_list'],
+            loc=task_data['loc']
+        )
+    else:
+        raise ValueError(f"Unsupported task type: {task_type}")
+
+
+def _read_task_pair(task_dir: str, groundtruth_dir: str, task_file: str) -> Optional[TaskRecord]:
+    # 获取对应的groundtruth文件
+    task_index = task_file.split('_')[1].split('.')[0]
+    groundtruth_file = f'groundtruth_{task_index}.json'
+    groundtruth_path = os.path.join(groundtruth_dir, groundtruth_file)
+    try:
+        with open(groundtruth_path, 'r') as f:
+            groundtruth_data = json.load(f)
+    except FileNotFoundError:
+        logger.warning(f"Groundtruth file {groundtruth_file} not found for task {task_file}")
+        return None
+    with open(os.path.join(task_dir, task_file), 'r') as f:
+        task_data = json.load(f)
+    return int(task_index), task_data, groundtruth_data
+
+
+def load_task_directory(task_dir: str, groundtruth_dir: str, num_workers: int = DEFAULT_NUM_WORKERS) -> List[TaskRecord]:
+    """
+    Read task_N.json and groundtruth_N.json pairs, ordered by N. Tasks without groundtruth are skipped.
+    Args:
+        task_dir: Directory containing task files.
+        groundtruth_dir: Directory containing groundtruth files.
+        num_workers: Number of threads reading files.
+    Returns:
+        List of (index, task data, groundtruth data).
+    """
+    # 获取所有task文件并按index排序
+    task_files = sorted([f for f in os.listdir(task_dir) if f.startswith('task_') and f.endswith('.json')],
+                        key=lambda x: int(x.split('_')[1].split('.')[0]))
+    with ThreadPoolExecutor(max_workers=max(1, num_workers)) as executor:
+        records = executor.map(lambda task_file: _read_task_pair(task_dir, groundtruth_dir, task_file), task_files)
+        return [record for record in records if record is not None]
+
+
+def load_task_bundle(bundle_path: str) -> List[TaskRecord]:
+    """
+    Read a task bundle: a JSON lines file with one {"index", "task", "groundtruth"} record per task.
+    Args:
+        bundle_path: Path of the bundle file.
+    Returns:
+        List of (index, task data, groundtruth data), in file order.
+    """
+    # One sequential read instead of two file opens per task
+    with open(bundle_path, 'r') as f:
+        lines = f.read().splitlines()
+    records = []
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        records.append((record['index'], record['task'], record['groundtruth']))
+    return records
+
+
+def write_task_bundle(records: List[TaskRecord], bundle_path: str):
+    """Write (index, task data, groundtruth data) records as a task bundle, atomically."""
+    directory = os.path.dirname(bundle_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f'{bundle_path}.tmp'
+    with open(tmp_path, 'w') as f:
+        for index, task_data, groundtruth_data in records:
+            f.write(json.dumps({'index': index, 'task': task_data, 'groundtruth': groundtruth_data}) + '\n')
+    os.replace(tmp_path, bundle_path)
+
+
+def bundle_task_directory(task_dir: str, groundtruth_dir: str, bundle_path: str, num_workers: int = DEFAULT_NUM_WORKERS) -> int:
+    """
+    Convert a task and groundtruth directory pair into a task bundle.
+    Returns:
+        int: Number of tasks written.
+    """
+    records = load_task_directory(task_dir, groundtruth_dir, num_workers)
+    write_task_bundle(records, bundle_path)
+    logger.info(f"Bundled {len(records)} tasks into {bundle_path}")
+    return len(records)
+
+
+def unbundle_task_file(bundle_path: str, task_dir: str, groundtruth_dir: str) -> int:
+    """
+    Convert a task bundle back into task_N.json and groundtruth_N.json files.
+    Returns:
+        int: Number of tasks written.
+    """
+    records = load_task_bundle(bundle_path)
+    os.makedirs(task_dir, exist_ok=True)
+    os.makedirs(groundtruth_dir, exist_ok=True)
+    for index, task_data, groundtruth_data in records:
+        with open(os.path.join(task_dir, f'task_{index}.json'), 'w') as f:
+            json.dump(task_data, f)
+        with open(os.path.join(groundtruth_dir, f'groundtruth_{index}.json'), 'w') as f:
+            json.dump(groundtruth_data, f)
+    logger.info(f"Unbundled {len(records)} tasks from {bundle_path}")
+    return len(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert task sets between the directory layout and a single bundle file.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    pack = subparsers.add_parser('pack', help="Bundle task_N.json and groundtruth_N.json files into one file.")
+    pack.add_argument('--task_dir', required=True, help="Directory containing task files.")
+    pack.add_argument('--groundtruth_dir', required=True, help="Directory containing groundtruth files.")
+    pack.add_argument('--output', required=True, help="Bundle file to write, e.g. tasks.jsonl.")
+    pack.add_argument('--num_workers', type=int, default=DEFAULT_NUM_WORKERS, help="Number of threads reading files.")
+    unpack = subparsers.add_parser('unpack', help="Write the tasks of a bundle back to separate files.")
+    unpack.add_argument('--bundle', required=True, help="Bundle file to read.")
+    unpack.add_argument('--task_dir', required=True, help="Directory to write task files to.")
+    unpack.add_argument('--groundtruth_dir', required=True, help="Directory to write groundtruth files to.")
+    args = parser.parse_args()
+    if args.command == 'pack':
+        bundle_task_directory(args.task_dir, args.groundtruth_dir, args.output, args.num_workers)
+    else:
+        unbundle_task_file(args.bundle, args.task_dir, args.groundtruth_dir)
+
+
+if __name__ == '__main__':
+    main()
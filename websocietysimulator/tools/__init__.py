@@ -1,5 +1,7 @@
 from .interaction_tool import InteractionTool
 from .evaluation_tool import RecommendationEvaluator, SimulationEvaluator
 from .cache_interaction_tool import CacheInteractionTool
+from .snapshot_interaction_tool import SnapshotInteractionTool, SharedInteractionTool, compile_snapshot
+from .parquet_interaction_tool import ParquetInteractionTool
 
-__all__ = ['InteractionTool', 'RecommendationEvaluator', 'SimulationEvaluator', 'CacheInteractionTool']
\ No newline at end of file
+__all__ = ['InteractionTool', 'RecommendationEvaluator', 'SimulationEvaluator', 'CacheInteractionTool', 'SnapshotInteractionTool', 'SharedInteractionTool', 'compile_snapshot', 'ParquetInteractionTool']
\ No newline at end of file
@@ -1,65 +1,166 @@
 import logging
 import os
 import json
-from typing import Optional, Dict, List, Iterator
+import pickle
+import threading
+from typing import Optional, Dict, List
 from cachetools import LRUCache
 
 logger = logging.getLogger("websocietysimulator")
 
+INDEX_VERSION = 1
+# filename -> (field used as primary key, fields used to build posting lists)
+INDEX_FIELDS = {
+    'user.json': ('user_id', ()),
+    'item.json': ('item_id', ()),
+    'review.json': ('review_id', ('item_id', 'user_id')),
+}
+
 class CacheInteractionTool:
-    def __init__(self, data_dir: str, cache_size: int = 10000):
+    def __init__(self, data_dir: str, cache_size: int = 10000, index_dir: Optional[str] = None):
         """
         Initialize the tool with the dataset directory.
         Args:
             data_dir: Path to the directory containing Yelp dataset files.
             cache_size: Maximum number of items to keep in each cache.
+            index_dir: Directory for the byte-offset index sidecar files. Defaults to data_dir.
         """
         logger.info(f"Initializing InteractionTool with data directory: {data_dir}")
         self.data_dir = data_dir
+        self.cache_size = cache_size
+        self.index_dir = index_dir or data_dir
         self.user_cache = LRUCache(maxsize=cache_size)
         self.item_cache = LRUCache(maxsize=cache_size)
         self.review_cache = LRUCache(maxsize=cache_size)
         self.item_reviews_cache = LRUCache(maxsize=cache_size)
         self.user_reviews_cache = LRUCache(maxsize=cache_size)
+        self._indexes = {}
+        self._index_lock = threading.Lock()
+        self._files = {}
+        self._file_locks = {filename: threading.Lock() for filename in INDEX_FIELDS}
+
+    def __getstate__(self):
+        # Locks and open files cannot be pickled; the receiving process reloads the sidecar indexes
+        return {'data_dir': self.data_dir, 'cache_size': self.cache_size, 'index_dir': self.index_dir}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _index_path(self, filename: str) -> str:
+        return os.path.join(self.index_dir, f'.{filename}.idx')
 
-    def _iter_file(self, filename: str) -> Iterator[Dict]:
-        """Iterate through file line by line."""
+    def _get_index(self, filename: str) -> Dict:
+        """Get the byte-offset index of a file, loading or building it on first use."""
+        index = self._indexes.get(filename)
+        if index is not None:
+            return index
+        with self._index_lock:
+            if filename not in self._indexes:
+                self._indexes[filename] = self._load_or_build_index(filename)
+            return self._indexes[filename]
+
+    def _load_or_build_index(self, filename: str) -> Dict:
         file_path = os.path.join(self.data_dir, filename)
-        with open(file_path, 'r', encoding='utf-8') as file:
+        stat = os.stat(file_path)
+        source = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+        index_path = self._index_path(filename)
+
+        if os.path.exists(index_path):
+            try:
+                with open(index_path, 'rb') as file:
+                    sidecar = pickle.load(file)
+                if sidecar.get('version') == INDEX_VERSION and sidecar.get('source') == source:
+                    logger.info(f"Loaded index for {filename} from {index_path}")
+                    return sidecar['index']
+                logger.info(f"Index {index_path} is stale, rebuilding")
+            except Exception as e:
+                logger.warning(f"Failed to read index {index_path}: {e}")
+
+        index = self._build_index(filename)
+        try:
+            tmp_path = f'{index_path}.tmp'
+            with open(tmp_path, 'wb') as file:
+                pickle.dump({'version': INDEX_VERSION, 'source': source, 'index': index}, file,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, index_path)
+            logger.info(f"Saved index for {filename} to {index_path}")
+        except OSError as e:
+            logger.warning(f"Could not save index {index_path}, keeping it in memory only: {e}")
+        return index
+
+    def _build_index(self, filename: str) -> Dict:
+        """Scan a JSONL file once, mapping IDs to the byte offsets of their lines."""
+        logger.info(f"Building index for {filename}")
+        key_field, posting_fields = INDEX_FIELDS[filename]
+        keys = {}
+        postings = {field: {} for field in posting_fields}
+        file_path = os.path.join(self.data_dir, filename)
+        with open(file_path, 'rb') as file:
+            offset = 0
             for line in file:
-                yield json.loads(line)
+                if line.strip():
+                    record = json.loads(line)
+                    # Keep the first occurrence, matching the previous full-scan lookup
+                    keys.setdefault(record[key_field], offset)
+                    for field in posting_fields:
+                        postings[field].setdefault(record[field], []).append(offset)
+                offset += len(line)
+        return {'keys': keys, 'postings': postings}
+
+    def _read_lines(self, filename: str, offsets: List[int]) -> List[Dict]:
+        """Read and parse the lines starting at the given byte offsets."""
+        with self._file_locks[filename]:
+            file = self._files.get(filename)
+            if file is None:
+                file = open(os.path.join(self.data_dir, filename), 'rb')
+                self._files[filename] = file
+            records = []
+            for offset in offsets:
+                file.seek(offset)
+                records.append(json.loads(file.readline()))
+            return records
+
+    def _lookup(self, filename: str, key: str) -> Optional[Dict]:
+        offset = self._get_index(filename)['keys'].get(key)
+        if offset is None:
+            return None
+        return self._read_lines(filename, [offset])[0]
+
+    def _lookup_postings(self, filename: str, field: str, key: str) -> List[Dict]:
+        offsets = self._get_index(filename)['postings'][field].get(key)
+        if not offsets:
+            return []
+        return self._read_lines(filename, offsets)
 
     def get_user(self, user_id: str) -> Optional[Dict]:
         """Fetch user data based on user_id."""
         user = self.user_cache.get(user_id)
         if user is not None:
             return user
-        
-        for user in self._iter_file('user.json'):
-            if user['user_id'] == user_id:
-                self.user_cache[user_id] = user
-                return user
-        return None
+
+        user = self._lookup('user.json', user_id)
+        if user is not None:
+            self.user_cache[user_id] = user
+        return user
 
     def get_item(self, item_id: str) -> Optional[Dict]:
         """Fetch item data based on item_id."""
         if not item_id:
             return None
-            
+
         item = self.item_cache.get(item_id)
         if item is not None:
             return item
-        
-        for item in self._iter_file('item.json'):
-            if item['item_id'] == item_id:
-                self.item_cache[item_id] = item
-                return item
-        return None
+
+        item = self._lookup('item.json', item_id)
+        if item is not None:
+            self.item_cache[item_id] = item
+        return item
 
     def get_reviews(
-        self, 
-        item_id: Optional[str] = None, 
-        user_id: Optional[str] = None, 
+        self,
+        item_id: Optional[str] = None,
+        user_id: Optional[str] = None,
         review_id: Optional[str] = None
     ) -> List[Dict]:
         """Fetch reviews filtered by various parameters."""
@@ -67,35 +168,29 @@ class CacheInteractionTool:
             review = self.review_cache.get(review_id)
             if review is not None:
                 return [review]
-            
-            for review in self._iter_file('review.json'):
-                if review['review_id'] == review_id:
-                    self.review_cache[review_id] = review
-                    return [review]
-            return []
+
+            review = self._lookup('review.json', review_id)
+            if review is None:
+                return []
+            self.review_cache[review_id] = review
+            return [review]
 
         if item_id:
             cached_reviews = self.item_reviews_cache.get(item_id)
             if cached_reviews is not None:
                 return cached_reviews
-            
-            reviews = []
-            for review in self._iter_file('review.json'):
-                if review['item_id'] == item_id:
-                    reviews.append(review)
+
+            reviews = self._lookup_postings('review.json', 'item_id', item_id)
             self.item_reviews_cache[item_id] = reviews
             return reviews
-            
+
         elif user_id:
             cached_reviews = self.user_reviews_cache.get(user_id)
             if cached_reviews is not None:
                 return cached_reviews
-                
-            reviews = []
-            for review in self._iter_file('review.json'):
-                if review['user_id'] == user_id:
-                    reviews.append(review)
+
+            reviews = self._lookup_postings('review.json', 'user_id', user_id)
             self.user_reviews_cache[user_id] = reviews
             return reviews
-        
-        return []
\ No newline at end of file
+
+        return []
@@ -1,25 +1,24 @@
 import json
 import logging
 import numpy as np
-from typing import List, Dict, Union
+from typing import Any, List, Dict, Optional, Union
 from dataclasses import dataclass
-from nltk.sentiment import SentimentIntensityAnalyzer
-from transformers import pipeline
-from sentence_transformers import SentenceTransformer
-from scipy.spatial import distance
-import torch
-import nltk
+import threading
+from .review_feature_cache import open_review_feature_cache
 
 def ensure_nltk_data():
     """Ensure NLTK data is available"""
+    import nltk
     try:
         nltk.data.find('sentiment/vader_lexicon.zip')
     except LookupError:
         logging.warning("VADER lexicon not found, downloading...")
         nltk.download('vader_lexicon', quiet=True)
 
-# Check NLTK data availability at import time
-ensure_nltk_data()
+EMOTION_MODEL = "cardiffnlp/twitter-roberta-base-emotion"
+TOPIC_MODEL = "paraphrase-MiniLM-L6-v2"
+# Reviews are truncated to this many characters before emotion classification
+EMOTION_MAX_CHARS = 300
 
 @dataclass
 class RecommendationMetrics:
@@ -93,27 +92,72 @@ class RecommendationEvaluator(BaseEvaluator):
 class SimulationEvaluator(BaseEvaluator):
     """Evaluator for simulation tasks"""
     
-    def __init__(self, device: str = "auto"):
+    def __init__(self, device: str = "auto", batch_size: int = 64):
+        """
+        Models are loaded on first use, so constructing the evaluator does not import torch or nltk.
+        Args:
+            device: "cpu", "gpu" or "auto".
+            batch_size: Number of reviews per forward pass of the embedding and emotion models.
+        """
         super().__init__()
-        self.device = self._get_device(device)
-        
-        pipeline_device = self.device
-        st_device = "cuda" if self.device == 0 else "cpu" 
-        
-        self.sia = SentimentIntensityAnalyzer()
-        self.emotion_classifier = pipeline(
-            "text-classification",
-            model="cardiffnlp/twitter-roberta-base-emotion",
-            top_k=5,
-            device=pipeline_device
-        )
-        self.topic_model = SentenceTransformer(
-            'paraphrase-MiniLM-L6-v2',
-            device=st_device
-        )
-        
+        if device not in ("cpu", "gpu", "auto"):
+            raise ValueError("Device type must be 'cpu', 'gpu' or 'auto'")
+        self.device_type = device
+        self.batch_size = batch_size
+        self._device = None
+        self._sia = None
+        self._emotion_classifier = None
+        self._topic_model = None
+        self._model_lock = threading.Lock()
+
+    @property
+    def device(self) -> int:
+        if self._device is None:
+            self._device = self._get_device(self.device_type)
+        return self._device
+
+    @property
+    def sia(self):
+        if self._sia is None:
+            with self._model_lock:
+                if self._sia is None:
+                    # Checked here rather than at import time, since it may download the lexicon
+                    ensure_nltk_data()
+                    from nltk.sentiment import SentimentIntensityAnalyzer
+                    self._sia = SentimentIntensityAnalyzer()
+        return self._sia
+
+    @property
+    def emotion_classifier(self):
+        if self._emotion_classifier is None:
+            with self._model_lock:
+                if self._emotion_classifier is None:
+                    from transformers import pipeline
+                    logging.info(f"Loading emotion model {EMOTION_MODEL}")
+                    self._emotion_classifier = pipeline(
+                        "text-classification",
+                        model=EMOTION_MODEL,
+                        top_k=5,
+                        device=self.device
+                    )
+        return self._emotion_classifier
+
+    @property
+    def topic_model(self):
+        if self._topic_model is None:
+            with self._model_lock:
+                if self._topic_model is None:
+                    from sentence_transformers import SentenceTransformer
+                    logging.info(f"Loading topic model {TOPIC_MODEL}")
+                    self._topic_model = SentenceTransformer(
+                        TOPIC_MODEL,
+                        device="cuda" if self.device == 0 else "cpu"
+                    )
+        return self._topic_model
+
     def _get_device(self, device: str) -> int:
         """Parse device from string"""
+        import torch
         if device == "gpu":
             if torch.cuda.is_available():
                 return 0  # GPU
@@ -130,9 +174,17 @@ class SimulationEvaluator(BaseEvaluator):
     def calculate_metrics(
         self,
         simulated_data: List[Dict],
-        real_data: List[Dict]
+        real_data: List[Dict],
+        feature_cache_path: Optional[str] = None
     ) -> SimulationMetrics:
-        """Calculate all simulation metrics"""
+        """
+        Calculate all simulation metrics
+        Args:
+            simulated_data: Agent outputs with 'stars' and 'review'.
+            real_data: Ground truth with 'stars' and 'review'.
+            feature_cache_path: Optional sqlite file caching the features of the ground truth reviews,
+                so repeated evaluations only compute features for the simulated side.
+        """
         # Calculate star error
         simulated_stars = [item['stars'] for item in simulated_data]
         real_stars = [item['stars'] for item in real_data]
@@ -151,7 +203,8 @@ class SimulationEvaluator(BaseEvaluator):
         real_reviews = [item['review'] for item in real_data]
         review_details = self._calculate_review_metrics(
             simulated_reviews,
-            real_reviews
+            real_reviews,
+            feature_cache_path
         )
 
         sentiment_error = review_details['sentiment_error']
@@ -172,34 +225,25 @@ class SimulationEvaluator(BaseEvaluator):
     def _calculate_review_metrics(
         self,
         simulated_reviews: List[str],
-        real_reviews: List[str]
+        real_reviews: List[str],
+        feature_cache_path: Optional[str] = None
     ) -> Dict[str, float]:
         """Calculate detailed review metrics between two texts"""
+        simulated_features = self._compute_review_features(simulated_reviews)
+        if feature_cache_path:
+            real_features = self._cached_review_features(real_reviews, feature_cache_path)
+        else:
+            real_features = self._compute_review_features(real_reviews)
+
         # sentiment analysis
-        sentiment_error = []
-        emotion_error = []
-        topic_error = []
-        for simulated_review, real_review in zip(simulated_reviews, real_reviews):
-            # sentiment analysis
-            sentiment1 = self.sia.polarity_scores(simulated_review)['compound']
-            sentiment2 = self.sia.polarity_scores(real_review)['compound']
-            sentiment_error_single = abs(sentiment1 - sentiment2) / 2
-            sentiment_error.append(sentiment_error_single)
-
-            # Topic analysis
-            embeddings = self.topic_model.encode([simulated_review, real_review])
-            topic_error_single = distance.cosine(embeddings[0], embeddings[1]) / 2
-            topic_error.append(topic_error_single)
+        sentiment_error = np.abs(simulated_features['sentiment'] - real_features['sentiment']) / 2
+
+        # Topic analysis, compared pairwise in one vectorized step
+        topic_error = self._cosine_distance(simulated_features['embedding'], real_features['embedding']) / 2
 
         # Emotion analysis
-        for i in range(len(simulated_reviews)):
-            if len(simulated_reviews[i]) > 300:
-                simulated_reviews[i] = simulated_reviews[i][:300]
-            if len(real_reviews[i]) > 300:
-                real_reviews[i] = real_reviews[i][:300]
-        simulated_emotions = self.emotion_classifier(simulated_reviews)
-        real_emotions = self.emotion_classifier(real_reviews)
-        for sim_emotion, real_emotion in zip(simulated_emotions, real_emotions):
+        emotion_error = []
+        for sim_emotion, real_emotion in zip(simulated_features['emotions'], real_features['emotions']):
             emotion_error_single = self._calculate_emotion_error(sim_emotion, real_emotion)
             emotion_error.append(emotion_error_single)
 
@@ -212,6 +256,62 @@ class SimulationEvaluator(BaseEvaluator):
             'topic_error': topic_error,
         }
 
+    def _compute_review_features(self, reviews: List[str]) -> Dict[str, Any]:
+        """Compute sentiment scores, topic embeddings and emotion distributions for a list of reviews"""
+        sentiments = np.array([self.sia.polarity_scores(review)['compound'] for review in reviews], dtype=np.float64)
+        # Encoded in batches rather than one forward pass per review
+        embeddings = self.topic_model.encode(reviews, batch_size=self.batch_size, convert_to_numpy=True)
+        emotions = self.emotion_classifier(
+            [review[:EMOTION_MAX_CHARS] for review in reviews],
+            batch_size=self.batch_size
+        ) if reviews else []
+        return {
+            'sentiment': sentiments,
+            'embedding': np.asarray(embeddings, dtype=np.float32),
+            'emotions': emotions,
+        }
+
+    def _cached_review_features(self, reviews: List[str], feature_cache_path: str) -> Dict[str, Any]:
+        """Like _compute_review_features, but reuses features stored in the feature cache"""
+        cache = open_review_feature_cache(
+            feature_cache_path,
+            model_tag=f'{TOPIC_MODEL}|{EMOTION_MODEL}|{EMOTION_MAX_CHARS}|vader'
+        )
+        if cache is None:
+            return self._compute_review_features(reviews)
+        try:
+            cached = cache.get_many(reviews)
+            missing = list(dict.fromkeys(review for review in reviews if review not in cached))
+            logging.info(f"Review feature cache: {len(reviews) - len(missing)} hits, {len(missing)} misses")
+            if missing:
+                computed = self._compute_review_features(missing)
+                new_features = {
+                    review: {
+                        'sentiment': computed['sentiment'][i],
+                        'embedding': computed['embedding'][i],
+                        'emotions': computed['emotions'][i],
+                    }
+                    for i, review in enumerate(missing)
+                }
+                cache.put_many(new_features)
+                cached.update(new_features)
+        finally:
+            cache.close()
+        return {
+            'sentiment': np.array([cached[review]['sentiment'] for review in reviews], dtype=np.float64),
+            'embedding': np.array([cached[review]['embedding'] for review in reviews], dtype=np.float32),
+            'emotions': [cached[review]['emotions'] for review in reviews],
+        }
+
+    @staticmethod
+    def _cosine_distance(embeddings1: np.ndarray, embeddings2: np.ndarray) -> np.ndarray:
+        """Row-wise cosine distance between two embedding matrices"""
+        embeddings1 = np.asarray(embeddings1, dtype=np.float64)
+        embeddings2 = np.asarray(embeddings2, dtype=np.float64)
+        dot = np.einsum('ij,ij->i', embeddings1, embeddings2)
+        norms = np.linalg.norm(embeddings1, axis=1) * np.linalg.norm(embeddings2, axis=1)
+        return 1.0 - dot / norms
+
     def _calculate_emotion_error(
         self,
         emotions1: List[Dict],
@@ -1,46 +1,147 @@
 import logging
 import os
 import json
-import pandas as pd
-from typing import Optional, Dict, List, Any
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Dict, List, Tuple
 
 logger = logging.getLogger("websocietysimulator")
 
+# Smallest byte range worth shipping to a worker process
+MIN_CHUNK_BYTES = 1 << 20
+# Chunks per worker, so that uneven chunks still balance across the pool
+CHUNKS_PER_WORKER = 4
+
+
+def _chunk_boundaries(file_path: str, num_chunks: int) -> List[Tuple[int, int]]:
+    """Split a file into byte ranges that start and end on line boundaries."""
+    size = os.path.getsize(file_path)
+    boundaries = [0]
+    with open(file_path, 'rb') as file:
+        for i in range(1, num_chunks):
+            file.seek(max(i * size // num_chunks - 1, 0))
+            file.readline()
+            position = file.tell()
+            if boundaries[-1] < position < size:
+                boundaries.append(position)
+    boundaries.append(size)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def _parse_chunk(file_path: str, start: int, end: int) -> List[Dict]:
+    """Parse the JSON lines in a byte range of a file."""
+    with open(file_path, 'rb') as file:
+        file.seek(start)
+        data = file.read(end - start)
+    return [json.loads(line) for line in data.split(b'\n') if line.strip()]
+
+
+def _parse_review_chunk(file_path: str, start: int, end: int) -> Tuple[List[Dict], Dict[str, List[Dict]], Dict[str, List[Dict]]]:
+    """Parse a byte range of review.json and build its item and user indices."""
+    reviews = _parse_chunk(file_path, start, end)
+    item_reviews = {}
+    user_reviews = {}
+    for review in reviews:
+        item_reviews.setdefault(review['item_id'], []).append(review)
+        user_reviews.setdefault(review['user_id'], []).append(review)
+    # Returned together so pickling keeps the indices pointing at the same review objects
+    return reviews, item_reviews, user_reviews
+
+
 class InteractionTool:
-    def __init__(self, data_dir: str):
+    def __init__(self, data_dir: str, num_workers: Optional[int] = 1):
         """
         Initialize the tool with the dataset directory.
         Args:
             data_dir: Path to the directory containing Yelp dataset files.
+            num_workers: Number of processes used to parse the dataset. 1 (default) parses
+                serially, None uses all available cores.
         """
         logger.info(f"Initializing InteractionTool with data directory: {data_dir}")
         self.data_dir = data_dir
-        # Convert DataFrames to dictionaries for O(1) lookup
-        logger.info(f"Loading item data from {os.path.join(data_dir, 'item.json')}")
-        self.item_data = {item['item_id']: item for item in self._load_data('item.json')}
-        logger.info(f"Loading user data from {os.path.join(data_dir, 'user.json')}")
-        self.user_data = {user['user_id']: user for user in self._load_data('user.json')}
-        
-        # Create review indices
-        logger.info(f"Loading review data from {os.path.join(data_dir, 'review.json')}")
-        reviews = self._load_data('review.json')
-        self.review_data = {review['review_id']: review for review in reviews}
-        self.item_reviews = {}
-        self.user_reviews = {}
-        
-        # Build review indices
-        logger.info("Building review indices")
-        for review in reviews:
-            # Index by item_id
-            self.item_reviews.setdefault(review['item_id'], []).append(review)
-            # Index by user_id
-            self.user_reviews.setdefault(review['user_id'], []).append(review)
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self._executor = None
+
+        if self.num_workers > 1:
+            logger.info(f"Loading data with {self.num_workers} processes")
+            self._executor = ProcessPoolExecutor(max_workers=self.num_workers)
+        try:
+            # Convert DataFrames to dictionaries for O(1) lookup
+            logger.info(f"Loading item data from {os.path.join(data_dir, 'item.json')}")
+            self.item_data = {item['item_id']: item for item in self._load_data('item.json')}
+            logger.info(f"Loading user data from {os.path.join(data_dir, 'user.json')}")
+            self.user_data = {user['user_id']: user for user in self._load_data('user.json')}
+
+            # Create review indices
+            logger.info(f"Loading review data from {os.path.join(data_dir, 'review.json')}")
+            reviews, self.item_reviews, self.user_reviews = self._load_reviews()
+            self.review_data = {review['review_id']: review for review in reviews}
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+    def _map_chunks(self, fn, file_path: str) -> List:
+        """Parse a file chunk by chunk in the process pool, preserving file order."""
+        num_chunks = min(
+            self.num_workers * CHUNKS_PER_WORKER,
+            max(1, os.path.getsize(file_path) // MIN_CHUNK_BYTES)
+        )
+        chunks = _chunk_boundaries(file_path, num_chunks)
+        return list(self._executor.map(
+            fn,
+            [file_path] * len(chunks),
+            [start for start, _ in chunks],
+            [end for _, end in chunks]
+        ))
+
+    def _log_throughput(self, filename: str, lines: int, start_time: float):
+        elapsed = time.perf_counter() - start_time
+        rate = lines / elapsed if elapsed > 0 else float('inf')
+        logger.info(f"Loaded {lines} lines from {filename} in {elapsed:.2f}s ({rate:,.0f} lines/s)")
 
     def _load_data(self, filename: str) -> List[Dict]:
         """Load data as a list of dictionaries."""
         file_path = os.path.join(self.data_dir, filename)
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return [json.loads(line) for line in file]
+        start_time = time.perf_counter()
+        if self._executor is not None:
+            data = [record for chunk in self._map_chunks(_parse_chunk, file_path) for record in chunk]
+        else:
+            with open(file_path, 'r', encoding='utf-8') as file:
+                data = [json.loads(line) for line in file]
+        self._log_throughput(filename, len(data), start_time)
+        return data
+
+    def _load_reviews(self) -> Tuple[List[Dict], Dict[str, List[Dict]], Dict[str, List[Dict]]]:
+        """Load reviews together with the item_id and user_id review indices."""
+        if self._executor is None:
+            reviews = self._load_data('review.json')
+            item_reviews = {}
+            user_reviews = {}
+
+            # Build review indices
+            logger.info("Building review indices")
+            for review in reviews:
+                # Index by item_id
+                item_reviews.setdefault(review['item_id'], []).append(review)
+                # Index by user_id
+                user_reviews.setdefault(review['user_id'], []).append(review)
+            return reviews, item_reviews, user_reviews
+
+        # Each chunk arrives with its own indices; merge them in file order
+        start_time = time.perf_counter()
+        reviews = []
+        item_reviews = {}
+        user_reviews = {}
+        file_path = os.path.join(self.data_dir, 'review.json')
+        for chunk_reviews, chunk_item_reviews, chunk_user_reviews in self._map_chunks(_parse_review_chunk, file_path):
+            reviews.extend(chunk_reviews)
+            for item_id, item_review_list in chunk_item_reviews.items():
+                item_reviews.setdefault(item_id, []).extend(item_review_list)
+            for user_id, user_review_list in chunk_user_reviews.items():
+                user_reviews.setdefault(user_id, []).extend(user_review_list)
+        self._log_throughput('review.json', len(reviews), start_time)
+        return reviews, item_reviews, user_reviews
 
     def get_user(self, user_id: str) -> Optional[Dict]:
         """Fetch user data based on user_id."""
@@ -51,18 +152,18 @@ class InteractionTool:
         return self.item_data.get(item_id) if item_id else None
 
     def get_reviews(
-        self, 
-        item_id: Optional[str] = None, 
-        user_id: Optional[str] = None, 
+        self,
+        item_id: Optional[str] = None,
+        user_id: Optional[str] = None,
         review_id: Optional[str] = None
     ) -> List[Dict]:
         """Fetch reviews filtered by various parameters."""
         if review_id:
             return [self.review_data[review_id]] if review_id in self.review_data else []
-        
+
         if item_id:
             return self.item_reviews.get(item_id, [])
         elif user_id:
             return self.user_reviews.get(user_id, [])
-        
+
         return []
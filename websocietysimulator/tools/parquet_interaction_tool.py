@@ -0,0 +1,209 @@
+import glob
+import json
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from cachetools import LRUCache
+
+logger = logging.getLogger("websocietysimulator")
+
+# Partitions are read in the order data_process.py writes the JSON lines files
+SOURCE_ORDER = ['yelp', 'amazon', 'goodreads']
+# table -> ID column used for direct lookups
+KEY_COLUMNS = {'item': 'item_id', 'user': 'user_id', 'review': 'review_id'}
+# Review ID columns with posting lists
+REVIEW_POSTINGS = {'by_item': 'item_id', 'by_user': 'user_id'}
+# JSON of the record fields without a typed column; a field stored in its typed column is null there
+FIELDS_COLUMN = 'other_fields'
+
+
+class ParquetInteractionTool:
+    def __init__(self, data_dir: str, cache_size: int = 10000, row_group_cache_size: int = 64):
+        """
+        Initialize the tool from the Parquet dataset written by `data_process.py --format parquet`.
+        Only the ID columns are read at startup, from memory-mapped files. The other columns, which
+        hold the review texts, are decoded one row group at a time when a record is requested, and
+        each record is assembled from its typed columns and the JSON of its other fields.
+        Args:
+            data_dir: Directory containing item/, review/ and user/ partitioned by source,
+                or the processed data directory containing them under parquet/.
+            cache_size: Maximum number of parsed entries to keep in each cache.
+            row_group_cache_size: Maximum number of decoded record row groups to keep.
+        """
+        # Optional dependencies, imported here to keep `import websocietysimulator` light
+        import pandas as pd
+        import pyarrow.parquet as pq
+        logger.info(f"Initializing ParquetInteractionTool with data directory: {data_dir}")
+        self.data_dir = data_dir
+        self.cache_size = cache_size
+        self.row_group_cache_size = row_group_cache_size
+        root = os.path.join(data_dir, 'parquet') if os.path.isdir(os.path.join(data_dir, 'parquet')) else data_dir
+
+        self._files = {}
+        self._typed_columns = {}
+        self._file_starts = {}
+        self._row_group_starts = {}
+        self._keys = {}
+        self._postings = {}
+        for table, key_column in KEY_COLUMNS.items():
+            paths = sorted(glob.glob(os.path.join(root, table, 'source=*', '*.parquet')), key=self._partition_order)
+            if not paths:
+                raise FileNotFoundError(f"No Parquet files found for table '{table}' under {root}")
+            files = [pq.ParquetFile(path, memory_map=True) for path in paths]
+            columns = [key_column] + ([column for column in REVIEW_POSTINGS.values()] if table == 'review' else [])
+            # Column projection: only the ID columns are read here
+            frames = [file.read(columns=columns).to_pandas() for file in files]
+            data = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+            self._files[table] = files
+            self._typed_columns[table] = [name for name in files[0].schema_arrow.names if name != FIELDS_COLUMN]
+            self._file_starts[table] = np.cumsum([0] + [file.metadata.num_rows for file in files])
+            self._row_group_starts[table] = [
+                np.cumsum([0] + [file.metadata.row_group(i).num_rows for i in range(file.metadata.num_row_groups)])
+                for file in files
+            ]
+            self._keys[table] = self._build_key_index(data[key_column])
+            if table == 'review':
+                self._postings = {name: self._build_postings(data[column]) for name, column in REVIEW_POSTINGS.items()}
+
+        self._row_groups = LRUCache(maxsize=row_group_cache_size)
+        self._row_group_lock = threading.Lock()
+        # LRUCache reorders its entries on every get, so reads take the lock as well
+        self._cache_lock = threading.Lock()
+        self.user_cache = LRUCache(maxsize=cache_size)
+        self.item_cache = LRUCache(maxsize=cache_size)
+        self.review_cache = LRUCache(maxsize=cache_size)
+        self.item_reviews_cache = LRUCache(maxsize=cache_size)
+        self.user_reviews_cache = LRUCache(maxsize=cache_size)
+
+    def __getstate__(self):
+        # Open files and locks cannot be pickled; the receiving process maps the same files
+        return {'data_dir': self.data_dir, 'cache_size': self.cache_size, 'row_group_cache_size': self.row_group_cache_size}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    @staticmethod
+    def _partition_order(path: str) -> Tuple[int, str]:
+        source = os.path.basename(os.path.dirname(path)).split('=', 1)[1]
+        rank = SOURCE_ORDER.index(source) if source in SOURCE_ORDER else len(SOURCE_ORDER)
+        return rank, path
+
+    @staticmethod
+    def _build_key_index(ids: 'pd.Series') -> 'pd.Series':
+        """Map each ID to the row of its last occurrence, like a dict built from the records."""
+        import pandas as pd
+        rows = pd.Series(np.arange(len(ids)), index=pd.Index(ids.astype(object)))
+        return rows[~rows.index.duplicated(keep='last')]
+
+    @staticmethod
+    def _build_postings(ids: 'pd.Series') -> Tuple['pd.Index', np.ndarray, np.ndarray]:
+        """CSR posting lists: rows[indptr[k]:indptr[k + 1]] are the rows of key k, in file order."""
+        import pandas as pd
+        codes, uniques = pd.factorize(ids.astype(object))
+        valid = codes >= 0
+        positions = np.flatnonzero(valid)
+        order = np.argsort(codes[valid], kind='stable')
+        rows = positions[order]
+        indptr = np.searchsorted(codes[valid][order], np.arange(len(uniques) + 1))
+        return pd.Index(uniques), indptr, rows
+
+    def _row_group(self, table: str, file_index: int, row_group: int):
+        key = (table, file_index, row_group)
+        # The lookup reorders the LRU, and a ParquetFile must not be read by several threads at once
+        with self._row_group_lock:
+            data = self._row_groups.get(key)
+            if data is None:
+                data = self._files[table][file_index].read_row_group(row_group)
+                self._row_groups[key] = data
+        return data
+
+    def _cache_get(self, cache: LRUCache, key: str):
+        with self._cache_lock:
+            return cache.get(key)
+
+    def _cache_put(self, cache: LRUCache, key: str, value):
+        with self._cache_lock:
+            cache[key] = value
+
+    def _read_record(self, table: str, row: int) -> Dict:
+        file_index = int(np.searchsorted(self._file_starts[table], row, side='right')) - 1
+        local_row = row - int(self._file_starts[table][file_index])
+        row_group_starts = self._row_group_starts[table][file_index]
+        row_group = int(np.searchsorted(row_group_starts, local_row, side='right')) - 1
+        data = self._row_group(table, file_index, row_group)
+        index = local_row - int(row_group_starts[row_group])
+        record = json.loads(data.column(FIELDS_COLUMN)[index].as_py())
+        for name in self._typed_columns[table]:
+            if name in record and record[name] is None:
+                value = data.column(name)[index].as_py()
+                if value is not None:
+                    record[name] = value
+        return record
+
+    def _lookup(self, table: str, key: str) -> Optional[Dict]:
+        row = self._keys[table].get(key)
+        if row is None:
+            return None
+        return self._read_record(table, int(row))
+
+    def _lookup_postings(self, name: str, key: str) -> List[Dict]:
+        keys, indptr, rows = self._postings[name]
+        position = keys.get_indexer([key])[0]
+        if position < 0:
+            return []
+        return [self._read_record('review', int(row)) for row in rows[indptr[position]:indptr[position + 1]]]
+
+    def get_user(self, user_id: str) -> Optional[Dict]:
+        """Fetch user data based on user_id."""
+        user = self._cache_get(self.user_cache, user_id)
+        if user is not None:
+            return user
+        user = self._lookup('user', user_id)
+        if user is not None:
+            self._cache_put(self.user_cache, user_id, user)
+        return user
+
+    def get_item(self, item_id: str = None) -> Optional[Dict]:
+        """Fetch item data based on item_id."""
+        if not item_id:
+            return None
+        item = self._cache_get(self.item_cache, item_id)
+        if item is not None:
+            return item
+        item = self._lookup('item', item_id)
+        if item is not None:
+            self._cache_put(self.item_cache, item_id, item)
+        return item
+
+    def get_reviews(
+        self,
+        item_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+        review_id: Optional[str] = None
+    ) -> List[Dict]:
+        """Fetch reviews filtered by various parameters."""
+        if review_id:
+            review = self._cache_get(self.review_cache, review_id)
+            if review is None:
+                review = self._lookup('review', review_id)
+                if review is None:
+                    return []
+                self._cache_put(self.review_cache, review_id, review)
+            return [review]
+
+        if item_id:
+            reviews = self._cache_get(self.item_reviews_cache, item_id)
+            if reviews is None:
+                reviews = self._lookup_postings('by_item', item_id)
+                self._cache_put(self.item_reviews_cache, item_id, reviews)
+            return reviews
+        elif user_id:
+            reviews = self._cache_get(self.user_reviews_cache, user_id)
+            if reviews is None:
+                reviews = self._lookup_postings('by_user', user_id)
+                self._cache_put(self.user_reviews_cache, user_id, reviews)
+            return reviews
+
+        return []
@@ -0,0 +1,89 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import numpy as np
+from typing import Dict, List, Optional, Any
+
+logger = logging.getLogger("websocietysimulator")
+
+
+class ReviewFeatureCache:
+    """
+    Persistent store of per-review evaluation features (sentiment, topic embedding, emotions).
+    Entries are keyed by a hash of the review text and the models that produced them,
+    so switching models never returns stale features.
+    """
+
+    def __init__(self, path: str, model_tag: str):
+        """
+        Args:
+            path: Path of the sqlite database file.
+            model_tag: Identifier of the models used to compute the features.
+        """
+        self.path = path
+        self.model_tag = model_tag
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS review_features ("
+            "key TEXT PRIMARY KEY, sentiment REAL, embedding BLOB, emotions TEXT)"
+        )
+        self._conn.commit()
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f'{self.model_tag}\0{text}'.encode('utf-8')).hexdigest()
+
+    def get_many(self, texts: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch cached features for the given texts, keyed by text."""
+        keys = {self.key(text): text for text in texts}
+        found = {}
+        key_list = list(keys)
+        with self._lock:
+            # Stay below sqlite's limit on the number of bound parameters
+            for start in range(0, len(key_list), 500):
+                batch = key_list[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, sentiment, embedding, emotions FROM review_features "
+                    f"WHERE key IN ({','.join('?' * len(batch))})",
+                    batch
+                ).fetchall()
+                for key, sentiment, embedding, emotions in rows:
+                    found[keys[key]] = {
+                        'sentiment': sentiment,
+                        'embedding': np.frombuffer(embedding, dtype=np.float32),
+                        'emotions': json.loads(emotions),
+                    }
+        return found
+
+    def put_many(self, features: Dict[str, Dict[str, Any]]):
+        """Store features keyed by review text."""
+        rows = [
+            (
+                self.key(text),
+                float(feature['sentiment']),
+                np.asarray(feature['embedding'], dtype=np.float32).tobytes(),
+                json.dumps(feature['emotions']),
+            )
+            for text, feature in features.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO review_features (key, sentiment, embedding, emotions) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def open_review_feature_cache(path: str, model_tag: str) -> Optional[ReviewFeatureCache]:
+    """Open a feature cache, or return None if the location is not usable."""
+    try:
+        return ReviewFeatureCache(path, model_tag)
+    except (sqlite3.Error, OSError) as e:
+        logger.warning(f"Review feature cache at {path} is unavailable, computing features without it: {e}")
+        return None
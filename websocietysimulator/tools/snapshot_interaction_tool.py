@@ -0,0 +1,418 @@
+import logging
+import os
+import json
+import mmap
+import shutil
+import hashlib
+import tempfile
+import threading
+import uuid
+import argparse
+import weakref
+import numpy as np
+from typing import Optional, Dict, List, Tuple
+from cachetools import LRUCache
+
+logger = logging.getLogger("websocietysimulator")
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_META = 'snapshot.json'
+SOURCE_FILES = {
+    'item': 'item.json',
+    'user': 'user.json',
+    'review': 'review.json',
+}
+ID_FIELDS = {
+    'item': 'item_id',
+    'user': 'user_id',
+    'review': 'review_id',
+}
+# Posting lists built over the review table: name -> field holding the key
+REVIEW_POSTINGS = {
+    'by_item': 'item_id',
+    'by_user': 'user_id',
+}
+
+
+def _source_signature(file_path: str) -> Dict[str, int]:
+    """Size and mtime of a source file, used to detect stale snapshots."""
+    stat = os.stat(file_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _string_table(values: List[str]) -> np.ndarray:
+    """Encode a list of strings as a fixed-width UTF-8 byte array."""
+    encoded = [value.encode('utf-8') for value in values]
+    width = max((len(value) for value in encoded), default=1) or 1
+    return np.array(encoded, dtype=f'S{width}')
+
+
+def _compile_table(source_path: str, output_dir: str, table: str) -> Tuple[int, Dict[str, np.ndarray]]:
+    """
+    Copy the records of one JSONL file into a blob and build its offset and ID indexes.
+    Returns:
+        Number of records and the per-record key columns needed by posting lists.
+    """
+    id_field = ID_FIELDS[table]
+    key_fields = list(REVIEW_POSTINGS.values()) if table == 'review' else []
+    offsets = [0]
+    ids = []
+    keys = {field: [] for field in key_fields}
+
+    with open(source_path, 'rb') as source, open(os.path.join(output_dir, f'{table}.jsonl'), 'wb') as blob:
+        position = 0
+        for line in source:
+            line = line.rstrip(b'\r\n')
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            ids.append(str(record[id_field]))
+            for field in key_fields:
+                keys[field].append(str(record[field]))
+            blob.write(line)
+            position += len(line)
+            offsets.append(position)
+
+    id_table = _string_table(ids)
+    # Stable sort keeps duplicates in file order so the last one wins, like a dict
+    order = np.argsort(id_table, kind='stable')
+    np.save(os.path.join(output_dir, f'{table}.offsets.npy'), np.array(offsets, dtype=np.int64))
+    np.save(os.path.join(output_dir, f'{table}.ids.npy'), id_table[order])
+    np.save(os.path.join(output_dir, f'{table}.rows.npy'), order.astype(np.int64))
+    return len(ids), {field: _string_table(values) for field, values in keys.items()}
+
+
+def _compile_postings(output_dir: str, name: str, key_column: np.ndarray):
+    """Build a CSR posting list (sorted keys, indptr, review rows) for one review key."""
+    order = np.argsort(key_column, kind='stable')
+    sorted_keys = key_column[order]
+    unique_keys, starts = np.unique(sorted_keys, return_index=True)
+    indptr = np.append(starts, len(sorted_keys)).astype(np.int64)
+    np.save(os.path.join(output_dir, f'review.{name}.keys.npy'), unique_keys)
+    np.save(os.path.join(output_dir, f'review.{name}.indptr.npy'), indptr)
+    np.save(os.path.join(output_dir, f'review.{name}.rows.npy'), order.astype(np.int64))
+
+
+def is_snapshot_fresh(data_dir: str, snapshot_dir: str) -> bool:
+    """Check whether a snapshot exists and was compiled from the current JSONL files."""
+    meta_path = os.path.join(snapshot_dir, SNAPSHOT_META)
+    if not os.path.exists(meta_path):
+        return False
+    with open(meta_path, 'r', encoding='utf-8') as file:
+        meta = json.load(file)
+    if meta.get('version') != SNAPSHOT_VERSION:
+        return False
+    for table, filename in SOURCE_FILES.items():
+        source_path = os.path.join(data_dir, filename)
+        if not os.path.exists(source_path):
+            return False
+        if meta['tables'][table].get('source') != _source_signature(source_path):
+            return False
+    return True
+
+
+def compile_snapshot(data_dir: str, snapshot_dir: Optional[str] = None, force: bool = False) -> str:
+    """
+    Compile item.json, user.json and review.json into a memory-mappable snapshot.
+    Args:
+        data_dir: Path to the directory containing the JSONL dataset files.
+        snapshot_dir: Output directory. Defaults to `<data_dir>/snapshot`.
+        force: Rebuild even if an up-to-date snapshot already exists.
+    Returns:
+        The snapshot directory.
+    """
+    snapshot_dir = snapshot_dir or os.path.join(data_dir, 'snapshot')
+    if not force and is_snapshot_fresh(data_dir, snapshot_dir):
+        logger.info(f"Snapshot at {snapshot_dir} is up to date")
+        return snapshot_dir
+
+    # A build directory of its own, so processes compiling the same snapshot at once do not collide
+    parent = os.path.dirname(os.path.abspath(snapshot_dir))
+    os.makedirs(parent, exist_ok=True)
+    build_dir = tempfile.mkdtemp(prefix=f'{os.path.basename(os.path.abspath(snapshot_dir))}.', suffix='.tmp', dir=parent)
+    # mkdtemp creates the directory readable by its owner only
+    os.chmod(build_dir, 0o755)
+    try:
+        meta = {'version': SNAPSHOT_VERSION, 'tables': {}}
+        for table, filename in SOURCE_FILES.items():
+            source_path = os.path.join(data_dir, filename)
+            logger.info(f"Compiling {source_path} into snapshot")
+            signature = _source_signature(source_path)
+            count, key_columns = _compile_table(source_path, build_dir, table)
+            meta['tables'][table] = {'count': count, 'source': signature}
+            for name, field in REVIEW_POSTINGS.items():
+                if field in key_columns:
+                    _compile_postings(build_dir, name, key_columns[field])
+
+        # The meta file is written last so a half-built snapshot is never considered valid
+        with open(os.path.join(build_dir, SNAPSHOT_META), 'w', encoding='utf-8') as file:
+            json.dump(meta, file)
+        if os.path.exists(snapshot_dir) and (force or not is_snapshot_fresh(data_dir, snapshot_dir)):
+            shutil.rmtree(snapshot_dir, ignore_errors=True)
+        try:
+            os.replace(build_dir, snapshot_dir)
+        except OSError:
+            # Another process published the snapshot first; use theirs
+            if not is_snapshot_fresh(data_dir, snapshot_dir):
+                raise
+            shutil.rmtree(build_dir, ignore_errors=True)
+            logger.info(f"Snapshot at {snapshot_dir} was written by another process")
+            return snapshot_dir
+    except BaseException:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        raise
+    logger.info(f"Snapshot written to {snapshot_dir}")
+    return snapshot_dir
+
+
+class SnapshotInteractionTool:
+    def __init__(self, snapshot_dir: str, cache_size: int = 10000):
+        """
+        Initialize the tool from a snapshot built by `compile_snapshot`.
+        All indexes are memory-mapped, so startup does not depend on the dataset size
+        and only the records that are actually requested are parsed.
+        Args:
+            snapshot_dir: Path to the snapshot directory.
+            cache_size: Maximum number of parsed entries to keep in each cache.
+        """
+        logger.info(f"Initializing SnapshotInteractionTool with snapshot directory: {snapshot_dir}")
+        self.snapshot_dir = snapshot_dir
+        self.cache_size = cache_size
+        with open(os.path.join(snapshot_dir, SNAPSHOT_META), 'r', encoding='utf-8') as file:
+            self.meta = json.load(file)
+        if self.meta.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version: {self.meta.get('version')}")
+
+        self._blobs = {}
+        self._offsets = {}
+        self._ids = {}
+        self._rows = {}
+        for table in SOURCE_FILES:
+            self._blobs[table] = self._map_blob(os.path.join(snapshot_dir, f'{table}.jsonl'))
+            self._offsets[table] = self._load_array(f'{table}.offsets.npy')
+            self._ids[table] = self._load_array(f'{table}.ids.npy')
+            self._rows[table] = self._load_array(f'{table}.rows.npy')
+        self._postings = {
+            name: (
+                self._load_array(f'review.{name}.keys.npy'),
+                self._load_array(f'review.{name}.indptr.npy'),
+                self._load_array(f'review.{name}.rows.npy'),
+            )
+            for name in REVIEW_POSTINGS
+        }
+
+        # LRUCache reorders its entries on every get, so reads take the lock as well
+        self._cache_lock = threading.Lock()
+        self.user_cache = LRUCache(maxsize=cache_size)
+        self.item_cache = LRUCache(maxsize=cache_size)
+        self.review_cache = LRUCache(maxsize=cache_size)
+        self.item_reviews_cache = LRUCache(maxsize=cache_size)
+        self.user_reviews_cache = LRUCache(maxsize=cache_size)
+
+    def __getstate__(self):
+        # Only the location is pickled; the receiving process maps the same files
+        return {'snapshot_dir': self.snapshot_dir, 'cache_size': self.cache_size}
+
+    def __setstate__(self, state):
+        SnapshotInteractionTool.__init__(self, state['snapshot_dir'], state['cache_size'])
+
+    def close(self):
+        """Unmap the snapshot files."""
+        for blob in self._blobs.values():
+            if blob is not None:
+                blob.close()
+        self._blobs = {}
+        self._offsets = {}
+        self._ids = {}
+        self._rows = {}
+        self._postings = {}
+
+    def _load_array(self, filename: str) -> np.ndarray:
+        return np.load(os.path.join(self.snapshot_dir, filename), mmap_mode='r')
+
+    @staticmethod
+    def _map_blob(file_path: str) -> Optional[mmap.mmap]:
+        if os.path.getsize(file_path) == 0:
+            return None
+        with open(file_path, 'rb') as file:
+            return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @staticmethod
+    def _find(sorted_keys: np.ndarray, key: str) -> int:
+        """Position of the last occurrence of key in a sorted string table, or -1."""
+        if len(sorted_keys) == 0:
+            return -1
+        encoded = key.encode('utf-8')
+        if len(encoded) > sorted_keys.dtype.itemsize:
+            return -1
+        position = int(np.searchsorted(sorted_keys, encoded, side='right')) - 1
+        if position < 0 or sorted_keys[position] != encoded:
+            return -1
+        return position
+
+    def _cache_get(self, cache: LRUCache, key: str):
+        with self._cache_lock:
+            return cache.get(key)
+
+    def _cache_put(self, cache: LRUCache, key: str, value):
+        with self._cache_lock:
+            cache[key] = value
+
+    def _read_record(self, table: str, row: int) -> Dict:
+        offsets = self._offsets[table]
+        return json.loads(self._blobs[table][int(offsets[row]):int(offsets[row + 1])])
+
+    def _lookup(self, table: str, key: str) -> Optional[Dict]:
+        position = self._find(self._ids[table], key)
+        if position < 0:
+            return None
+        return self._read_record(table, int(self._rows[table][position]))
+
+    def _lookup_postings(self, name: str, key: str) -> List[Dict]:
+        keys, indptr, rows = self._postings[name]
+        position = self._find(keys, key)
+        if position < 0:
+            return []
+        return [
+            self._read_record('review', int(row))
+            for row in rows[indptr[position]:indptr[position + 1]]
+        ]
+
+    def get_user(self, user_id: str) -> Optional[Dict]:
+        """Fetch user data based on user_id."""
+        user = self._cache_get(self.user_cache, user_id)
+        if user is not None:
+            return user
+        user = self._lookup('user', user_id)
+        if user is not None:
+            self._cache_put(self.user_cache, user_id, user)
+        return user
+
+    def get_item(self, item_id: str = None) -> Optional[Dict]:
+        """Fetch item data based on item_id."""
+        if not item_id:
+            return None
+        item = self._cache_get(self.item_cache, item_id)
+        if item is not None:
+            return item
+        item = self._lookup('item', item_id)
+        if item is not None:
+            self._cache_put(self.item_cache, item_id, item)
+        return item
+
+    def get_reviews(
+        self,
+        item_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+        review_id: Optional[str] = None
+    ) -> List[Dict]:
+        """Fetch reviews filtered by various parameters."""
+        if review_id:
+            review = self._cache_get(self.review_cache, review_id)
+            if review is None:
+                review = self._lookup('review', review_id)
+                if review is None:
+                    return []
+                self._cache_put(self.review_cache, review_id, review)
+            return [review]
+
+        if item_id:
+            reviews = self._cache_get(self.item_reviews_cache, item_id)
+            if reviews is None:
+                reviews = self._lookup_postings('by_item', item_id)
+                self._cache_put(self.item_reviews_cache, item_id, reviews)
+            return reviews
+        elif user_id:
+            reviews = self._cache_get(self.user_reviews_cache, user_id)
+            if reviews is None:
+                reviews = self._lookup_postings('by_user', user_id)
+                self._cache_put(self.user_reviews_cache, user_id, reviews)
+            return reviews
+
+        return []
+
+
+def _remove_snapshot(snapshot_dir: str, owner_pid: int):
+    # Forked workers inherit the finalizer; only the process that created the snapshot removes it
+    if os.getpid() == owner_pid and os.path.exists(snapshot_dir):
+        logger.info(f"Removing shared snapshot {snapshot_dir}")
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+
+
+def default_shm_dir() -> str:
+    """Directory backed by shared memory, falling back to the temp directory."""
+    return '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+
+class SharedInteractionTool(SnapshotInteractionTool):
+    def __init__(self, data_dir: str, shm_dir: Optional[str] = None, cache_size: int = 10000, persist: bool = False):
+        """
+        Read-only interaction tool whose data and indexes live in shared memory.
+        The dataset is compiled once into a snapshot under `shm_dir` and memory-mapped.
+        Pickling an instance only transfers the snapshot location, so worker processes
+        attach to the same pages without copying the data.
+        Args:
+            data_dir: Path to the directory containing the JSONL dataset files.
+            shm_dir: Directory holding the snapshot. Defaults to /dev/shm when available.
+            cache_size: Maximum number of parsed entries to keep in each cache.
+            persist: Compile the snapshot under a name derived from data_dir and keep it, so later
+                runs reuse it. Otherwise an up-to-date persisted snapshot is reused if there is one,
+                and if not the dataset is compiled into a snapshot private to this instance, which is
+                removed by `close()`, when the tool is garbage collected, or when the process exits.
+        """
+        shm_dir = shm_dir or default_shm_dir()
+        digest = hashlib.sha1(os.path.abspath(data_dir).encode('utf-8')).hexdigest()[:16]
+        snapshot_dir = os.path.join(shm_dir, f'websocietysimulator-{digest}')
+        self._finalizer = None
+        if not persist and not is_snapshot_fresh(data_dir, snapshot_dir):
+            # Other instances may use the same data_dir, so only a snapshot nobody else knows of is removed
+            snapshot_dir = os.path.join(shm_dir, f'websocietysimulator-{digest}-{os.getpid()}-{uuid.uuid4().hex[:8]}')
+            compile_snapshot(data_dir, snapshot_dir, force=True)
+            # Shared memory is not reclaimed when the process ends, so removal must not depend on close()
+            self._finalizer = weakref.finalize(self, _remove_snapshot, snapshot_dir, os.getpid())
+        else:
+            compile_snapshot(data_dir, snapshot_dir)
+        super().__init__(snapshot_dir, cache_size)
+        self.persist = persist
+        self._owner = self._finalizer is not None
+
+    @classmethod
+    def attach(cls, snapshot_dir: str, cache_size: int = 10000) -> 'SharedInteractionTool':
+        """Attach to a snapshot created by another process."""
+        tool = cls.__new__(cls)
+        tool.__setstate__({'snapshot_dir': snapshot_dir, 'cache_size': cache_size})
+        return tool
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        self.persist = True
+        self._owner = False
+        self._finalizer = None
+
+    def close(self):
+        """Unmap the snapshot, and remove it if this instance compiled a private one."""
+        super().close()
+        if self._finalizer is not None:
+            self._finalizer()
+            self._finalizer = None
+        self._owner = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile the JSONL dataset into a memory-mapped snapshot.")
+    parser.add_argument('--data_dir', required=True, help="Directory containing item.json, user.json and review.json.")
+    parser.add_argument('--snapshot_dir', default=None, help="Output directory. Defaults to <data_dir>/snapshot.")
+    parser.add_argument('--force', action='store_true', help="Rebuild even if the snapshot is up to date.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    compile_snapshot(args.data_dir, args.snapshot_dir, force=args.force)
+
+
+if __name__ == '__main__':
+    main()